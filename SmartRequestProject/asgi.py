@@ -2,15 +2,29 @@
 ASGI config for SmartRequestProject project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve the dashboard's live status stream (dashboard.live) from here.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
+import gc
 import os
 
-from django.core.asgi import get_asgi_application
+# no collections while booting, see wsgi.py
+gc.disable()
+try:
+    from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SmartRequestProject.settings')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SmartRequestProject.settings')
 
-application = get_asgi_application()
+    application = get_asgi_application()
+
+    # build the chatbot's FAQ index now, not during the first chat
+    from dashboard import chatbot
+
+    chatbot.faq_index()
+
+    gc.freeze()
+finally:
+    gc.enable()
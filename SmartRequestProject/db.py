@@ -0,0 +1,91 @@
+"""
+SQLite database profiles and the read/write router.
+
+``sqlite_databases`` builds DATABASES for one of two profiles, picked with
+DATABASE_PROFILE in the environment. ``development`` is Django's stock
+SQLite setup. ``production``:
+
+* runs PRAGMAS on every new connection: the WAL journal, so readers and the
+  writer no longer block each other, synchronous=NORMAL (a power cut can
+  lose the last commits but never corrupts the file), a larger page cache,
+  in-memory temp tables and memory-mapped reads;
+* starts transactions with BEGIN IMMEDIATE. A writer takes the write lock
+  up front and waits up to SQLITE_BUSY_TIMEOUT seconds for it, instead of
+  failing with "database is locked" when a deferred transaction that has
+  already read tries to upgrade;
+* keeps connections open across requests (CONN_MAX_AGE = None, checked
+  before reuse);
+* adds a ``read`` alias on the same file, with ``query_only`` set and
+  plain deferred transactions, which ``ReadWriteRouter`` sends reads to.
+
+Django opens one connection per alias per thread, so a threaded server ends
+up with a pool of read connections, one per worker thread, next to the
+write connections, of which SQLite lets one write at a time.
+``manage.py bench_sqlite`` compares the two profiles under concurrent load.
+"""
+from django.db import connections
+
+WRITE = 'default'
+READ = 'read'
+
+PROFILES = ('development', 'production')
+
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -20000',  # KiB, so about 20 MB per connection
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA mmap_size = 268435456',
+)
+READ_PRAGMAS = PRAGMAS + ('PRAGMA query_only = ON',)
+
+
+def sqlite_databases(path, profile='development', busy_timeout=20):
+    if profile not in PROFILES:
+        raise ValueError(f'unknown database profile {profile!r}, expected one of {PROFILES}')
+    if profile == 'development':
+        return {WRITE: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}}
+
+    def alias(pragmas, options=None, **extra):
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': path,
+            'CONN_MAX_AGE': None,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': '; '.join(pragmas),
+                'timeout': busy_timeout,
+                **(options or {}),
+            },
+            **extra,
+        }
+
+    return {
+        WRITE: alias(PRAGMAS, {'transaction_mode': 'IMMEDIATE'}),
+        # reads never upgrade, so their transactions stay DEFERRED and take
+        # no write lock; the test runner points the alias at the test database
+        READ: alias(READ_PRAGMAS, TEST={'MIRROR': WRITE}),
+    }
+
+
+class ReadWriteRouter:
+    """
+    Send reads to the ``read`` alias and writes to ``default``. Inside a
+    transaction on ``default`` reads stay there too, so they see the
+    transaction's own uncommitted writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if connections[WRITE].in_atomic_block:
+            return WRITE
+        return READ
+
+    def db_for_write(self, model, **hints):
+        return WRITE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both aliases are the same file
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == WRITE
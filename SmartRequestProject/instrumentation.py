@@ -0,0 +1,182 @@
+"""
+Opt-in per-view performance instrumentation.
+
+Enable with PERF_INSTRUMENTATION = True (or PERF_INSTRUMENTATION=1 in the
+environment). For every request ``PerfMiddleware`` records the URL name,
+wall time, number and duration of SQL queries, and the time spent rendering
+templates. Records are appended to an in-process ``deque``, whose appends
+are atomic, so the request path takes no lock. Whichever request first
+finds the buffer due (PERF_FLUSH_INTERVAL seconds old or PERF_BUFFER_SIZE
+records long) writes it to PERF_LOG_PATH as JSON lines. Summarise the file
+with ``manage.py perf_report``.
+
+The middleware runs natively in both sync and async stacks. Queries are
+timed by a wrapper added to each database connection as it is set up, so
+queries an async view runs through ``sync_to_async`` are counted too, and
+template time by wrapping ``Template.render`` once the middleware is
+enabled. Both only record while a request is being instrumented: the
+request's stats travel in a context variable, which ``sync_to_async``
+carries into its worker threads.
+"""
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+_buffer = deque()
+_flush_lock = threading.Lock()
+_last_flush = time.monotonic()
+_current = contextvars.ContextVar('perf_request_stats', default=None)
+_original_template_render = None
+
+
+class _RequestStats:
+    __slots__ = ('sql_count', 'sql_time', 'template_time', 'template_depth')
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+
+def _timed_execute(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_count += 1
+        stats.sql_time += time.perf_counter() - started
+
+
+def _wrap_connection(connection, **kwargs):
+    # connections are per thread, so each one gets the wrapper as it connects
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+def _wrap_open_connections():
+    # the ones this thread opened before the middleware was loaded
+    for connection in connections.all(initialized_only=True):
+        _wrap_connection(connection)
+
+
+def _timed_template_render(self, context):
+    stats = _current.get()
+    # only the outermost render counts; {% include %} renders nest inside it
+    if stats is None or stats.template_depth:
+        return _original_template_render(self, context)
+    stats.template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_template_render(self, context)
+    finally:
+        stats.template_depth -= 1
+        stats.template_time += time.perf_counter() - started
+
+
+def _install_template_timer():
+    global _original_template_render
+    if _original_template_render is None:
+        _original_template_render = Template.render
+        Template.render = _timed_template_render
+
+
+def flush():
+    """Append buffered records to PERF_LOG_PATH. Skips if another thread is already flushing."""
+    global _last_flush
+    if not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _last_flush = time.monotonic()
+        lines = []
+        while True:
+            try:
+                lines.append(json.dumps(_buffer.popleft()))
+            except IndexError:
+                break
+        if lines:
+            with open(settings.PERF_LOG_PATH, 'a', encoding='utf-8') as log:
+                log.write('\n'.join(lines) + '\n')
+    finally:
+        _flush_lock.release()
+
+
+class PerfMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERF_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        _install_template_timer()
+        connection_created.connect(_wrap_connection)
+        atexit.register(flush)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        _wrap_open_connections()
+        stats, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        if self.record(request, response, stats, started):
+            flush()
+        return response
+
+    async def __acall__(self, request):
+        # the thread the request's sync_to_async calls run in
+        await sync_to_async(_wrap_open_connections)()
+        stats, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        if self.record(request, response, stats, started):
+            await sync_to_async(flush, thread_sensitive=False)()
+        return response
+
+    @staticmethod
+    def start():
+        stats = _RequestStats()
+        return stats, _current.set(stats), time.perf_counter()
+
+    @staticmethod
+    def record(request, response, stats, started):
+        """Buffer the request's record; True when the buffer is due a flush."""
+        wall = time.perf_counter() - started
+        match = request.resolver_match
+        _buffer.append({
+            'ts': round(time.time(), 3),
+            'pid': os.getpid(),
+            'view': (match.url_name or match.view_name) if match else 'unresolved',
+            'method': request.method,
+            'status': response.status_code,
+            'wall_ms': round(wall * 1000, 3),
+            'sql_count': stats.sql_count,
+            'sql_ms': round(stats.sql_time * 1000, 3),
+            'template_ms': round(stats.template_time * 1000, 3),
+        })
+        return (
+            len(_buffer) >= settings.PERF_BUFFER_SIZE
+            or time.monotonic() - _last_flush >= settings.PERF_FLUSH_INTERVAL
+        )
@@ -0,0 +1,45 @@
+"""
+The admin, loaded on its first request instead of at worker boot.
+
+With the stock AdminConfig, setup imports every app's admin.py and the
+ModelAdmins, forms and widgets they use, in every worker, for a site
+almost no request uses. The admin app is installed as
+``LazyAdminConfig`` instead, which does not autodiscover at setup, and the
+URLconf routes /admin/ to ``urls``, whose patterns are built (and admin.py
+modules imported) when a request or a reverse() first reaches the admin
+namespace. The system checks still autodiscover first, so ``manage.py
+check`` (and runserver, migrate...) checks every ModelAdmin.
+``manage.py startup_profile`` measures the boot.
+"""
+from django.contrib.admin import autodiscover
+from django.contrib.admin.apps import SimpleAdminConfig
+from django.contrib.admin.checks import check_admin_app, check_dependencies
+from django.core import checks
+
+
+def check_admin_modules(app_configs, **kwargs):
+    # the ModelAdmins are only registered once admin.py modules are imported
+    autodiscover()
+    return check_admin_app(app_configs, **kwargs)
+
+
+class LazyAdminConfig(SimpleAdminConfig):
+    def ready(self):
+        # SimpleAdminConfig's checks, with autodiscovery ahead of the admin's
+        checks.register(check_dependencies, checks.Tags.admin)
+        checks.register(check_admin_modules, checks.Tags.admin)
+
+
+class _AdminURLconf:
+    # URLResolver reads this once, when a request or a reverse() first
+    # reaches the admin namespace
+    @property
+    def urlpatterns(self):
+        from django.contrib import admin
+
+        autodiscover()
+        return admin.site.get_urls()
+
+
+# for path('admin/', ...), in place of admin.site.urls
+urls = (_AdminURLconf(), 'admin', 'admin')
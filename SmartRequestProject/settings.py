@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 
 from pathlib import Path
+
+from .db import sqlite_databases
 #admin password is admin123
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -33,7 +35,9 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # no autodiscovery at setup: the admin loads on its first request, see
+    # SmartRequestProject.lazy_admin
+    'SmartRequestProject.lazy_admin.LazyAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -45,11 +49,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'SmartRequestProject.instrumentation.PerfMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.middleware.HashingBackpressureMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -60,6 +66,7 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR,'templates')],
+        # Django wraps these loaders in the cached loader, DEBUG or not
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -77,12 +84,14 @@ WSGI_APPLICATION = 'SmartRequestProject.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# DATABASE_PROFILE=production turns on WAL and tuned pragmas, persistent
+# connections and a query-only read alias, see SmartRequestProject.db.
+# SQLITE_BUSY_TIMEOUT is how many seconds a writer waits for the lock.
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'development')
+SQLITE_BUSY_TIMEOUT = 20
+
+DATABASES = sqlite_databases(BASE_DIR / 'db.sqlite3', DATABASE_PROFILE, SQLITE_BUSY_TIMEOUT)
+DATABASE_ROUTERS = ['SmartRequestProject.db.ReadWriteRouter'] if DATABASE_PROFILE == 'production' else []
 
 
 # Password validation
@@ -90,19 +99,100 @@ DATABASES = {
 
 AUTH_PASSWORD_VALIDATORS = [
     {
-        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+        'NAME': 'users.passwords.SimilarityValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+        'NAME': 'users.passwords.BlocklistValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
 
+# Compiled with manage.py compile_passwords and memory-mapped by every worker,
+# see users.passwords. Until it exists, Django's common password list is used.
+PASSWORD_BLOCKLIST = BASE_DIR / 'password-blocklist.bin'
+
+# Password hashing runs on a bounded process pool (users.hashing). 0 workers
+# hashes inline on the request thread.
+PASSWORD_HASHING_WORKERS = os.cpu_count()
+PASSWORD_HASHING_MAX_PENDING = 64
+# seconds, sent as Retry-After with the 503 once the pool is saturated
+PASSWORD_HASHING_RETRY_AFTER = 2
+
+# Per-process cache of authenticated users (users.cache): max entries and
+# seconds before a cached row is re-read
+USER_CACHE_MAXSIZE = 2048
+USER_CACHE_TTL = 60
+
+# File-backed sessions with a per-process read cache (users.session_store).
+# The directory is created on first use; every worker must share it.
+SESSION_ENGINE = 'users.session_store'
+SESSION_FILE_PATH = os.environ.get('SESSION_FILE_PATH') or str(BASE_DIR / 'sessions')
+SESSION_CACHE_SIZE = 10000
+
+# keeps the suite's session files out of SESSION_FILE_PATH
+TEST_RUNNER = 'SmartRequestProject.test_runner.TestRunner'
+
+# seconds between reloads of lecturer workloads for request assignment
+# (dashboard.assignment)
+ASSIGNMENT_REBUILD_INTERVAL = 30
+
+# Per-view request/SQL/template timings (SmartRequestProject.instrumentation),
+# off unless PERF_INSTRUMENTATION=1. Summarise with manage.py perf_report.
+PERF_INSTRUMENTATION = os.environ.get('PERF_INSTRUMENTATION') == '1'
+PERF_LOG_PATH = os.environ.get('PERF_LOG_PATH') or BASE_DIR / 'perf.jsonl'
+PERF_FLUSH_INTERVAL = 10
+PERF_BUFFER_SIZE = 1000
+
+# Seconds a cached dashboard fragment lives (dashboard.fragments); 0 turns
+# fragment caching off.
+DASHBOARD_FRAGMENT_TIMEOUT = 300
+
+# The fragments and their versions must be seen by every worker process, or
+# a touch() in one leaves the others serving stale panels. SQLite keeps the
+# deployment on one host, so a file cache there is shared by all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR') or str(BASE_DIR / 'cache'),
+    },
+}
+
+# Live request status over server-sent events (dashboard.live): events a
+# slow client may have queued, seconds between heartbeats on an idle
+# stream, and seconds before a stream is closed for the client to reconnect
+LIVE_QUEUE_SIZE = 32
+LIVE_HEARTBEAT = 20
+LIVE_MAX_AGE = 3600
+
+# Activity log (users.activity): events are buffered in-process and saved
+# in bulk by a writer thread every ACTIVITY_FLUSH_INTERVAL seconds, or once
+# ACTIVITY_BUFFER_SIZE are waiting. 0 starts no thread (the test runner
+# sets it, its tests flush themselves).
+ACTIVITY_FLUSH_INTERVAL = 2
+ACTIVITY_BUFFER_SIZE = 200
+ACTIVITY_MAX_PENDING = 100000
+# "latest N" ring per process, reloaded from the table this often (seconds)
+ACTIVITY_RECENT_SIZE = 100
+ACTIVITY_RECENT_REFRESH = 30
+# manage.py compact_activity moves entries older than this many days into
+# gzipped JSON-lines segments of ACTIVITY_SEGMENT_SIZE entries
+ACTIVITY_RETENTION_DAYS = 90
+ACTIVITY_ARCHIVE_DIR = os.environ.get('ACTIVITY_ARCHIVE_DIR') or BASE_DIR / 'activity'
+ACTIVITY_SEGMENT_SIZE = 10000
+
+# Request attachments (dashboard.attachments), stored once per SHA-256 under
+# ATTACHMENT_ROOT. Uploads stream to disk and stop at ATTACHMENT_MAX_SIZE
+# bytes; manage.py sweep_attachments deletes content no attachment has used
+# for ATTACHMENT_SWEEP_GRACE seconds.
+ATTACHMENT_ROOT = os.environ.get('ATTACHMENT_ROOT') or BASE_DIR / 'attachments'
+ATTACHMENT_MAX_SIZE = 64 * 2 ** 20
+ATTACHMENT_SWEEP_GRACE = 24 * 3600
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -115,7 +205,15 @@ USE_I18N = True
 
 USE_TZ = True
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Mail is queued in the outbox (users.outbox) and delivered by
+# manage.py drain_outbox through OUTBOX_DELIVERY_BACKEND.
+EMAIL_BACKEND = 'users.outbox.OutboxBackend'
+OUTBOX_DELIVERY_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE = 30  # seconds before the first retry, doubled each time
+OUTBOX_RETRY_MAX = 3600
+OUTBOX_LEASE = 300  # seconds a worker holds a claimed batch
+EMAIL_TIMEOUT = 30
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
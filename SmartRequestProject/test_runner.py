@@ -0,0 +1,33 @@
+"""
+Test runner for ``manage.py test``: session files and the file cache go to
+temporary directories for the run instead of SESSION_FILE_PATH and
+CACHE_DIR, and no activity writer thread is started (tests call
+``activity.flush`` themselves).
+"""
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from users import session_store
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.session_dir = tempfile.TemporaryDirectory()
+        session_store.SessionStore._storage_path = self.session_dir.name
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.overrides = override_settings(
+            CACHES={'default': {**settings.CACHES['default'], 'LOCATION': self.cache_dir.name}},
+            ACTIVITY_FLUSH_INTERVAL=0,
+        )
+        self.overrides.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.overrides.disable()
+        self.cache_dir.cleanup()
+        del session_store.SessionStore._storage_path
+        self.session_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -14,14 +14,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
 from django.urls import path,include
 from django.views.generic import TemplateView
 
+from . import lazy_admin
+
 
 urlpatterns = [
     path('', TemplateView.as_view(template_name='home.html'), name='home'),
-    path('admin/', admin.site.urls),
+    path('admin/', lazy_admin.urls),
     path('accounts/',include('users.urls')),
     path('dashboard/',include('dashboard.urls')),
 ]
@@ -7,10 +7,21 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
+import gc
 import os
 
-from django.core.wsgi import get_wsgi_application
+# Nothing that setup allocates is garbage: collecting during it only slows
+# a new worker down. Frozen afterwards, those objects are left out of every
+# later collection, and stay shared with the parent under a preforking
+# server. manage.py startup_profile measures the boot.
+gc.disable()
+try:
+    from django.core.wsgi import get_wsgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SmartRequestProject.settings')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SmartRequestProject.settings')
 
-application = get_wsgi_application()
+    application = get_wsgi_application()
+
+    gc.freeze()
+finally:
+    gc.enable()
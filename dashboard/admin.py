@@ -1,3 +1,76 @@
 from django.contrib import admin
 
+from .models import Attachment, Blob, RegistrationRollup, RegistrationTotal, Request, RequestCounter
+
 # Register your models here.
+
+
+@admin.register(Request)
+class RequestAdmin(admin.ModelAdmin):
+    list_display = ('request_type', 'student', 'assignee', 'status', 'created')
+    list_filter = ('status', 'request_type')
+    raw_id_fields = ('student', 'assignee')
+    # status changes must go through Request.set_status to keep the counters right
+    readonly_fields = ('status', 'created', 'updated')
+
+
+@admin.register(RequestCounter)
+class RequestCounterAdmin(admin.ModelAdmin):
+    list_display = ('user', 'total', 'pending', 'approved', 'rejected', 'assigned_open', 'assigned_closed')
+    raw_id_fields = ('user',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RegistrationRollup)
+class RegistrationRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'role', 'count')
+    list_filter = ('role',)
+    date_hierarchy = 'day'
+    show_full_result_count = False
+
+    # kept by dashboard.registrations; repair with manage.py backfill_registrations
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RegistrationTotal)
+class RegistrationTotalAdmin(admin.ModelAdmin):
+    list_display = ('role', 'count')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+
+@admin.register(Attachment)
+class AttachmentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'request', 'content_type', 'created')
+    raw_id_fields = ('request', 'blob')
+    readonly_fields = ('blob', 'created')
+
+    # files arrive through the upload view, see dashboard.attachments
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'size', 'created', 'last_used')
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
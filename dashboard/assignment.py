@@ -0,0 +1,173 @@
+"""
+Least-loaded lecturer assignment for incoming requests.
+
+``LoadBalancer`` is the in-memory part: a min-heap of (open requests,
+lecturer) with lazy invalidation, so picking and updating a lecturer are
+both O(log n). ``Scheduler`` wraps it for the web process. It rebuilds the
+heap from the RequestCounter rows (one query) on first use and every
+ASSIGNMENT_REBUILD_INTERVAL seconds, so it picks up work assigned or closed
+by other processes. Each assignment is claimed with a conditional UPDATE,
+so a request is never handed out twice, even across processes.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists
+
+from . import fragments, live
+from .models import Request, RequestCounter
+
+
+class LoadBalancer:
+    def __init__(self, loads=None):
+        self._loads = {}
+        self._heap = []
+        self._seq = itertools.count()
+        for lecturer_id, load in (loads or {}).items():
+            self.set_load(lecturer_id, load)
+
+    def __len__(self):
+        return len(self._loads)
+
+    def loads(self):
+        return dict(self._loads)
+
+    def set_load(self, lecturer_id, load):
+        self._loads[lecturer_id] = load
+        # older heap entries for this lecturer are now stale and skipped in pick()
+        heapq.heappush(self._heap, (load, next(self._seq), lecturer_id))
+        if len(self._heap) > 4 * len(self._loads) + 64:
+            self._heap = [entry for entry in self._heap if self._loads.get(entry[2]) == entry[0]]
+            heapq.heapify(self._heap)
+
+    def add(self, lecturer_id, delta):
+        if lecturer_id in self._loads:
+            self.set_load(lecturer_id, max(0, self._loads[lecturer_id] + delta))
+
+    def remove(self, lecturer_id):
+        self._loads.pop(lecturer_id, None)
+
+    def pick(self):
+        """The least-loaded lecturer id (ties go to the longest waiting), or None."""
+        while self._heap:
+            load, _, lecturer_id = self._heap[0]
+            if self._loads.get(lecturer_id) == load:
+                return lecturer_id
+            heapq.heappop(self._heap)
+        return None
+
+    def skew(self):
+        """Difference between the most and least loaded lecturer."""
+        if not self._loads:
+            return 0
+        return max(self._loads.values()) - min(self._loads.values())
+
+
+class Scheduler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._balancer = None
+        self._built_at = 0.0
+
+    def rebuild(self):
+        """
+        Reload every eligible lecturer's open-request count from the DB and
+        return the new balancer.
+        """
+        User = get_user_model()
+        loads = dict(
+            User.objects
+            .filter(role=User.Role.LECTURER, is_active=True)
+            .values_list('id', 'request_counter__assigned_open')
+        )
+        balancer = LoadBalancer({pk: load or 0 for pk, load in loads.items()})
+        with self._lock:
+            self._balancer = balancer
+            self._built_at = time.monotonic()
+        return balancer
+
+    def invalidate(self):
+        """Drop the heap; the next assignment rebuilds it from the DB."""
+        with self._lock:
+            self._balancer = None
+
+    def _current(self):
+        # read once under the lock: an invalidate() may clear it at any time
+        with self._lock:
+            balancer = self._balancer
+            if balancer is not None and time.monotonic() - self._built_at <= settings.ASSIGNMENT_REBUILD_INTERVAL:
+                return balancer
+        return self.rebuild()
+
+    def assign(self, request):
+        """
+        Give an unassigned request to the least-loaded eligible lecturer.
+        Returns the lecturer id, or None if there is no lecturer or the
+        request was claimed by someone else first.
+        """
+        if not request.is_open:
+            return None
+        balancer = self._current()
+        User = get_user_model()
+        while True:
+            with self._lock:
+                lecturer_id = balancer.pick()
+                if lecturer_id is None:
+                    return None
+                # reserve the slot before the UPDATE so concurrent assigns spread out
+                balancer.add(lecturer_id, 1)
+
+            with transaction.atomic():
+                # the EXISTS guards against a lecturer removed by another process
+                claimed = Request.objects.filter(pk=request.pk, assignee__isnull=True).filter(
+                    Exists(User.objects.filter(pk=lecturer_id, role=User.Role.LECTURER, is_active=True))
+                ).update(assignee_id=lecturer_id)
+                if claimed:
+                    RequestCounter.bump(lecturer_id, assigned_open=1)
+                    fragments.touch(lecturer_id)
+                    live.notify((lecturer_id,), {'type': 'assigned', 'id': request.pk})
+            if claimed:
+                request.assignee_id = lecturer_id
+                return lecturer_id
+
+            with self._lock:
+                balancer.add(lecturer_id, -1)
+            if Request.objects.filter(pk=request.pk, assignee__isnull=True).exists():
+                # the lecturer is no longer eligible: drop them and try the next one
+                with self._lock:
+                    balancer.remove(lecturer_id)
+                continue
+            return None
+
+    def adjust(self, lecturer_id, delta):
+        """Track a change in ``lecturer_id``'s open requests (e.g. one was closed)."""
+        with self._lock:
+            if self._balancer is not None:
+                self._balancer.add(lecturer_id, delta)
+
+    def assign_pending(self, batch_size=500):
+        """Assign every open, unassigned request, oldest first. Returns the number assigned."""
+        assigned = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Request.objects
+                .filter(assignee__isnull=True, status__in=Request.OPEN_STATUSES, id__gt=last_id)
+                .only('id', 'status')
+                .order_by('id')[:batch_size]
+            )
+            if not batch:
+                return assigned
+            for request in batch:
+                if self.assign(request) is None and self._current().pick() is None:
+                    return assigned
+                assigned += request.assignee_id is not None
+            last_id = batch[-1].id
+
+
+scheduler = Scheduler()
@@ -0,0 +1,273 @@
+"""
+Content-addressed storage for request attachments.
+
+Uploads are never held in memory. The upload view swaps Django's upload
+handlers for ``HashingUploadHandler``, which writes each chunk read from
+the request body to a temporary file under ATTACHMENT_ROOT and feeds it to
+SHA-256 on the way. A file is cut off as soon as it passes
+ATTACHMENT_MAX_SIZE, and a body whose Content-Length already says it is
+too large is refused before any of it is read.
+
+``store`` files the upload under its hash, ATTACHMENT_ROOT/ab/cd/abcd...,
+and points the request at the Blob with an Attachment row. When that
+content is already stored the new copy is dropped, so a document uploaded
+many times takes disk space once. ``sweep`` deletes blobs that no
+attachment has used for ATTACHMENT_SWEEP_GRACE seconds.
+
+``serve`` answers downloads with a FileResponse over the blob file. Under
+a server with wsgi.file_wrapper (gunicorn) that goes out with sendfile().
+A single byte range is honoured with a 206, and a range that runs to the
+end of the file keeps the zero-copy path.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, QueryDict
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from .models import Attachment, Blob
+
+# room for the multipart framing and the form's other fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+RANGE = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+def root():
+    return Path(settings.ATTACHMENT_ROOT)
+
+
+def blob_path(sha256):
+    return root() / sha256[:2] / sha256[2:4] / sha256
+
+
+def temp_dir():
+    # on the same filesystem as the blobs, so storing is a rename
+    path = root() / 'tmp'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class HashedUpload(UploadedFile):
+    """An uploaded file already on disk, with its SHA-256."""
+
+    def __init__(self, path, name, content_type, size, sha256):
+        super().__init__(None, name, content_type, size)
+        self.path = path
+        self.sha256 = sha256
+
+    def temporary_path(self):
+        return self.path
+
+    def close(self):
+        # called by Django at the end of the request: drop an upload that
+        # was never stored
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """Stream each uploaded file to a temporary file, hashing it as it goes."""
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or settings.ATTACHMENT_MAX_SIZE
+        self.too_large = False
+        # not ``file``: MultiPartParser closes a handler's ``file`` itself
+        self.temp = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            self.too_large = True
+            # "handled": empty POST and FILES, and the body is never read
+            return QueryDict(), MultiValueDict()
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.temp = tempfile.NamedTemporaryFile(dir=temp_dir(), prefix='upload-', delete=False)
+        self.hash = hashlib.sha256()
+        self.size = 0
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            self.too_large = True
+            self.upload_interrupted()
+            # leaves the rest of the body unread; the server drops the connection
+            raise StopUpload(connection_reset=True)
+        self.hash.update(raw_data)
+        self.temp.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.temp.close()
+        upload = HashedUpload(self.temp.name, self.file_name, self.content_type, self.size, self.hash.hexdigest())
+        self.temp = None
+        return upload
+
+    def upload_interrupted(self):
+        if self.temp is not None:
+            self.temp.close()
+            os.unlink(self.temp.name)
+            self.temp = None
+
+
+def store(request, upload):
+    """Attach ``upload`` (a HashedUpload) to ``request``, storing its content once."""
+    now = timezone.now()
+    with transaction.atomic():
+        # bumping last_used keeps sweep away from a blob that is in use again
+        blob, created = Blob.objects.update_or_create(
+            sha256=upload.sha256, defaults={'last_used': now},
+            create_defaults={'size': upload.size, 'last_used': now},
+        )
+        attachment = Attachment.objects.create(
+            request=request, blob=blob, name=upload.name,
+            content_type=upload.content_type or 'application/octet-stream',
+        )
+        place(upload, created)
+    return attachment
+
+
+def place(upload, new=False):
+    """
+    Move the upload's file to its blob path, or drop it when that content
+    is already there. ``new`` puts it in place regardless.
+    """
+    path = blob_path(upload.sha256)
+    if new or not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(upload.path, path)
+    else:
+        os.unlink(upload.path)
+    return path
+
+
+def sweep(grace=None):
+    """
+    Delete blobs that no attachment has used for ``grace`` seconds, and
+    temporary files left by uploads that died mid-way. Returns the number of
+    blobs deleted.
+    """
+    grace = settings.ATTACHMENT_SWEEP_GRACE if grace is None else grace
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    unused = Blob.objects.filter(last_used__lt=cutoff, attachments__isnull=True)
+    deleted = 0
+    for sha256 in list(unused.values_list('sha256', flat=True)):
+        if not unused.filter(pk=sha256).delete()[0]:
+            continue
+        # moved aside first, so an upload storing the same content right
+        # now can still claim it back
+        trash = temp_dir() / f'{sha256}.deleted'
+        try:
+            os.replace(blob_path(sha256), trash)
+        except FileNotFoundError:
+            continue
+        if Blob.objects.filter(pk=sha256).exists():
+            os.replace(trash, blob_path(sha256))
+        else:
+            os.unlink(trash)
+            deleted += 1
+    stale = time.time() - grace
+    for entry in os.scandir(temp_dir()):
+        if entry.name.startswith('upload-') and entry.stat().st_mtime < stale:
+            os.unlink(entry.path)
+    return deleted
+
+
+def can_read(user, attachment):
+    if not user.is_authenticated:
+        return False
+    return user.is_superuser or user.pk in (attachment.request.student_id, attachment.request.assignee_id)
+
+
+def parse_range(header, size):
+    """
+    The inclusive (start, end) of a single ``bytes=`` range, None to send
+    the whole file, or False when the range cannot be satisfied. Several
+    ranges get the whole file, which RFC 9110 allows.
+    """
+    match = RANGE.fullmatch(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        # the last N bytes
+        if not last:
+            return None
+        if not int(last) or not size:
+            return False
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return False
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+class _Slice:
+    """Reads ``length`` bytes of ``file`` from where it is."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def serve(request, attachment):
+    blob = attachment.blob
+    etag = f'"{blob.sha256}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    span = parse_range(request.headers.get('Range'), blob.size)
+    if span is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{blob.size}'
+        return response
+    start, end = span or (0, blob.size - 1)
+    file = open(blob_path(blob.sha256), 'rb')
+    file.seek(start)
+    if end < blob.size - 1:
+        # not to the end of the file: no sendfile, but never past ``end``
+        file = _Slice(file, end - start + 1)
+
+    response = FileResponse(
+        file, status=206 if span else 200, as_attachment=True,
+        filename=attachment.name, content_type=attachment.content_type,
+    )
+    response['Content-Length'] = end - start + 1
+    if span:
+        response['Content-Range'] = f'bytes {start}-{end}/{blob.size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    # the content behind an attachment never changes
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
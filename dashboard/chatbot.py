@@ -0,0 +1,188 @@
+"""
+In-process, retrieval-based chatbot for the student dashboard.
+
+Nothing is generated and nothing leaves the process: a question is matched
+against FAQ entries, or against the student's own requests when it asks
+about status, and the best entry's answer is sent back.
+
+Documents are turned into TF-IDF vectors (log-scaled term frequency times
+smoothed inverse document frequency, L2-normalised) once, and stored as an
+inverted index from term to (document, weight). Scoring a question walks
+only the postings of its own terms, so it touches a handful of entries
+instead of every document, and cosine similarity is the sum of the
+products. The FAQ index is built once per process and never changed, so
+any number of concurrent chats read it without locks. A student's requests
+are a few rows, indexed per question.
+
+``stream`` yields the reply as JSON lines, which the ``chat`` view sends
+back through the ASGI app as they come. ``manage.py bench_chat`` times it.
+"""
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from django.utils import timezone
+
+WORD = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset(
+    'a about am an and any are be by can could do does for from get has have how i if in is it its me my '
+    'of on or should the there this to was what when where which who why will with would you your'.split()
+)
+
+# a question that uses one of these is matched against the student's
+# requests, unless an FAQ entry matches it confidently
+STATUS_WORDS = 'status pending approved rejected progress decision decided answer track'
+
+# cosine similarity below this is not an answer; from this on an FAQ entry
+# wins even over a status question ("what does pending mean?")
+MIN_SCORE = 0.2
+CONFIDENT_SCORE = 0.75
+
+FALLBACK = (
+    "Sorry, I don't know that one yet. Try asking how to submit a request, what a status means, "
+    "or \"what is the status of my grade appeal?\"."
+)
+
+FAQ = (
+    ('How do I submit a new request?',
+     'Pick a request type under "My Recent Requests", add a short description and press '
+     '"Submit New Request". It is assigned to a lecturer straight away.'),
+    ('What kinds of requests can I submit? Which request types are there?',
+     'Grade appeals, grade reviews, exam extensions, and "Other" for anything else.'),
+    ('What is a grade appeal?',
+     'A grade appeal asks for a final grade to be reconsidered. Say in the description which course '
+     'and why you think the grade is wrong.'),
+    ('What is a grade review? Difference between review and appeal',
+     'A grade review asks to see how an exam or assignment was marked. An appeal asks to change the '
+     'grade itself.'),
+    ('How do I ask for an exam extension or more time?',
+     'Submit an "Exam Extension" request and give the exam and the reason in the description.'),
+    ('Who handles my request? Which lecturer is assigned?',
+     'Each new request goes to the lecturer with the fewest open requests, so it is picked up quickly.'),
+    ('How long does it take to get an answer or a decision?',
+     'That depends on the lecturer, but you can follow it here: the status changes to In Progress when '
+     'they start and to Approved or Rejected when they decide.'),
+    ('How do I check or track the status of my request?',
+     'Your requests and their statuses are in "My Recent Requests", or ask me, e.g. '
+     '"what is the status of my exam extension?".'),
+    ('What does pending mean?',
+     'Pending means the request is waiting for its lecturer to start on it.'),
+    ('What does in progress mean?',
+     'In Progress means the lecturer is working on the request.'),
+    ('My request was rejected, what can I do now?',
+     'Read the reason you were given, then submit a new request with more detail or contact the '
+     'secretary.'),
+    ('Can I cancel, edit or delete a request?',
+     'Requests cannot be changed once submitted. Ask the secretary if one needs to be withdrawn.'),
+    ('I forgot my password, how do I reset it?',
+     'Use "Forgot password?" on the login page and follow the link in the email you receive.'),
+    ('How do I contact the secretary or get help from the office?',
+     'The secretary manages accounts and requests; contact your department office for anything the '
+     'dashboard does not cover.'),
+)
+
+
+def stem(word):
+    # plural "s" only, enough to match "requests" with "request"
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+STATUS_TERMS = frozenset(tokenize(STATUS_WORDS))
+
+
+class Index:
+    """TF-IDF vectors of ``documents`` (strings), kept as an inverted index."""
+
+    def __init__(self, documents):
+        tokenized = [tokenize(document) for document in documents]
+        count = len(tokenized)
+        frequency = Counter(term for terms in tokenized for term in set(terms))
+        self.idf = {term: math.log((1 + count) / (1 + n)) + 1 for term, n in frequency.items()}
+        # a term no document has is as rare as can be
+        self.unknown_idf = math.log(1 + count) + 1
+        self.postings = defaultdict(list)
+        for document, terms in enumerate(tokenized):
+            for term, weight in self.vector(terms).items():
+                self.postings[term].append((document, weight))
+
+    def vector(self, terms):
+        counts = Counter(terms)
+        vector = {term: (1 + math.log(n)) * self.idf.get(term, self.unknown_idf) for term, n in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        return {term: weight / norm for term, weight in vector.items()}
+
+    def search(self, terms):
+        """(document, cosine similarity) of the best match for ``terms``, or (None, 0.0)."""
+        scores = defaultdict(float)
+        for term, weight in self.vector(terms).items():
+            for document, document_weight in self.postings.get(term, ()):
+                scores[document] += weight * document_weight
+        return max(scores.items(), key=lambda item: (item[1], -item[0]), default=(None, 0.0))
+
+
+_faq_index = None
+_faq_lock = threading.Lock()
+
+
+def faq_index():
+    global _faq_index
+    if _faq_index is None:
+        with _faq_lock:
+            if _faq_index is None:
+                # the question counts twice: it is what students will echo
+                _faq_index = Index([f'{question} {question} {answer}' for question, answer in FAQ])
+    return _faq_index
+
+
+@dataclass
+class Answer:
+    text: str
+    source: str  # 'faq', 'request' or 'fallback'
+    score: float = 0.0
+
+
+def describe(request):
+    created = timezone.localtime(request.created)
+    line = f'Your {request.get_request_type_display()} from {created:%B} {created.day} is {request.get_status_display()}'
+    return line + (', waiting for a lecturer.' if request.is_open and request.assignee_id is None else '.')
+
+
+def answer(question, requests=()):
+    """
+    Answer ``question`` for a student whose latest requests are ``requests``
+    (Request instances, newest first).
+    """
+    terms = tokenize(question)
+    faq, faq_score = faq_index().search(terms)
+    if requests and STATUS_TERMS.intersection(terms) and faq_score < CONFIDENT_SCORE:
+        documents = [f'{r.get_request_type_display()} {r.description}' for r in requests]
+        document, score = Index(documents).search([term for term in terms if term not in STATUS_TERMS])
+        if document is not None:
+            return Answer(describe(requests[document]), 'request', score)
+        # no particular request named: the latest few
+        return Answer(' '.join(describe(r) for r in requests[:3]), 'request')
+    if faq_score >= MIN_SCORE:
+        return Answer(FAQ[faq][1], 'faq', faq_score)
+    return Answer(FALLBACK, 'fallback', faq_score)
+
+
+async def stream(question, requests=()):
+    """Yield the reply as JSON lines: one per sentence, then a summary."""
+    started = time.perf_counter()
+    reply = answer(question, requests)
+    for sentence in re.split(r'(?<=[.!?])\s+', reply.text):
+        yield json.dumps({'text': sentence}) + '\n'
+    yield json.dumps({
+        'done': True, 'source': reply.source, 'score': round(reply.score, 3),
+        'ms': round((time.perf_counter() - started) * 1000, 3),
+    }) + '\n'
@@ -0,0 +1,21 @@
+"""Request records for the secretary's exports, streamed by users.exporter."""
+from .models import Request
+
+# (column, field) pairs
+REQUEST_COLUMNS = (
+    ('id', 'id'),
+    ('student', 'student__email'),
+    ('assignee', 'assignee__email'),
+    ('request_type', 'request_type'),
+    ('status', 'status'),
+    ('description', 'description'),
+    ('created', 'created'),
+    ('updated', 'updated'),
+)
+
+
+def requests(status=None):
+    rows = Request.objects.order_by('pk')
+    if status is not None:
+        rows = rows.filter(status=status)
+    return rows.values_list(*(field for _, field in REQUEST_COLUMNS))
@@ -0,0 +1,45 @@
+"""
+Versioned keys for the cached dashboard fragments.
+
+The student and lecturer panels are wrapped in ``{% cache %}`` blocks keyed
+on ``panel_key(user)``. The key includes a per-user version held in the
+default cache. Whatever changes a user's requests or counters calls
+``touch`` with their id, which gives them a new version. Fragments cached
+under the old key are never read again and expire after
+DASHBOARD_FRAGMENT_TIMEOUT.
+
+The key also includes the user's ``date_joined``. SQLite reuses the id of
+a deleted row, and this stops a new user from inheriting the old user's
+panels.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+
+def _version_key(user_id):
+    return f'dashboard:panel-version:{user_id}'
+
+
+def panel_key(user):
+    key = _version_key(user.pk)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return f'{user.pk}:{user.date_joined.timestamp()}:{version}'
+
+
+def touch(*user_ids):
+    """Give the users' panels a new version, now and again when the transaction commits."""
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+
+    def bump():
+        cache.set_many({_version_key(user_id): uuid.uuid4().hex for user_id in user_ids}, timeout=None)
+
+    bump()
+    # a render between now and the commit still reads the old rows and
+    # would cache them under the new version
+    if connection.in_atomic_block:
+        transaction.on_commit(bump)
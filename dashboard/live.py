@@ -0,0 +1,150 @@
+"""
+Live request status for the student and lecturer dashboards.
+
+The dashboard opens an EventSource on the ``live_updates`` view, which
+streams server-sent events from ``hub``, an in-process pub/sub keyed by
+user id. When a request changes status (Request.set_status) or is given to
+a lecturer (scheduler.assign), ``notify`` publishes a small event after the
+commit, and only the connections of that request's student and lecturer
+are woken.
+
+Each subscriber keeps at most LIVE_QUEUE_SIZE undelivered events. A client
+that falls further behind loses them and gets a ``resync`` event instead,
+on which the page reloads. An idle stream sends a comment every
+LIVE_HEARTBEAT seconds; writing it to a closed connection ends the stream,
+and its ``finally`` drops the subscriber. Streams also end after
+LIVE_MAX_AGE seconds, and EventSource reconnects by itself.
+
+Serve this from the ASGI app: an idle connection there is one suspended
+coroutine and a slotted Subscriber, with no thread and no queue until an
+event arrives (``manage.py loadtest_live`` measures it). The hub only sees
+changes made in its own process; with several worker processes, clients of
+the others see a change on their next page load.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+
+RESYNC = {'type': 'resync'}
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class Subscriber:
+    __slots__ = ('user_id', 'loop', 'events', 'waiter', 'overflowed')
+
+    def __init__(self, user_id, loop):
+        self.user_id = user_id
+        self.loop = loop
+        self.events = None
+        self.waiter = None
+        self.overflowed = False
+
+    def push(self, event):
+        # always called on self.loop, see Hub.publish
+        if self.events is None:
+            self.events = deque(maxlen=settings.LIVE_QUEUE_SIZE)
+        elif len(self.events) == self.events.maxlen:
+            self.overflowed = True
+        self.events.append(event)
+        if self.waiter is not None:
+            _wake(self.waiter)
+
+    async def get(self, timeout):
+        """The next event, RESYNC after an overflow, or None after ``timeout`` idle seconds."""
+        if not self.events:
+            # a bare future and timer: lighter than wait_for, which matters
+            # with thousands of idle streams
+            self.waiter = self.loop.create_future()
+            timer = self.loop.call_later(timeout, _wake, self.waiter)
+            try:
+                await self.waiter
+            finally:
+                timer.cancel()
+                self.waiter = None
+            if not self.events:
+                return None
+        if self.overflowed:
+            self.overflowed = False
+            self.events = None
+            return RESYNC
+        event = self.events.popleft()
+        if not self.events:
+            # idle subscribers hold no deque
+            self.events = None
+        return event
+
+
+class Hub:
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def subscribe(self, user_id):
+        """Subscribe the running event loop to ``user_id``'s events."""
+        subscriber = Subscriber(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.user_id]
+
+    def publish(self, user_ids, event):
+        """
+        Hand ``event`` to every subscriber of ``user_ids``, from any thread.
+        Returns how many there were.
+        """
+        with self._lock:
+            targets = [subscriber for user_id in user_ids for subscriber in self._subscribers.get(user_id, ())]
+        for subscriber in targets:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.push, event)
+            except RuntimeError:
+                # the loop has closed; its stream's finally unsubscribes it
+                pass
+        return len(targets)
+
+
+hub = Hub()
+
+
+def notify(user_ids, event):
+    """Publish ``event`` to the users once the current transaction commits."""
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    transaction.on_commit(lambda: hub.publish(user_ids, event))
+
+
+def format_event(event):
+    return f'event: {event["type"]}\ndata: {json.dumps(event)}\n\n'
+
+
+async def stream(user_id):
+    """Server-sent events for ``user_id`` until LIVE_MAX_AGE or a disconnect."""
+    subscriber = hub.subscribe(user_id)
+    loop = asyncio.get_running_loop()
+    try:
+        # milliseconds EventSource waits before reconnecting
+        yield 'retry: 5000\n\n'
+        deadline = loop.time() + settings.LIVE_MAX_AGE
+        while loop.time() < deadline:
+            event = await subscriber.get(min(settings.LIVE_HEARTBEAT, deadline - loop.time()))
+            yield ': heartbeat\n\n' if event is None else format_event(event)
+    finally:
+        hub.unsubscribe(subscriber)
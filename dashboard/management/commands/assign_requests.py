@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.assignment import scheduler
+
+
+class Command(BaseCommand):
+    help = 'Assign every open, unassigned request to the least-loaded lecturer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        assigned = scheduler.assign_pending(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Assigned {assigned} requests.'))
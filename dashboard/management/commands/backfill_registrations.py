@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard import registrations
+from dashboard.models import RegistrationRollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the registration rollups behind the secretary's stats panel "
+        "from the user table, in one transaction."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users = registrations.backfill()
+        self.stdout.write(f'{users} users in {RegistrationRollup.objects.count()} daily rows '
+                          f'in {time.perf_counter() - started:.1f}s')
@@ -0,0 +1,254 @@
+import itertools
+import json
+import platform
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template import Context, Engine
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from dashboard.models import Request, RequestCounter
+from users import activity
+from users.backends import EmailBackend
+
+User = get_user_model()
+
+SCALES = {'1k': 1000, '10k': 10000, '100k': 100000, '1m': 1000000}
+PASSWORD = 'bench-password'
+
+# role mix of the seeded user table
+LECTURER_EVERY = 20
+SECRETARY_EVERY = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the auth and dashboard paths against a throwaway database seeded '
+        'with N users and their requests. Prints JSON results; with --baseline '
+        'the command fails when a case regresses past --tolerance, so CI can '
+        'gate on it. Cases are compared as multiples of a calibration workload '
+        'timed in the same run, so a baseline saved on one machine holds on '
+        'another.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', nargs='+', default=['1k'],
+                            help='user counts: 1k, 10k, 100k, 1m or a number')
+        parser.add_argument('--requests-per-student', type=int, default=3)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--output', help='also write the JSON results to this file')
+        parser.add_argument('--baseline', help='compare against a results file written earlier')
+        parser.add_argument('--save-baseline', help='write the results to this file as the new baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='allowed p50 slowdown against the baseline (0.25 = 25%%)')
+        parser.add_argument('--real-hasher', action='store_true',
+                            help='time logins with the production PBKDF2 hasher instead of MD5')
+
+    def handle(self, *args, **options):
+        scales = [self.parse_scale(scale) for scale in options['scale']]
+        hashers = settings.PASSWORD_HASHERS if options['real_hasher'] else [
+            'django.contrib.auth.hashers.MD5PasswordHasher']
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # hash inline: this measures the views, not the hashing pool.
+            # Logged activity stays in memory, nothing writes it to the
+            # throwaway database from another thread.
+            with override_settings(PASSWORD_HASHERS=hashers, PASSWORD_HASHING_WORKERS=0,
+                                   ACTIVITY_FLUSH_INTERVAL=0):
+                results = {
+                    'meta': {
+                        'python': platform.python_version(),
+                        'machine': platform.machine(),
+                        'iterations': options['iterations'],
+                        'hasher': hashers[0].rsplit('.', 1)[-1],
+                    },
+                    'scales': {},
+                }
+                seeded = 0
+                for scale in sorted(scales):
+                    seeded = self.seed(seeded, scale, options['requests_per_student'])
+                    # right before the cases, so it sees the machine as they do
+                    calibration_ms = results['meta'].setdefault('calibration_ms', {})[str(scale)] = self.calibrate()
+                    results['scales'][str(scale)] = self.run_cases(scale, options['iterations'], calibration_ms)
+        finally:
+            activity.clear()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        text = json.dumps(results, indent=2)
+        self.stdout.write(text)
+        for path in (options['output'], options['save_baseline']):
+            if path:
+                with open(path, 'w', encoding='utf-8') as out:
+                    out.write(text + '\n')
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['tolerance'])
+
+    @staticmethod
+    def parse_scale(value):
+        value = value.lower()
+        if value in SCALES:
+            return SCALES[value]
+        try:
+            return int(value)
+        except ValueError:
+            raise CommandError(f'unknown scale {value!r}')
+
+    def seed(self, start, stop, requests_per_student, batch_size=5000):
+        """Grow the user table from ``start`` to ``stop`` users with bulk inserts."""
+        password = make_password(PASSWORD)
+        lecturers = list(User.objects.filter(role=User.Role.LECTURER).values_list('id', flat=True))
+        for low in range(start, stop, batch_size):
+            users = []
+            for i in range(low, min(low + batch_size, stop)):
+                role = (
+                    User.Role.SUPERUSER if i % SECRETARY_EVERY == 0 else
+                    User.Role.LECTURER if i % LECTURER_EVERY == 1 else
+                    User.Role.STUDENT
+                )
+                users.append(User(username=f'user{i}@example.com', email=f'user{i}@example.com',
+                                  password=password, role=role))
+            users = User.objects.bulk_create(users)
+            lecturers += [user.id for user in users if user.is_lect]
+
+            # requests and their counters, without going through Request.submit
+            requests, counters = [], {}
+            assignees = itertools.cycle(lecturers or [None])
+            for user in users:
+                if not user.is_student:
+                    continue
+                for n in range(requests_per_student):
+                    status = Request.Status.APPROVED if n % 2 else Request.Status.PENDING
+                    assignee = next(assignees)
+                    requests.append(Request(student_id=user.id, assignee_id=assignee,
+                                            request_type=Request.Type.GRADE_APPEAL, status=status))
+                    student = counters.setdefault(user.id, RequestCounter(user_id=user.id))
+                    student.total += 1
+                    if status == Request.Status.PENDING:
+                        student.pending += 1
+                    else:
+                        student.approved += 1
+                    if assignee is not None:
+                        lecturer = counters.setdefault(assignee, RequestCounter(user_id=assignee))
+                        if status == Request.Status.PENDING:
+                            lecturer.assigned_open += 1
+                        else:
+                            lecturer.assigned_closed += 1
+            Request.objects.bulk_create(requests, batch_size=1000)
+            RequestCounter.objects.bulk_create(
+                counters.values(), batch_size=1000, update_conflicts=True, unique_fields=['user'],
+                update_fields=['total', 'pending', 'approved', 'assigned_open', 'assigned_closed'],
+            )
+        return stop
+
+    @staticmethod
+    def calibrate(runs=50):
+        """
+        p50 milliseconds of a fixed workload on the machinery the cases use
+        (SQLite queries, template rendering) but none of the project's code.
+        """
+        template = Engine().from_string('{% for i in items %}<td>{{ i|add:1 }}</td>{% endfor %}')
+        context = Context({'items': range(200)})
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            with connection.cursor() as cursor:
+                for i in range(20):
+                    cursor.execute('SELECT %s', [i])
+                    cursor.fetchone()
+            template.render(context)
+            timings.append(time.perf_counter() - started)
+        return round(statistics.median(timings) * 1000, 3)
+
+    def run_cases(self, scale, iterations, calibration_ms):
+        student = User.objects.filter(role=User.Role.STUDENT).order_by('id').last()
+        lecturer = User.objects.filter(role=User.Role.LECTURER).order_by('id').last()
+        secretary = User.objects.filter(role=User.Role.SUPERUSER).order_by('id').last()
+        target = User.objects.filter(role=User.Role.STUDENT).order_by('id').first()
+        backend = EmailBackend()
+        counter = itertools.count()
+
+        def client_for(user):
+            client = Client()
+            client.force_login(user)
+            return client
+
+        student_client, lecturer_client, secretary_client = map(client_for, (student, lecturer, secretary))
+        anonymous = Client()
+        victims = iter(User.objects.bulk_create(
+            User(username=f'victim{i}-{scale}@example.com', email=f'victim{i}-{scale}@example.com', is_student=True)
+            for i in range(iterations + 5)
+        ))
+        roles = itertools.cycle(['student', 'lecturer'])
+
+        cases = {
+            'authenticate': lambda: backend.authenticate(None, username=student.email, password=PASSWORD),
+            'login_user': lambda: anonymous.post(reverse('login'), {'email': student.email, 'password': PASSWORD}),
+            'dashboard_student': lambda: student_client.get(reverse('dashboard')),
+            'dashboard_lecturer': lambda: lecturer_client.get(reverse('dashboard')),
+            'dashboard_secretary': lambda: secretary_client.get(reverse('dashboard')),
+            'dashboard_secretary_users': lambda: secretary_client.get(reverse('dashboard'), {'view': 'users'}),
+            'add_user': lambda: secretary_client.post(reverse('add_user'), {
+                'email': f'added{next(counter)}-{scale}@example.com', 'password': PASSWORD, 'role': 'student'}),
+            'change_user_role': lambda: secretary_client.post(reverse('change_user_role'), {
+                'user_id': target.id, 'role': next(roles)}),
+            'delete_user': lambda: secretary_client.post(reverse('delete_user'), {'user_id': next(victims).id}),
+        }
+
+        results = {}
+        for name, case in cases.items():
+            case()  # warm-up
+            timings = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                case()
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            results[name] = {
+                'p50_ms': round(statistics.median(timings) * 1000, 3),
+                'p95_ms': round(timings[int(len(timings) * 0.95) - 1] * 1000, 3),
+                'mean_ms': round(statistics.mean(timings) * 1000, 3),
+                # p50 in calibration units, what --baseline compares
+                'relative': round(statistics.median(timings) * 1000 / calibration_ms, 3),
+            }
+            self.stderr.write(f'[{scale} users] {name:<28} p50 {results[name]["p50_ms"]:.2f}ms')
+        return results
+
+    def compare(self, results, baseline_path, tolerance):
+        try:
+            with open(baseline_path, encoding='utf-8') as baseline_file:
+                baseline = json.load(baseline_file)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'cannot read baseline {baseline_path}: {exc}')
+
+        regressions = []
+        compared = 0
+        for scale, cases in results['scales'].items():
+            for name, timing in cases.items():
+                before = baseline.get('scales', {}).get(scale, {}).get(name)
+                if not before or not before.get('relative'):
+                    continue
+                compared += 1
+                ratio = timing['relative'] / before['relative']
+                line = (f'{scale:>8} {name:<28} {before["relative"]:>8.2f}x -> {timing["relative"]:>8.2f}x '
+                        f'calibration ({ratio - 1:+.0%}, p50 {timing["p50_ms"]:.2f}ms)')
+                if ratio > 1 + tolerance:
+                    regressions.append(line)
+                    self.stderr.write(self.style.ERROR(line))
+                else:
+                    self.stderr.write(line)
+        if not compared:
+            # a gate that compares nothing would always pass
+            raise CommandError(f'{baseline_path} has no case to compare with; save a new baseline')
+        if regressions:
+            raise CommandError(f'{len(regressions)} benchmark(s) regressed by more than {tolerance:.0%}')
@@ -0,0 +1,136 @@
+import functools
+import hashlib
+import os
+import resource
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http.multipartparser import MultiPartParser
+from django.test import override_settings
+
+from dashboard import attachments
+
+BOUNDARY = 'bench-boundary'
+BLOCK = 2 ** 20
+
+
+@functools.lru_cache
+def block(seed):
+    # shared by every upload of the same content, so the bench's own
+    # buffers do not swamp the memory it measures
+    return hashlib.sha256(str(seed).encode()).digest() * (BLOCK // 32)
+
+
+class Body:
+    """A multipart/form-data body with one ``size``-byte file, generated as it is read."""
+
+    def __init__(self, size, seed):
+        # seed picks the content, so equal seeds give identical files
+        self.parts = [
+            (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="request_id"\r\n\r\n1\r\n'
+             f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="bench-{seed}.bin"\r\n'
+             'Content-Type: application/octet-stream\r\n\r\n').encode(),
+            (block(seed), size),
+            f'\r\n--{BOUNDARY}--\r\n'.encode(),
+        ]
+        self.length = len(self.parts[0]) + size + len(self.parts[2])
+        self.offset = 0
+
+    def read(self, size=-1):
+        # one part at a time, never more than ``size`` bytes
+        head, (block, length), tail = self.parts
+        out = []
+        while size and self.offset < self.length:
+            if self.offset < len(head):
+                chunk = head[self.offset:self.offset + size]
+            elif self.offset < len(head) + length:
+                at = self.offset - len(head)
+                end = min(length - at, size, BLOCK - at % BLOCK)
+                chunk = block[at % BLOCK:at % BLOCK + end]
+            else:
+                at = self.offset - len(head) - length
+                chunk = tail[at:at + size]
+            out.append(chunk)
+            self.offset += len(chunk)
+            size -= len(chunk)
+        return b''.join(out)
+
+
+class Command(BaseCommand):
+    help = (
+        'Upload N files of --size MB at once through the attachment upload '
+        'handler (dashboard.attachments), each on its own thread as a '
+        'threaded server would: Django parses the multipart body, the handler '
+        'streams it to disk while hashing, and the file is stored under its '
+        'hash. Reports throughput and memory against the total uploaded. '
+        'Uses a throwaway ATTACHMENT_ROOT and no database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uploads', type=int, default=100)
+        parser.add_argument('--size', type=int, default=50, help='MB per upload')
+        parser.add_argument('--distinct', type=int, default=10, help='different contents among the uploads')
+
+    def handle(self, *args, **options):
+        uploads, size = options['uploads'], options['size'] * 2 ** 20
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(ATTACHMENT_ROOT=directory, ATTACHMENT_MAX_SIZE=size):
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            tracemalloc.start()
+            results, errors = [], []
+            start = threading.Barrier(uploads + 1)
+            workers = [
+                threading.Thread(target=self.upload, args=(size, n % options['distinct'], start, results, errors))
+                for n in range(uploads)
+            ]
+            for worker in workers:
+                worker.start()
+            start.wait()
+            started = time.perf_counter()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            tmp = os.path.join(directory, 'tmp')
+            stored = sum(len(files) for path, _, files in os.walk(directory) if path != tmp)
+            leftover = os.listdir(tmp)
+        if errors:
+            raise CommandError(f'{len(errors)} uploads failed, first: {errors[0]!r}')
+
+        total = uploads * size
+        self.stdout.write(
+            f'{uploads} concurrent uploads of {options["size"]} MB: {total / 2 ** 20 / elapsed:.0f} MB/s '
+            f'({elapsed:.1f}s), p50 {sorted(results)[len(results) // 2]:.1f}s per upload'
+        )
+        # ru_maxrss is in KB on Linux
+        self.stdout.write(
+            f'memory: {traced_peak / 2 ** 20:.1f} MB peak traced, RSS peak +{(rss_peak - rss_before) / 1024:.1f} MB, '
+            f'against {total / 2 ** 20:.0f} MB uploaded'
+        )
+        self.stdout.write(f'{stored} blobs stored for {options["distinct"]} distinct contents, '
+                          f'{len(leftover)} temporary files left')
+
+    @staticmethod
+    def upload(size, seed, start, results, errors):
+        body = Body(size, seed)
+        meta = {
+            'CONTENT_TYPE': f'multipart/form-data; boundary={BOUNDARY}',
+            'CONTENT_LENGTH': str(body.length),
+        }
+        handler = attachments.HashingUploadHandler()
+        start.wait()
+        started = time.perf_counter()
+        try:
+            _, files = MultiPartParser(meta, body, [handler], 'utf-8').parse()
+            upload = files['file']
+            attachments.place(upload)
+            upload.close()
+        except Exception as exc:
+            errors.append(exc)
+        else:
+            results.append(time.perf_counter() - started)
@@ -0,0 +1,86 @@
+import asyncio
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from dashboard import chatbot
+from dashboard.models import Request
+
+QUESTIONS = (
+    'how do I submit a request?',
+    'what is the status of my grade appeal?',
+    'is my exam extension approved yet',
+    'what does pending mean',
+    'who handles my request',
+    'I forgot my password',
+    'can I delete a request',
+    'what is the weather like',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Time chatbot answers (dashboard.chatbot) with many chat sessions '
+        'running at once on one event loop, as they would in one ASGI '
+        'worker. Fails when the p99 answer latency is over --budget-ms.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=300, help='concurrent chat sessions')
+        parser.add_argument('--questions', type=int, default=20, help='questions per session')
+        parser.add_argument('--requests', type=int, default=20, help="requests in each student's history")
+        parser.add_argument('--budget-ms', type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        chatbot.faq_index()
+        self.stdout.write(f'FAQ index built in {(time.perf_counter() - started) * 1000:.2f}ms')
+
+        history = self.history(options['requests'])
+        timings = asyncio.run(self.run(options['sessions'], options['questions'], history))
+        elapsed = sum(timings)
+        p50 = statistics.median(timings) * 1000
+        p99 = statistics.quantiles(timings, n=100)[98] * 1000 if len(timings) > 1 else p50
+        self.stdout.write(
+            f'{len(timings)} answers in {options["sessions"]} concurrent sessions: '
+            f'p50 {p50:.3f}ms  p99 {p99:.3f}ms  max {max(timings) * 1000:.3f}ms  '
+            f'({len(timings) / elapsed:.0f} answers/s of CPU)'
+        )
+        if p99 > options['budget_ms']:
+            raise CommandError(f'p99 {p99:.3f}ms is over the {options["budget_ms"]}ms budget')
+
+    @staticmethod
+    def history(count):
+        # unsaved rows: this times the engine, not the database
+        now = timezone.now()
+        rng = random.Random(0)
+        return [
+            Request(
+                id=i, student_id=1, assignee_id=rng.choice((None, 2)),
+                request_type=rng.choice(Request.Type.values), status=rng.choice(Request.Status.values),
+                description=f'course {rng.randrange(100)} {rng.choice(("midterm", "final", "lab"))}',
+                created=now - timedelta(days=i),
+            )
+            for i in range(count)
+        ]
+
+    async def run(self, sessions, questions, history):
+        timings = []
+
+        async def session(seed):
+            rng = random.Random(seed)
+            for _ in range(questions):
+                started = time.perf_counter()
+                async for _line in chatbot.stream(rng.choice(QUESTIONS), history):
+                    pass
+                timings.append(time.perf_counter() - started)
+                # hand the loop to the other sessions, as waiting on the
+                # client would
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*(session(seed) for seed in range(sessions)))
+        return timings
@@ -0,0 +1,123 @@
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from SmartRequestProject import db
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the development and production SQLite profiles '
+        '(SmartRequestProject.db) under concurrent load: each thread serves '
+        '"requests" that look a user up by email and, for --write-ratio of '
+        'them, then update that user, like a login. Runs against a throwaway '
+        'database file and prints throughput, latency and lock errors per profile.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0, help='run time per profile')
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        results = {profile: self.bench(profile, options) for profile in db.PROFILES}
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for profile, result in results.items():
+            self.stdout.write(
+                f'{profile:<12} {result["requests_per_s"]:>8.0f} req/s  p50 {result["p50_ms"]:.2f}ms  '
+                f'p99 {result["p99_ms"]:.2f}ms  {result["locked"]} "database is locked"'
+            )
+        base = results['development']['requests_per_s']
+        if base:
+            self.stdout.write(f'production/development throughput: {results["production"]["requests_per_s"] / base:.2f}x')
+
+    def bench(self, profile, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.sqlite3')
+            self.seed(path, options['users'])
+            deadline = time.perf_counter() + options['seconds']
+            timings, locked = [], []
+            workers = [
+                threading.Thread(target=self.worker, args=(profile, path, options, seed, deadline, timings, locked))
+                for seed in range(options['threads'])
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        return {
+            'threads': options['threads'],
+            'requests': len(timings),
+            'requests_per_s': len(timings) / options['seconds'],
+            'p50_ms': statistics.median(timings) * 1000 if timings else 0.0,
+            'p99_ms': statistics.quantiles(timings, n=100)[98] * 1000 if len(timings) > 1 else 0.0,
+            'locked': len(locked),
+        }
+
+    @staticmethod
+    def seed(path, users):
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT UNIQUE, role TEXT, last_login REAL)')
+        conn.executemany('INSERT INTO users (email, role) VALUES (?, ?)',
+                         ((f'user{i}@example.com', 'student') for i in range(users)))
+        conn.commit()
+        conn.close()
+
+    def worker(self, profile, path, options, seed, deadline, timings, locked):
+        rng = random.Random(seed)
+        production = profile == 'production'
+        if production:
+            # persistent, one read and one write connection per thread
+            reader = self.connect(path, settings.SQLITE_BUSY_TIMEOUT, db.READ_PRAGMAS)
+            writer = self.connect(path, settings.SQLITE_BUSY_TIMEOUT, db.PRAGMAS)
+        while time.perf_counter() < deadline:
+            email = f'user{rng.randrange(options["users"])}@example.com'
+            write = rng.random() < options['write_ratio']
+            started = time.perf_counter()
+            if not production:
+                # Django's defaults: a new connection per request, a 5s
+                # timeout and deferred transactions
+                reader = writer = self.connect(path, 5, ())
+            try:
+                user_id = reader.execute('SELECT id FROM users WHERE email = ?', (email,)).fetchone()[0]
+                if write:
+                    writer.execute('BEGIN IMMEDIATE' if production else 'BEGIN')
+                    try:
+                        writer.execute('SELECT role FROM users WHERE id = ?', (user_id,)).fetchone()
+                        writer.execute('UPDATE users SET last_login = ? WHERE id = ?', (time.time(), user_id))
+                        writer.execute('COMMIT')
+                    except sqlite3.Error:
+                        writer.execute('ROLLBACK')
+                        raise
+            except sqlite3.OperationalError as exc:
+                if 'locked' not in str(exc):
+                    raise
+                locked.append(1)
+            else:
+                timings.append(time.perf_counter() - started)
+            finally:
+                if not production:
+                    reader.close()
+        if production:
+            reader.close()
+            writer.close()
+
+    @staticmethod
+    def connect(path, timeout, pragmas):
+        conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        for pragma in pragmas:
+            conn.execute(pragma)
+        return conn
@@ -0,0 +1,92 @@
+import copy
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from dashboard.models import Request
+
+User = get_user_model()
+
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def templates_setting(cached):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    # explicit loaders, which Django does not wrap in the cached loader
+    templates[0].pop('APP_DIRS', None)
+    loaders = LOADERS
+    templates[0]['OPTIONS']['loaders'] = [('django.template.loaders.cached.Loader', loaders)] if cached else loaders
+    return templates
+
+
+class Command(BaseCommand):
+    help = (
+        'Time dashboard requests for each role against a throwaway database, '
+        'with no template caching, with the cached template loader, and with '
+        'the loader plus the dashboard fragment cache.'
+    )
+
+    # (label, cached loader, fragment timeout)
+    MODES = [
+        ('uncached', False, 0),
+        ('cached loader', True, 0),
+        ('loader + fragments', True, 300),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='requests per student and lecturer')
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            clients = self.seed(options['requests'])
+            self.stdout.write(f'{"role":<12}' + ''.join(f'{label:>22}' for label, _, _ in self.MODES))
+            rows = {role: [] for role in clients}
+            for _, cached, timeout in self.MODES:
+                cache.clear()
+                with override_settings(TEMPLATES=templates_setting(cached), DASHBOARD_FRAGMENT_TIMEOUT=timeout):
+                    for role, client in clients.items():
+                        rows[role].append(self.time(client, options['iterations']))
+            for role, timings in rows.items():
+                self.stdout.write(f'{role:<12}' + ''.join(f'{t * 1000:>19.3f} ms' for t in timings))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, count):
+        student = User.objects.create(username='student@example.com', email='student@example.com', is_student=True)
+        lecturer = User.objects.create(username='lect@example.com', email='lect@example.com', is_lect=True)
+        secretary = User.objects.create(username='sec@example.com', email='sec@example.com', is_superuser=True)
+        for _ in range(count):
+            Request.submit(student, Request.Type.GRADE_APPEAL, 'benchmark', assignee=lecturer)
+        clients = {}
+        for role, user in (('student', student), ('lecturer', lecturer), ('secretary', secretary)):
+            clients[role] = Client()
+            clients[role].force_login(user)
+        return clients
+
+    def time(self, client, iterations):
+        """Median seconds per dashboard request, after one warm-up."""
+        url = reverse('dashboard')
+        client.get(url)
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            client.get(url)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
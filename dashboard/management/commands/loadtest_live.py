@@ -0,0 +1,89 @@
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import live
+
+
+class Command(BaseCommand):
+    help = (
+        'Hold N idle live-status streams (dashboard.live) on one event loop, '
+        'as one ASGI worker would, and report the memory each costs. Then '
+        'publish events from another thread, like the sync views do, and time '
+        'the fan-out. Cancelling the streams at the end stands in for the '
+        'clients disconnecting; every subscriber must be gone afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=10000)
+        parser.add_argument('--users', type=int, help='distinct users, one connection each by default')
+        parser.add_argument('--events', type=int, default=200)
+
+    def handle(self, *args, **options):
+        users = options['users'] or options['connections']
+        report = asyncio.run(self.run(options['connections'], users, options['events']))
+        self.stdout.write(
+            f'{options["connections"]} idle streams: {report["bytes_per_connection"]:.0f} bytes each '
+            f'({report["traced_mb"]:.1f} MB traced), subscribed in {report["connect_s"]:.2f}s'
+        )
+        self.stdout.write(
+            f'{report["delivered"]} events delivered: p50 {report["p50_ms"]:.3f}ms  p99 {report["p99_ms"]:.3f}ms'
+        )
+        if report['left']:
+            raise CommandError(f'{report["left"]} subscribers were not cleaned up')
+        self.stdout.write('all subscribers cleaned up')
+
+    async def run(self, connections, users, events):
+        latencies = []
+
+        async def client(user_id):
+            async for chunk in live.stream(user_id):
+                if chunk.startswith('event: status'):
+                    event = json.loads(chunk.split('data: ', 1)[1])
+                    latencies.append(time.perf_counter() - event['sent'])
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(client(n % users)) for n in range(connections)]
+        while len(live.hub) < connections:
+            await asyncio.sleep(0.01)
+        connect = time.perf_counter() - started
+        # one pass so every stream is parked in Subscriber.get
+        await asyncio.sleep(0.1)
+        traced = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        def publish():
+            rng = random.Random(0)
+            for n in range(events):
+                live.hub.publish([rng.randrange(users)], {'type': 'status', 'id': n, 'sent': time.perf_counter()})
+                time.sleep(0.001)
+
+        expected = events * (connections // users)
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        await asyncio.to_thread(publisher.join)
+        deadline = time.perf_counter() + 5
+        while len(latencies) < expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        return {
+            'bytes_per_connection': traced / connections,
+            'traced_mb': traced / 2 ** 20,
+            'connect_s': connect,
+            'delivered': len(latencies),
+            'p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+            'p99_ms': statistics.quantiles(latencies, n=100)[98] * 1000 if len(latencies) > 1 else 0.0,
+            'left': len(live.hub),
+        }
@@ -0,0 +1,81 @@
+import json
+import statistics
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Summarise the per-request records written by PerfMiddleware into a '
+        'per-view hot-path report, hottest (most total wall time) first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=None, help='defaults to PERF_LOG_PATH')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--sort', choices=['total', 'p99', 'sql', 'count'], default='total')
+        parser.add_argument('--json', action='store_true', help='print the report as JSON')
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.PERF_LOG_PATH
+        views = defaultdict(lambda: {'wall': [], 'sql_count': 0, 'sql_ms': 0.0, 'template_ms': 0.0, 'errors': 0})
+        try:
+            log = open(path, encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(f'cannot read {path}: {exc}')
+        with log:
+            for line in log:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                view = views[record['view']]
+                view['wall'].append(record['wall_ms'])
+                view['sql_count'] += record['sql_count']
+                view['sql_ms'] += record['sql_ms']
+                view['template_ms'] += record['template_ms']
+                view['errors'] += record['status'] >= 500
+
+        rows = [self.summarise(name, data) for name, data in views.items()]
+        key = {'total': 'total_ms', 'p99': 'p99_ms', 'sql': 'queries_per_request', 'count': 'requests'}[options['sort']]
+        rows.sort(key=lambda row: row[key], reverse=True)
+        rows = rows[:options['top']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+        self.stdout.write(
+            f'{"view":<28} {"reqs":>7} {"total s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+            f'{"q/req":>6} {"sql ms":>8} {"tpl ms":>8} {"5xx":>5}'
+        )
+        for row in rows:
+            self.stdout.write(
+                f'{row["view"]:<28} {row["requests"]:>7} {row["total_ms"] / 1000:>9.2f} '
+                f'{row["p50_ms"]:>8.1f} {row["p95_ms"]:>8.1f} {row["p99_ms"]:>8.1f} '
+                f'{row["queries_per_request"]:>6.1f} {row["sql_ms_per_request"]:>8.2f} '
+                f'{row["template_ms_per_request"]:>8.2f} {row["errors"]:>5}'
+            )
+
+    @staticmethod
+    def summarise(name, data):
+        wall = sorted(data['wall'])
+        count = len(wall)
+        if count > 1:
+            quantiles = statistics.quantiles(wall, n=100)
+            p50, p95, p99 = quantiles[49], quantiles[94], quantiles[98]
+        else:
+            p50 = p95 = p99 = wall[0]
+        return {
+            'view': name,
+            'requests': count,
+            'total_ms': sum(wall),
+            'p50_ms': p50,
+            'p95_ms': p95,
+            'p99_ms': p99,
+            'queries_per_request': data['sql_count'] / count,
+            'sql_ms_per_request': data['sql_ms'] / count,
+            'template_ms_per_request': data['template_ms'] / count,
+            'errors': data['errors'],
+        }
@@ -0,0 +1,109 @@
+import heapq
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from dashboard.assignment import LoadBalancer, scheduler
+from dashboard.models import Request, RequestCounter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a synthetic deadline-burst submission trace through the lecturer '
+        'scheduler and report assignment latency and load skew. By default only '
+        'the in-memory heap is exercised; --db also runs the claim UPDATEs '
+        'against a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lecturers', type=int, default=50)
+        parser.add_argument('--submissions', type=int, default=10000)
+        parser.add_argument('--minutes', type=float, default=5.0, help='length of the burst')
+        parser.add_argument('--mean-handling-minutes', type=float, default=30.0,
+                            help='mean time a lecturer takes to close a request')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--db', action='store_true')
+
+    def handle(self, *args, **options):
+        trace = self.trace(options)
+        if options['db']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                self.replay_db(trace, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        else:
+            self.replay_memory(trace, options)
+
+    def trace(self, options):
+        """(arrival minute, handling minutes) per submission, arrivals Poisson over the burst."""
+        rng = random.Random(options['seed'])
+        rate = options['submissions'] / options['minutes']
+        now, trace = 0.0, []
+        for _ in range(options['submissions']):
+            now += rng.expovariate(rate)
+            trace.append((now, rng.expovariate(1 / options['mean_handling_minutes'])))
+        return trace
+
+    def replay_memory(self, trace, options):
+        balancer = LoadBalancer({lecturer: 0 for lecturer in range(options['lecturers'])})
+        closing = []  # (minute, lecturer)
+        latencies, skews = [], []
+        for arrival, handling in trace:
+            while closing and closing[0][0] <= arrival:
+                _, lecturer = heapq.heappop(closing)
+                balancer.add(lecturer, -1)
+            started = time.perf_counter()
+            lecturer = balancer.pick()
+            balancer.add(lecturer, 1)
+            latencies.append(time.perf_counter() - started)
+            heapq.heappush(closing, (arrival + handling, lecturer))
+            skews.append(balancer.skew())
+        self.report('in-memory', latencies, skews, balancer.loads(), trace)
+
+    def replay_db(self, trace, options):
+        lecturers = User.objects.bulk_create(
+            User(username=f'lect{i}@example.com', email=f'lect{i}@example.com', is_lect=True)
+            for i in range(options['lecturers'])
+        )
+        student = User.objects.create(username='student@example.com', email='student@example.com', is_student=True)
+        scheduler.invalidate()
+
+        closing = []  # (minute, request)
+        latencies, skews = [], []
+        for arrival, handling in trace:
+            while closing and closing[0][0] <= arrival:
+                _, _, request = heapq.heappop(closing)
+                request.set_status(Request.Status.APPROVED)
+            request = Request.submit(student, Request.Type.EXAM_EXTENSION)
+            started = time.perf_counter()
+            scheduler.assign(request)
+            latencies.append(time.perf_counter() - started)
+            heapq.heappush(closing, (arrival + handling, request.pk, request))
+            skews.append(scheduler._current().skew())
+
+        loads = dict(
+            RequestCounter.objects.filter(pk__in=[lecturer.pk for lecturer in lecturers])
+            .values_list('pk', 'assigned_open')
+        )
+        self.report('database', latencies, skews, loads, trace)
+
+    def report(self, mode, latencies, skews, loads, trace):
+        quantiles = statistics.quantiles(latencies, n=100)
+        burst_minutes = trace[-1][0] if trace else 0
+        self.stdout.write(f'{mode}: {len(trace)} submissions over {burst_minutes:.1f} simulated minutes '
+                          f'({len(trace) / max(burst_minutes, 1e-9):.0f}/min), {len(loads)} lecturers')
+        self.stdout.write(f'assignment latency  p50 {quantiles[49] * 1e6:.1f}us  '
+                          f'p99 {quantiles[98] * 1e6:.1f}us  max {max(latencies) * 1e6:.1f}us')
+        self.stdout.write(f'throughput          {len(latencies) / sum(latencies):.0f} assignments/s')
+        self.stdout.write(f'load skew (max-min) mean {statistics.mean(skews):.2f}  max {max(skews)}')
+        values = list(loads.values()) or [0]
+        self.stdout.write(f'open per lecturer at end  min {min(values)}  max {max(values)}  '
+                          f'stdev {statistics.pstdev(values):.2f}')
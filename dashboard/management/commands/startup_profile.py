@@ -0,0 +1,157 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: import the entry point, then serve one
+# request through it, the way a newly booted worker would.
+PROBE = r'''
+import asyncio, json, sys, time
+started = time.perf_counter()
+entry = sys.argv[1]
+application = __import__(f'SmartRequestProject.{entry}', fromlist=['application']).application
+imported = time.perf_counter()
+status = []
+if entry == 'wsgi':
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[2], 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'wsgi.url_scheme': 'http', 'wsgi.input': sys.stdin.buffer,
+        'wsgi.errors': sys.stderr,
+    }
+    body = application(environ, lambda code, headers, exc_info=None: status.append(int(code.split()[0])))
+    b''.join(body)
+    body.close()
+else:
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': sys.argv[2], 'raw_path': sys.argv[2].encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'localhost')], 'server': ('localhost', 80), 'client': ('127.0.0.1', 1),
+    }
+    async def serve():
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        done = asyncio.Event()
+        async def receive():
+            # the body, then a disconnect once the response is out
+            if messages:
+                return messages.pop()
+            await done.wait()
+            return {'type': 'http.disconnect'}
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif not message.get('more_body'):
+                done.set()
+        await application(scope, receive, send)
+    asyncio.run(serve())
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000, 'first_request_ms': (served - imported) * 1000,
+    'status': status[0] if status else None, 'modules': len(sys.modules),
+}))
+'''
+
+
+def group(module):
+    # django.contrib.admin.options -> django.contrib.admin, users.views -> users
+    parts = module.split('.')
+    if parts[0] == 'django':
+        return '.'.join(parts[:3] if parts[1:2] == ['contrib'] else parts[:2])
+    return parts[0]
+
+
+def parse_importtime(stderr):
+    """{module: self microseconds} from ``python -X importtime`` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(own)
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        'Profile a cold worker: boot a fresh interpreter, import the WSGI or '
+        'ASGI entry point and serve one request through it, under python -X '
+        'importtime. Reports the median import and first-request times over '
+        '--runs boots, the modules loaded, and the import cost per package. '
+        'Save a run with --json and pass it to --baseline later to see the '
+        'difference.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entry', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--path', default='/accounts/login/', help='the first request')
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--json', action='store_true', help='print the report as JSON')
+        parser.add_argument('--baseline', help='a report saved with --json to compare with')
+
+    def handle(self, *args, **options):
+        runs = [self.boot(options['entry'], options['path']) for _ in range(options['runs'])]
+        report = {
+            'entry': options['entry'],
+            'path': options['path'],
+            'status': runs[0]['status'],
+            'modules': runs[0]['modules'],
+            'import_ms': statistics.median(run['import_ms'] for run in runs),
+            'first_request_ms': statistics.median(run['first_request_ms'] for run in runs),
+            'boot_ms': statistics.median(run['import_ms'] + run['first_request_ms'] for run in runs),
+            # median milliseconds of own import time per package
+            'packages': self.packages([run['imports'] for run in runs]),
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        baseline = self.load(options['baseline']) if options['baseline'] else None
+        self.stdout.write(f'{report["entry"]}: GET {report["path"]} -> {report["status"]}, '
+                          f'{report["modules"]} modules, median of {len(runs)} boots')
+        for key, label in (('import_ms', 'import'), ('first_request_ms', 'first request'), ('boot_ms', 'boot')):
+            line = f'  {label:<14} {report[key]:>8.1f}ms'
+            if baseline:
+                line += f'  (was {baseline[key]:.1f}ms, {report[key] - baseline[key]:+.1f}ms)'
+            self.stdout.write(line)
+        if baseline:
+            self.stdout.write(f'  modules        {report["modules"]:>8}    (was {baseline["modules"]})')
+        self.stdout.write(f'\n  {"package":<36} {"own ms":>8}')
+        for package, ms in list(report['packages'].items())[:options['top']]:
+            line = f'  {package:<36} {ms:>8.1f}'
+            if baseline:
+                line += f'  (was {baseline["packages"].get(package, 0.0):.1f})'
+            self.stdout.write(line)
+
+    @staticmethod
+    def boot(entry, path):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'SmartRequestProject.settings')}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, entry, path],
+            capture_output=True, text=True, env=env, stdin=subprocess.DEVNULL,
+        )
+        if result.returncode:
+            raise CommandError(f'the {entry} probe failed:\n{result.stderr[-2000:]}')
+        run = json.loads(result.stdout.strip().splitlines()[-1])
+        run['imports'] = parse_importtime(result.stderr)
+        return run
+
+    @staticmethod
+    def packages(boots):
+        totals = defaultdict(lambda: [0.0] * len(boots))
+        for n, imports in enumerate(boots):
+            for module, own_us in imports.items():
+                totals[group(module)][n] += own_us / 1000
+        medians = {package: statistics.median(ms) for package, ms in totals.items()}
+        return dict(sorted(medians.items(), key=lambda item: -item[1]))
+
+    @staticmethod
+    def load(path):
+        try:
+            with open(path, encoding='utf-8') as saved:
+                return json.load(saved)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'cannot read {path}: {exc}')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from dashboard import attachments
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete stored attachment content that no attachment has used for '
+        'ATTACHMENT_SWEEP_GRACE seconds, and files left behind by '
+        'interrupted uploads. Safe to run while uploads come in.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, help='seconds, instead of ATTACHMENT_SWEEP_GRACE')
+
+    def handle(self, *args, **options):
+        deleted = attachments.sweep(options['grace'])
+        self.stdout.write(f'{deleted} unused blobs deleted')
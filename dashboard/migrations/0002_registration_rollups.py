@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:13
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill(apps, schema_editor):
+    # same as dashboard.registrations.backfill, on the historical models
+    User = apps.get_model('users', 'User')
+    RegistrationRollup = apps.get_model('dashboard', 'RegistrationRollup')
+    RegistrationTotal = apps.get_model('dashboard', 'RegistrationTotal')
+    rows = User.objects.annotate(day=TruncDate('date_joined')).values('day', 'role').annotate(n=Count('id'))
+    totals = {}
+    for row in rows:
+        RegistrationRollup.objects.create(day=row['day'], role=row['role'], count=row['n'])
+        totals[row['role']] = totals.get(row['role'], 0) + row['n']
+    RegistrationTotal.objects.bulk_create(RegistrationTotal(role=role, count=count) for role, count in totals.items())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_request_tracking'),
+        ('users', '0005_user_role'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistrationTotal',
+            fields=[
+                ('count', models.IntegerField(default=0)),
+                ('role', models.CharField(blank=True, max_length=10, primary_key=True, serialize=False)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='RegistrationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('day', models.DateField()),
+                ('role', models.CharField(blank=True, max_length=10)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'role'), name='registration_rollup_day_role_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,247 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import fragments, live
 
 # Create your models here.
+
+
+class Request(models.Model):
+    """
+    A student request (grade appeal, exam extension, ...).
+
+    Always create requests with ``Request.submit`` and change their status
+    with ``set_status``: both keep the per-user RequestCounter rows in step
+    inside the same transaction, which is what the dashboard stats read.
+    """
+
+    class Type(models.TextChoices):
+        GRADE_APPEAL = 'grade_appeal', 'Grade Appeal'
+        GRADE_REVIEW = 'grade_review', 'Grade Review'
+        EXAM_EXTENSION = 'exam_extension', 'Exam Extension'
+        OTHER = 'other', 'Other'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        IN_PROGRESS = 'in_progress', 'In Progress'
+        APPROVED = 'approved', 'Approved'
+        REJECTED = 'rejected', 'Rejected'
+
+    OPEN_STATUSES = (Status.PENDING, Status.IN_PROGRESS)
+
+    # the composite indexes below lead with these columns, so the FKs do
+    # not need indexes of their own
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        related_name='requests', db_index=False,
+    )
+    assignee = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='assigned_requests', db_index=False,
+    )
+    request_type = models.CharField(max_length=32, choices=Type.choices)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    description = models.TextField(blank=True)
+    created = models.DateTimeField(default=timezone.now)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # "My Recent Requests"
+            models.Index(fields=['student', 'created'], name='request_student_created_idx'),
+            # "Assigned Requests"
+            models.Index(fields=['assignee', 'status', 'created'], name='request_assignee_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_request_type_display()} by {self.student_id} ({self.status})'
+
+    @property
+    def is_open(self):
+        return self.status in self.OPEN_STATUSES
+
+    @classmethod
+    def submit(cls, student, request_type, description='', assignee=None):
+        with transaction.atomic():
+            request = cls.objects.create(
+                student=student, assignee=assignee,
+                request_type=request_type, description=description,
+            )
+            RequestCounter.bump(student.pk, total=1, pending=1)
+            if assignee is not None:
+                RequestCounter.bump(assignee.pk, assigned_open=1)
+        return request
+
+    def set_status(self, status):
+        """
+        Move the request to ``status`` and update both users' counters.
+
+        The row is updated only if it still has the status this instance
+        holds, so two concurrent transitions cannot both be counted; the
+        loser reloads and retries against the new status. Returns False
+        when the request already had ``status``.
+        """
+        while True:
+            with transaction.atomic():
+                old = self.status
+                if old == status:
+                    return False
+                changed = Request.objects.filter(pk=self.pk, status=old).update(
+                    status=status, updated=timezone.now())
+                if changed:
+                    fragments.touch(self.student_id, self.assignee_id)
+                    deltas = {}
+                    _add(deltas, STUDENT_COUNTER[old], -1)
+                    _add(deltas, STUDENT_COUNTER[status], 1)
+                    RequestCounter.bump(self.student_id, **deltas)
+                    if self.assignee_id is not None:
+                        deltas = {}
+                        _add(deltas, ASSIGNEE_COUNTER[old], -1)
+                        _add(deltas, ASSIGNEE_COUNTER[status], 1)
+                        RequestCounter.bump(self.assignee_id, **deltas)
+                        if deltas.get('assigned_open'):
+                            from .assignment import scheduler
+                            assignee_id, delta = self.assignee_id, deltas['assigned_open']
+                            transaction.on_commit(lambda: scheduler.adjust(assignee_id, delta))
+                    self.status = status
+                    live.notify((self.student_id, self.assignee_id), {
+                        'type': 'status', 'id': self.pk, 'status': status, 'label': self.Status(status).label,
+                    })
+                    return True
+            self.refresh_from_db(fields=['status', 'assignee'])
+
+
+class RequestCounter(models.Model):
+    """Precomputed request totals per user, read by the dashboard stats cards."""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        primary_key=True, related_name='request_counter',
+    )
+    # as the submitting student
+    total = models.PositiveIntegerField(default=0)
+    pending = models.PositiveIntegerField(default=0)
+    approved = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    # as the assigned lecturer
+    assigned_open = models.PositiveIntegerField(default=0)
+    assigned_closed = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'counters for {self.user_id}'
+
+    @classmethod
+    def for_user(cls, user):
+        """The user's counters, or an unsaved all-zero row if they have none yet."""
+        try:
+            return cls.objects.get(pk=user.pk)
+        except cls.DoesNotExist:
+            return cls(user=user)
+
+    @classmethod
+    def bump(cls, user_id, create=True, **deltas):
+        """
+        Atomically add ``deltas`` (field -> int) to the user's counters,
+        creating the row first unless ``create`` is False.
+        """
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        updates = {field: F(field) + delta for field, delta in deltas.items()}
+        if not cls.objects.filter(pk=user_id).update(**updates) and create:
+            cls.objects.get_or_create(pk=user_id)
+            cls.objects.filter(pk=user_id).update(**updates)
+
+
+# status -> counter field it is counted under, per side of the request
+STUDENT_COUNTER = {
+    Request.Status.PENDING: 'pending',
+    Request.Status.IN_PROGRESS: 'pending',
+    Request.Status.APPROVED: 'approved',
+    Request.Status.REJECTED: 'rejected',
+}
+ASSIGNEE_COUNTER = {
+    Request.Status.PENDING: 'assigned_open',
+    Request.Status.IN_PROGRESS: 'assigned_open',
+    Request.Status.APPROVED: 'assigned_closed',
+    Request.Status.REJECTED: 'assigned_closed',
+}
+
+
+def _add(deltas, field, delta):
+    deltas[field] = deltas.get(field, 0) + delta
+
+
+class Rollup(models.Model):
+    """A running count, moved by ``bump`` with atomic UPDATEs."""
+
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def bump(cls, delta, create=True, **key):
+        """
+        Add ``delta`` to the row identified by ``key``, creating it first
+        unless ``create`` is False.
+        """
+        if not delta:
+            return
+        if not cls.objects.filter(**key).update(count=F('count') + delta) and create:
+            cls.objects.get_or_create(**key)
+            cls.objects.filter(**key).update(count=F('count') + delta)
+
+
+class RegistrationRollup(Rollup):
+    """Users who joined on ``day`` and have ``role`` now, see dashboard.registrations."""
+
+    day = models.DateField()
+    role = models.CharField(max_length=10, blank=True)
+
+    class Meta:
+        constraints = [
+            # the chart's range scan over recent days
+            models.UniqueConstraint(fields=['day', 'role'], name='registration_rollup_day_role_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.day} {self.role or "no role"}: {self.count}'
+
+
+class RegistrationTotal(Rollup):
+    """Users who have ``role`` now, whenever they joined."""
+
+    role = models.CharField(max_length=10, blank=True, primary_key=True)
+
+    def __str__(self):
+        return f'{self.role or "no role"}: {self.count}'
+
+
+class Blob(models.Model):
+    """Stored file content, kept once per SHA-256, see dashboard.attachments."""
+
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    created = models.DateTimeField(default=timezone.now)
+    # last stored or attached; the sweep leaves recently used blobs alone
+    last_used = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.sha256[:12]} ({self.size} bytes)'
+
+
+class Attachment(models.Model):
+    """A file a student attached to a request."""
+
+    request = models.ForeignKey(Request, on_delete=models.CASCADE, related_name='attachments')
+    # blobs outlive their attachments until the sweep deletes them
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, related_name='attachments')
+    name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=255)
+    created = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.name
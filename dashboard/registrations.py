@@ -0,0 +1,100 @@
+"""
+Registration rollups behind the secretary's stats panel.
+
+RegistrationRollup counts users per (day joined, current role) and
+RegistrationTotal counts them per role. The receivers in dashboard.signals
+keep both current as users are created, deleted or change role, one
+statement per affected row instead of an aggregate over users_user on every
+read. ``chart`` and ``total`` then cost a range scan over a few days' rows
+and a read of a handful of rows, however many users there are.
+
+``manage.py backfill_registrations`` recomputes both tables from users_user,
+for history from before the rollups existed or after raw SQL edits.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import RegistrationRollup, RegistrationTotal
+
+# longest chart the endpoint serves
+MAX_CHART_DAYS = 366
+
+
+def day_of(user):
+    return timezone.localdate(user.date_joined)
+
+
+def tally(users):
+    """{(day, role): number of users} for a user queryset, in one GROUP BY."""
+    return {
+        (row['day'], row['role']): row['n']
+        for row in users.annotate(day=TruncDate('date_joined')).values('day', 'role').annotate(n=Count('id'))
+    }
+
+
+def record(deltas):
+    """
+    Add ``deltas``, {(day, role): change in users}, to both rollups.
+
+    A decrement never creates a row: a missing row means the rollups
+    predate those users, and only a backfill can put them right.
+    """
+    totals = Counter()
+    with transaction.atomic(savepoint=False):
+        for (day, role), delta in sorted(deltas.items()):
+            RegistrationRollup.bump(delta, create=delta > 0, day=day, role=role)
+            totals[role] += delta
+        for role, delta in sorted(totals.items()):
+            RegistrationTotal.bump(delta, create=delta > 0, role=role)
+
+
+def move(deltas, role):
+    """Record the users counted in ``deltas`` changing from their role to ``role``."""
+    moved = Counter()
+    for (day, old_role), count in deltas.items():
+        moved[day, old_role] -= count
+        moved[day, role] += count
+    record(moved)
+
+
+def backfill():
+    """Rebuild both rollups from users_user. Returns the number of users counted."""
+    counts = tally(get_user_model().objects.all())
+    totals = Counter()
+    for (day, role), count in counts.items():
+        totals[role] += count
+    with transaction.atomic():
+        RegistrationRollup.objects.all().delete()
+        RegistrationTotal.objects.all().delete()
+        RegistrationRollup.objects.bulk_create(
+            (RegistrationRollup(day=day, role=role, count=count) for (day, role), count in counts.items()),
+            batch_size=1000,
+        )
+        RegistrationTotal.objects.bulk_create(RegistrationTotal(role=role, count=count) for role, count in totals.items())
+    return sum(totals.values())
+
+
+def total():
+    """{role: users}, roles without users left out."""
+    return {role: count for role, count in RegistrationTotal.objects.values_list('role', 'count') if count}
+
+
+def chart(days):
+    """
+    Registrations per day for the last ``days`` days up to today, as a list
+    of dates and a list of daily counts per role, zero-filled.
+    """
+    today = timezone.localdate()
+    dates = [today - timedelta(days=n) for n in range(days - 1, -1, -1)]
+    index = {day: n for n, day in enumerate(dates)}
+    series = {role: [0] * days for role in get_user_model().Role.values}
+    for day, role, count in RegistrationRollup.objects.filter(day__gte=dates[0], day__lte=today).values_list(
+            'day', 'role', 'count'):
+        series.setdefault(role, [0] * days)[index[day]] = count
+    return {'days': [day.isoformat() for day in dates], 'series': series}
@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from users.signals import bulk_deleting, users_created, users_deleting, users_updated, users_updating
+
+from . import fragments, registrations
+from .assignment import scheduler
+from .models import ASSIGNEE_COUNTER, STUDENT_COUNTER, Attachment, Request, RequestCounter
+
+
+@receiver(post_save, sender=Request)
+def refresh_request_panels(sender, instance, **kwargs):
+    fragments.touch(instance.student_id, instance.assignee_id)
+
+
+@receiver(post_save, sender=Attachment)
+def refresh_attachment_panels(sender, instance, **kwargs):
+    fragments.touch(instance.request.student_id, instance.request.assignee_id)
+
+
+@receiver(post_delete, sender=Request)
+def uncount_deleted_request(sender, instance, **kwargs):
+    if instance.student_id in bulk_deleting.get():
+        # counted in delete_requests_in_bulk
+        return
+    fragments.touch(instance.student_id, instance.assignee_id)
+    # the users may be being deleted in the same cascade: never recreate rows
+    RequestCounter.bump(instance.student_id, create=False, total=-1, **{STUDENT_COUNTER[instance.status]: -1})
+    if instance.assignee_id is not None:
+        RequestCounter.bump(instance.assignee_id, create=False, **{ASSIGNEE_COUNTER[instance.status]: -1})
+
+
+def _assignable(role, is_active):
+    return role == get_user_model().Role.LECTURER and is_active
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_lecturer_pool(sender, instance, created, **kwargs):
+    # only a lecturer joining or leaving changes who can be assigned work;
+    # registrations and logins leave the pool alone
+    now = _assignable(instance.role, instance.is_active)
+    if created:
+        before = False
+    else:
+        previous = instance.__dict__.get('_previous_state')
+        if previous is None:
+            return
+        before = _assignable(*previous)
+    if before != now:
+        scheduler.invalidate()
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def refresh_lecturer_pool_on_delete(sender, instance, **kwargs):
+    if _assignable(instance.role, instance.is_active):
+        scheduler.invalidate()
+
+
+@receiver(users_updated)
+def refresh_lecturer_pool_in_bulk(sender, ids, fields, **kwargs):
+    if {'role', 'is_active'} & set(fields):
+        scheduler.invalidate()
+
+
+@receiver(users_deleting)
+def delete_requests_in_bulk(sender, ids, **kwargs):
+    """
+    Delete the chunk's own requests before the users go.
+
+    Left to uncount_deleted_request, every request would be un-counted with
+    its own UPDATE. The students' counter rows are deleted with them, so
+    only the lecturers who stay need their counts taken down, one UPDATE per
+    lecturer, and uncount_deleted_request skips these requests. Their
+    attachments are deleted with them; the blobs stay for the sweep.
+    """
+    requests = Request.objects.filter(student_id__in=ids)
+    lecturers = (
+        requests.filter(assignee__isnull=False).exclude(assignee_id__in=ids)
+        .values('assignee_id')
+        .annotate(
+            open=Count('id', filter=Q(status__in=Request.OPEN_STATUSES)),
+            closed=Count('id', filter=~Q(status__in=Request.OPEN_STATUSES)),
+        )
+        .values_list('assignee_id', 'open', 'closed')
+    )
+    for assignee_id, open_count, closed_count in lecturers:
+        RequestCounter.bump(assignee_id, create=False, assigned_open=-open_count, assigned_closed=-closed_count)
+        fragments.touch(assignee_id)
+    requests.delete()
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_previous_state(sender, instance, update_fields=None, **kwargs):
+    # only saves that may change the role or is_active pay for the lookup;
+    # the others clear what an earlier save of this instance left behind
+    previous = None
+    if not instance._state.adding and (update_fields is None or {'role', 'is_active'} & set(update_fields)):
+        previous = sender.objects.filter(pk=instance.pk).values_list('role', 'is_active').first()
+    instance._previous_state = previous
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def count_saved_registration(sender, instance, created, **kwargs):
+    day = registrations.day_of(instance)
+    if created:
+        registrations.record({(day, instance.role): 1})
+        return
+    previous = instance.__dict__.get('_previous_state')
+    if previous is not None and previous[0] != instance.role:
+        registrations.move({(day, previous[0]): 1}, instance.role)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def uncount_deleted_registration(sender, instance, **kwargs):
+    if instance.pk in bulk_deleting.get():
+        # counted in uncount_registrations_in_bulk
+        return
+    registrations.record({(registrations.day_of(instance), instance.role): -1})
+
+
+@receiver(users_created)
+def count_registrations_in_bulk(sender, ids, **kwargs):
+    registrations.record(registrations.tally(get_user_model().objects.filter(pk__in=ids)))
+
+
+@receiver(users_updating)
+def move_registrations_in_bulk(sender, ids, fields, **kwargs):
+    if 'role' in fields:
+        users = get_user_model().objects.filter(pk__in=ids).exclude(role=fields['role'])
+        registrations.move(registrations.tally(users), fields['role'])
+
+
+@receiver(users_deleting)
+def uncount_registrations_in_bulk(sender, ids, **kwargs):
+    deltas = registrations.tally(get_user_model().objects.filter(pk__in=ids))
+    registrations.record({key: -count for key, count in deltas.items()})
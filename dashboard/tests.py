@@ -1,3 +1,708 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import AsyncClient, TestCase, Client, override_settings
+from django.contrib.admin import AdminSite
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core import checks
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from dashboard import attachments, chatbot, fragments, live, registrations
+from dashboard.assignment import LoadBalancer, scheduler
+from dashboard.management.commands.bench import Command as BenchCommand
+from dashboard.models import Attachment, Blob, Request, RequestCounter
+from users import bulk
+from users.models import ActivityEvent
+from SmartRequestProject import db
+from users.importer import import_roster
+
+User = get_user_model()
+
+
+class UserManagementPaginationTest(TestCase):
+    def setUp(self):
+        """Create a secretary and a handful of students/lecturers to page through."""
+        self.client = Client()
+        self.secretary = User.objects.create(
+            username='secretary@example.com',
+            email='secretary@example.com',
+            is_superuser=True,
+        )
+        for i in range(5):
+            User.objects.create(username=f'student{i}@example.com', email=f'student{i}@example.com', is_student=True)
+        for i in range(3):
+            User.objects.create(username=f'lect{i}@example.com', email=f'lect{i}@example.com', is_lect=True)
+        self.client.force_login(self.secretary)
+        self.dashboard_url = reverse('dashboard')
+
+    def emails(self, response):
+        return [u.email for u in response.context['users']]
+
+    def test_pages_follow_cursor_without_overlap(self):
+        """Walking the next_query links visits every user once, in email order."""
+        seen = []
+        query = 'view=users'
+        with mock.patch('dashboard.views.USERS_PAGE_SIZE', 3):
+            while query:
+                response = self.client.get(f'{self.dashboard_url}?{query}')
+                seen.extend(self.emails(response))
+                query = response.context['next_query']
+
+        expected = sorted(User.objects.exclude(id=self.secretary.id).values_list('email', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_role_filter(self):
+        response = self.client.get(self.dashboard_url, {'view': 'users', 'role': 'lecturer'})
+        self.assertEqual(self.emails(response), ['lect0@example.com', 'lect1@example.com', 'lect2@example.com'])
+
+    def test_email_prefix_filter(self):
+        response = self.client.get(self.dashboard_url, {'view': 'users', 'q': 'student3'})
+        self.assertEqual(self.emails(response), ['student3@example.com'])
+
+    def test_secretary_excluded_and_last_page_has_no_next(self):
+        response = self.client.get(self.dashboard_url, {'view': 'users'})
+        self.assertNotIn('secretary@example.com', self.emails(response))
+        self.assertIsNone(response.context['next_query'])
+
+    def test_overview_does_not_query_users(self):
+        """The overview page never touches the user list."""
+        response = self.client.get(self.dashboard_url)
+        self.assertNotIn('users', response.context)
+
+
+class UserSearchEndpointTest(TestCase):
+    def setUp(self):
+        self.secretary = User.objects.create(username='sec@example.com', email='sec@example.com', is_superuser=True)
+        User.objects.create(username='dana@uni.ac.il', email='dana@uni.ac.il', first_name='Dana', is_lect=True)
+
+    def test_suggestions(self):
+        self.client.force_login(self.secretary)
+        results = self.client.get(reverse('user_search'), {'q': 'ana@'}).json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual((results[0]['email'], results[0]['first_name'], results[0]['role']),
+                         ('dana@uni.ac.il', 'Dana', 'Lecturer'))
+        self.assertNotIn('is_lect', results[0])
+
+    def test_secretary_only(self):
+        self.assertEqual(self.client.get(reverse('user_search'), {'q': 'dana'}).status_code, 403)
+
+
+class RequestCountersTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.student = User.objects.create(username='student@example.com', email='student@example.com', is_student=True)
+        self.lecturer = User.objects.create(username='lect@example.com', email='lect@example.com', is_lect=True)
+
+    def counters(self, user):
+        return RequestCounter.objects.get(pk=user.pk)
+
+    def test_transitions_keep_counters_in_step(self):
+        first = Request.submit(self.student, Request.Type.GRADE_APPEAL, assignee=self.lecturer)
+        second = Request.submit(self.student, Request.Type.EXAM_EXTENSION, assignee=self.lecturer)
+        first.set_status(Request.Status.IN_PROGRESS)
+        first.set_status(Request.Status.APPROVED)
+        second.set_status(Request.Status.REJECTED)
+        self.assertFalse(second.set_status(Request.Status.REJECTED))
+
+        student = self.counters(self.student)
+        self.assertEqual((student.total, student.pending, student.approved, student.rejected), (2, 0, 1, 1))
+        lecturer = self.counters(self.lecturer)
+        self.assertEqual((lecturer.assigned_open, lecturer.assigned_closed), (0, 2))
+
+    def test_stale_instance_does_not_double_count(self):
+        """Two copies of one request racing to a status only count once."""
+        request = Request.submit(self.student, Request.Type.GRADE_APPEAL)
+        stale = Request.objects.get(pk=request.pk)
+        request.set_status(Request.Status.APPROVED)
+        stale.set_status(Request.Status.APPROVED)
+        counters = self.counters(self.student)
+        self.assertEqual((counters.pending, counters.approved), (0, 1))
+
+    def test_deleting_a_request_uncounts_it(self):
+        request = Request.submit(self.student, Request.Type.GRADE_APPEAL, assignee=self.lecturer)
+        request.delete()
+        self.assertEqual((self.counters(self.student).total, self.counters(self.student).pending), (0, 0))
+        self.assertEqual(self.counters(self.lecturer).assigned_open, 0)
+
+    def test_bulk_delete_uncounts_lecturer_requests(self):
+        Request.submit(self.student, Request.Type.GRADE_APPEAL, assignee=self.lecturer)
+        closed = Request.submit(self.student, Request.Type.GRADE_REVIEW, assignee=self.lecturer)
+        closed.set_status(Request.Status.APPROVED)
+        bulk.bulk_delete(bulk.select_users([self.student.pk]))
+        self.assertFalse(Request.objects.exists())
+        lecturer = self.counters(self.lecturer)
+        self.assertEqual((lecturer.assigned_open, lecturer.assigned_closed), (0, 0))
+
+    def test_student_dashboard_reads_counters(self):
+        self.client.force_login(self.student)
+        self.client.post(reverse('submit_request'), {'request_type': 'grade_appeal', 'description': 'Exam 2'})
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['counters'].total, 1)
+        self.assertEqual(len(response.context['recent_requests']), 1)
+        self.assertContains(response, 'Grade Appeal')
+
+    def test_lecturer_updates_assigned_request(self):
+        request = Request.submit(self.student, Request.Type.GRADE_REVIEW, assignee=self.lecturer)
+        self.client.force_login(self.lecturer)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(list(response.context['assigned_requests']), [request])
+
+        self.client.post(reverse('update_request_status'), {'request_id': request.id, 'status': 'approved'})
+        request.refresh_from_db()
+        self.assertEqual(request.status, Request.Status.APPROVED)
+        self.assertEqual(self.counters(self.lecturer).assigned_closed, 1)
+
+
+    def test_only_the_assigned_lecturer_updates_a_request(self):
+        unassigned = Request.submit(self.student, Request.Type.GRADE_REVIEW)
+        self.client.post(reverse('update_request_status'), {'request_id': unassigned.id, 'status': 'approved'})
+        self.client.force_login(self.student)
+        self.client.post(reverse('update_request_status'), {'request_id': unassigned.id, 'status': 'approved'})
+        unassigned.refresh_from_db()
+        self.assertEqual(unassigned.status, Request.Status.PENDING)
+
+
+class DashboardFragmentCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create(username='student@example.com', email='student@example.com', is_student=True)
+        self.lecturer = User.objects.create(username='lect@example.com', email='lect@example.com', is_lect=True)
+        scheduler.invalidate()
+
+    def test_cached_panels_skip_their_queries(self):
+        self.client.force_login(self.student)
+        self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('dashboard'))
+        self.assertFalse(any('dashboard_request' in q['sql'] for q in queries.captured_queries))
+
+    def test_submitting_refreshes_both_panels(self):
+        self.client.force_login(self.lecturer)
+        self.assertContains(self.client.get(reverse('dashboard')), 'No open requests assigned to you.')
+        self.client.force_login(self.student)
+        self.assertContains(self.client.get(reverse('dashboard')), 'You have not submitted any requests yet.')
+
+        self.client.post(reverse('submit_request'), {'request_type': 'exam_extension'})
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'Exam Extension')
+        self.assertEqual(response.context['counters'].total, 1)
+
+        self.client.force_login(self.lecturer)
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'student@example.com')
+
+    def test_status_change_refreshes_lecturer_table(self):
+        request = Request.submit(self.student, Request.Type.GRADE_REVIEW, assignee=self.lecturer)
+        self.client.force_login(self.lecturer)
+        self.assertContains(self.client.get(reverse('dashboard')), 'student@example.com')
+        self.client.post(reverse('update_request_status'), {'request_id': request.id, 'status': 'rejected'})
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'No open requests assigned to you.')
+
+    def test_reused_id_does_not_inherit_panels(self):
+        Request.submit(self.student, Request.Type.GRADE_APPEAL)
+        self.client.force_login(self.student)
+        self.assertContains(self.client.get(reverse('dashboard')), 'Grade Appeal')
+        key = fragments.panel_key(self.student)
+        self.student.date_joined += timedelta(seconds=1)
+        self.assertNotEqual(fragments.panel_key(self.student), key)
+
+    def test_lecturer_table_is_one_query(self):
+        for _ in range(3):
+            Request.submit(self.student, Request.Type.GRADE_APPEAL, assignee=self.lecturer)
+        self.client.force_login(self.lecturer)
+        with self.settings(DASHBOARD_FRAGMENT_TIMEOUT=0), CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('dashboard'))
+        self.assertEqual(sum('FROM "dashboard_request"' in q['sql'] for q in queries.captured_queries), 1)
+
+    def test_timeout_zero_disables_caching(self):
+        self.client.force_login(self.student)
+        with self.settings(DASHBOARD_FRAGMENT_TIMEOUT=0):
+            self.client.get(reverse('dashboard'))
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('dashboard'))
+        self.assertTrue(any('dashboard_request' in q['sql'] for q in queries.captured_queries))
+
+
+class LecturerSchedulerTest(TestCase):
+    def setUp(self):
+        self.student = User.objects.create(username='student@example.com', email='student@example.com', is_student=True)
+        self.busy = User.objects.create(username='busy@example.com', email='busy@example.com', is_lect=True)
+        self.idle = User.objects.create(username='idle@example.com', email='idle@example.com', is_lect=True)
+        for _ in range(2):
+            Request.submit(self.student, Request.Type.GRADE_REVIEW, assignee=self.busy)
+
+    def test_new_requests_go_to_least_loaded_lecturer(self):
+        assigned = []
+        for _ in range(4):
+            request = Request.submit(self.student, Request.Type.EXAM_EXTENSION)
+            assigned.append(scheduler.assign(request))
+        # idle catches up to busy first, then they alternate
+        self.assertEqual(assigned[:2], [self.idle.id, self.idle.id])
+        self.assertEqual(sorted(assigned[2:]), sorted([self.busy.id, self.idle.id]))
+        self.assertEqual(RequestCounter.objects.get(pk=self.idle.pk).assigned_open, 3)
+
+    def test_request_is_claimed_once(self):
+        request = Request.submit(self.student, Request.Type.EXAM_EXTENSION)
+        stale = Request.objects.get(pk=request.pk)
+        self.assertIsNotNone(scheduler.assign(request))
+        self.assertIsNone(scheduler.assign(stale))
+        total_open = sum(RequestCounter.objects.filter(pk__in=[self.busy.pk, self.idle.pk])
+                         .values_list('assigned_open', flat=True))
+        self.assertEqual(total_open, 3)
+
+    def test_removed_lecturer_is_skipped(self):
+        scheduler.rebuild()
+        # as if another process had demoted the idle lecturer
+        User.objects.filter(pk=self.idle.pk).update(role=User.Role.NONE)
+        request = Request.submit(self.student, Request.Type.EXAM_EXTENSION)
+        self.assertEqual(scheduler.assign(request), self.busy.id)
+
+    def test_only_lecturer_changes_drop_the_pool(self):
+        balancer = scheduler.rebuild()
+        User.objects.create(username='new@example.com', email='new@example.com', is_student=True)
+        self.student.first_name = 'Noa'
+        self.student.save()
+        self.assertIs(scheduler._current(), balancer)
+        self.student.role = User.Role.LECTURER
+        self.student.save(update_fields=['role'])
+        self.assertIsNot(scheduler._current(), balancer)
+
+    def test_invalidate_during_rebuild(self):
+        scheduler.invalidate()
+        rebuild = scheduler.rebuild
+
+        def rebuild_then_invalidate():
+            balancer = rebuild()
+            scheduler.invalidate()
+            return balancer
+
+        with mock.patch.object(scheduler, 'rebuild', rebuild_then_invalidate):
+            request = Request.submit(self.student, Request.Type.EXAM_EXTENSION)
+            self.assertEqual(scheduler.assign(request), self.idle.id)
+
+    def test_closing_requests_frees_capacity(self):
+        for request in Request.objects.filter(assignee=self.busy):
+            request.set_status(Request.Status.APPROVED)
+        scheduler.rebuild()
+        self.assertEqual(LoadBalancer(scheduler._current().loads()).skew(), 0)
+
+    def test_submit_view_assigns(self):
+        self.client.force_login(self.student)
+        self.client.post(reverse('submit_request'), {'request_type': 'other'})
+        self.assertEqual(Request.objects.latest('id').assignee, self.idle)
+
+
+class PerfInstrumentationTest(TestCase):
+    def setUp(self):
+        self.log = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False)
+        self.log.close()
+        self.addCleanup(os.unlink, self.log.name)
+        self.secretary = User.objects.create(username='sec@example.com', email='sec@example.com', is_superuser=True)
+
+    def test_records_per_view_and_reports(self):
+        with self.settings(PERF_INSTRUMENTATION=True, PERF_LOG_PATH=self.log.name, PERF_BUFFER_SIZE=1):
+            client = Client()
+            client.force_login(self.secretary)
+            client.get(reverse('dashboard'), {'view': 'users'})
+            client.get(reverse('login'))
+
+        with open(self.log.name) as log:
+            records = [json.loads(line) for line in log]
+        by_view = {record['view']: record for record in records}
+        self.assertGreater(by_view['dashboard']['sql_count'], 0)
+        self.assertGreater(by_view['dashboard']['template_ms'], 0)
+        self.assertEqual(by_view['login']['status'], 200)
+
+        out = io.StringIO()
+        call_command('perf_report', path=self.log.name, json=True, stdout=out)
+        report = {row['view']: row for row in json.loads(out.getvalue())}
+        self.assertEqual(report['dashboard']['requests'], 1)
+
+    async def test_async_views_are_instrumented(self):
+        await User.objects.acreate(username='lect@example.com', email='lect@example.com',
+                                   password=make_password('Secret-pass-1'), is_lect=True)
+        with self.settings(PERF_INSTRUMENTATION=True, PERF_LOG_PATH=self.log.name, PERF_BUFFER_SIZE=1):
+            response = await AsyncClient().post(reverse('login'), {'email': 'lect@example.com', 'password': 'Secret-pass-1'})
+        self.assertEqual(response.status_code, 302)
+
+        with open(self.log.name) as log:
+            record = json.loads(log.readline())
+        self.assertEqual((record['view'], record['status']), ('login', 302))
+        # the queries ran in aauthenticate's sync_to_async thread
+        self.assertGreater(record['sql_count'], 0)
+
+    def test_disabled_by_default(self):
+        Client().get(reverse('login'))
+        with open(self.log.name) as log:
+            self.assertEqual(log.read(), '')
+
+
+class BenchCommandTest(TestCase):
+    def test_seed_keeps_counters_consistent(self):
+        BenchCommand().seed(0, 60, requests_per_student=2)
+        self.assertEqual(User.objects.count(), 60)
+        counters = RequestCounter.objects.all()
+        self.assertEqual(sum(c.total for c in counters), Request.objects.count())
+        self.assertEqual(
+            sum(c.assigned_open for c in counters),
+            Request.objects.filter(status=Request.Status.PENDING, assignee__isnull=False).count(),
+        )
+
+    def test_baseline_regression_fails(self):
+        baseline = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        json.dump({'scales': {'1000': {'dashboard_student': {'p50_ms': 1.0, 'relative': 4.0}}}}, baseline)
+        baseline.close()
+        self.addCleanup(os.unlink, baseline.name)
+
+        command = BenchCommand(stderr=io.StringIO())
+        # a machine twice as slow: the same multiple of its calibration
+        slower_machine = {'scales': {'1000': {'dashboard_student': {'p50_ms': 2.0, 'relative': 4.4}}}}
+        command.compare(slower_machine, baseline.name, tolerance=0.25)
+        slower_code = {'scales': {'1000': {'dashboard_student': {'p50_ms': 1.0, 'relative': 6.0},
+                                           'new_case': {'p50_ms': 9.0, 'relative': 9.0}}}}
+        with self.assertRaises(CommandError):
+            command.compare(slower_code, baseline.name, tolerance=0.25)
+        with self.assertRaisesMessage(CommandError, 'no case to compare'):
+            command.compare({'scales': {'5000': slower_machine['scales']['1000']}}, baseline.name, tolerance=0.25)
+
+    def test_calibration(self):
+        self.assertGreater(BenchCommand.calibrate(runs=3), 0)
+
+    def test_startup_profile(self):
+        out = io.StringIO()
+        call_command('startup_profile', runs=1, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['status'], 200)
+        self.assertGreater(report['boot_ms'], 0)
+        self.assertIn('django.db', report['packages'])
+
+    def test_checks_cover_the_lazily_loaded_admin(self):
+        with mock.patch('SmartRequestProject.lazy_admin.autodiscover') as autodiscover:
+            self.assertEqual(checks.run_checks(tags=[checks.Tags.admin]), [])
+        autodiscover.assert_called_once_with()
+        site = AdminSite(name='misconfigured')
+        site.register(ActivityEvent, list_display=('no_such_field',))
+        errors = checks.run_checks(tags=[checks.Tags.admin])
+        self.assertEqual([error.id for error in errors], ['admin.E108'])
+
+class RegistrationRollupTest(TestCase):
+    def setUp(self):
+        self.secretary = User.objects.create(username='sec@example.com', email='sec@example.com', is_superuser=True)
+        self.student = User.objects.create(username='s@example.com', email='s@example.com', is_student=True)
+
+    def totals(self):
+        return registrations.total()
+
+    def test_single_user_changes(self):
+        self.assertEqual(self.totals(), {'superuser': 1, 'student': 1})
+        self.student.role = User.Role.LECTURER
+        self.student.save(update_fields=['role'])
+        self.assertEqual(self.totals(), {'superuser': 1, 'lecturer': 1})
+        self.student.delete()
+        self.assertEqual(self.totals(), {'superuser': 1})
+
+    def test_plain_queryset_deletes_are_counted(self):
+        User.objects.filter(pk=self.student.pk).delete()
+        self.assertEqual(self.totals(), {'superuser': 1})
+
+    def test_logins_do_not_look_up_the_role(self):
+        self.student.last_login = self.student.date_joined
+        with self.assertNumQueries(1):
+            self.student.save(update_fields=['last_login'])
+
+    def test_bulk_paths_and_backfill_agree(self):
+        import_roster(io.StringIO('email,role\na@example.com,student\nb@example.com,lecturer\n'))
+        bulk.bulk_set_role(bulk.select_users(role='student'), 'lecturer')
+        bulk.bulk_delete(bulk.select_users(ids=[self.student.pk]))
+        incremental = (self.totals(), registrations.chart(3))
+        self.assertEqual(incremental[0], {'superuser': 1, 'lecturer': 2})
+
+        self.assertEqual(registrations.backfill(), 3)
+        self.assertEqual((self.totals(), registrations.chart(3)), incremental)
+
+    def test_endpoint(self):
+        self.client.force_login(self.secretary)
+        with self.assertNumQueries(3):  # the user, then two small rollup reads
+            data = self.client.get(reverse('registration_stats'), {'days': 5}).json()
+        self.assertEqual(len(data['days']), 5)
+        self.assertEqual(data['series']['student'], [0, 0, 0, 0, 1])
+        self.assertEqual((data['total'], data['by_role']), (2, {'superuser': 1, 'student': 1}))
+
+    def test_endpoint_is_for_secretaries(self):
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(reverse('registration_stats')).status_code, 403)
+
+    def test_card_shows_the_total(self):
+        self.client.force_login(self.secretary)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['users_registered'], 2)
+
+
+class SqliteProfileTest(TestCase):
+    def test_production_profile(self):
+        databases = db.sqlite_databases('app.sqlite3', 'production')
+        self.assertEqual(set(databases), {'default', 'read'})
+        self.assertIsNone(databases['default']['CONN_MAX_AGE'])
+        self.assertEqual(databases['default']['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertNotIn('transaction_mode', databases['read']['OPTIONS'])
+        self.assertIn('journal_mode = WAL', databases['default']['OPTIONS']['init_command'])
+        self.assertIn('query_only = ON', databases['read']['OPTIONS']['init_command'])
+        self.assertNotIn('query_only', databases['default']['OPTIONS']['init_command'])
+        self.assertEqual(set(db.sqlite_databases('app.sqlite3')), {'default'})
+        with self.assertRaises(ValueError):
+            db.sqlite_databases('app.sqlite3', 'fast')
+
+    def test_router_keeps_reads_in_open_transactions(self):
+        router = db.ReadWriteRouter()
+        # TestCase runs every test inside a transaction
+        self.assertEqual(router.db_for_read(User), 'default')
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(router.db_for_read(User), 'read')
+            self.assertEqual(router.db_for_write(User), 'default')
+        self.assertFalse(router.allow_migrate('read', 'users'))
+
+    def test_bench_sqlite(self):
+        out = io.StringIO()
+        call_command('bench_sqlite', threads=2, seconds=0.2, users=50, json=True, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertGreater(results['production']['requests'], 0)
+        self.assertEqual(results['production']['locked'], 0)
+
+
+class ChatbotTest(TestCase):
+    def setUp(self):
+        self.student = User.objects.create(username='s@example.com', email='s@example.com', is_student=True)
+        self.appeal = Request.submit(self.student, Request.Type.GRADE_APPEAL, 'calculus final')
+        self.extension = Request.submit(self.student, Request.Type.EXAM_EXTENSION, 'physics midterm')
+        self.extension.set_status(Request.Status.APPROVED)
+        self.requests = list(self.student.requests.order_by('-created'))
+
+    def test_faq(self):
+        reply = chatbot.answer('How can I submit a new request?')
+        self.assertEqual(reply.source, 'faq')
+        self.assertIn('Submit New Request', reply.text)
+        self.assertEqual(chatbot.answer('what is the weather like').source, 'fallback')
+
+    def test_status_questions_read_the_students_requests(self):
+        reply = chatbot.answer('is my exam extension approved?', self.requests)
+        self.assertEqual(reply.source, 'request')
+        self.assertIn('Exam Extension', reply.text)
+        self.assertIn('Approved', reply.text)
+        # no request named: the latest ones
+        self.assertIn('Grade Appeal', chatbot.answer("what's the status of my requests", self.requests).text)
+        # a question about what a status means is still an FAQ
+        self.assertEqual(chatbot.answer('what does pending mean?', self.requests).source, 'faq')
+
+    async def test_view_streams_json_lines(self):
+        await self.async_client.aforce_login(self.student)
+        response = await self.async_client.post(reverse('chat'), {'message': 'status of my grade appeal'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) async for line in response.streaming_content]
+        self.assertIn('Grade Appeal', ' '.join(line.get('text', '') for line in lines))
+        self.assertEqual(lines[-1]['source'], 'request')
+
+    async def test_view_is_for_students(self):
+        secretary = await User.objects.acreate(username='sec@example.com', email='sec@example.com', is_superuser=True)
+        await self.async_client.aforce_login(secretary)
+        response = await self.async_client.post(reverse('chat'), {'message': 'hello'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_bench_chat(self):
+        out = io.StringIO()
+        call_command('bench_chat', sessions=5, questions=4, requests=5, budget_ms=1000, stdout=out)
+        self.assertIn('20 answers in 5 concurrent sessions', out.getvalue())
+
+
+class LiveUpdatesTest(TestCase):
+    def setUp(self):
+        self.student = User.objects.create(username='s@example.com', email='s@example.com', is_student=True)
+        self.lecturer = User.objects.create(username='l@example.com', email='l@example.com', is_lect=True)
+
+    def test_status_change_is_published_to_both_sides_after_commit(self):
+        scheduler.invalidate()
+        with mock.patch.object(live.hub, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                item = Request.submit(self.student, Request.Type.OTHER)
+                scheduler.assign(item)
+            publish.assert_called_once_with([self.lecturer.pk], {'type': 'assigned', 'id': item.pk})
+            with self.captureOnCommitCallbacks(execute=True):
+                item.set_status(Request.Status.APPROVED)
+        publish.assert_called_with([self.student.pk, self.lecturer.pk], {
+            'type': 'status', 'id': item.pk, 'status': 'approved', 'label': 'Approved'})
+
+    @override_settings(LIVE_HEARTBEAT=0.01)
+    async def test_stream_delivers_heartbeats_and_events_then_unsubscribes(self):
+        stream = live.stream(self.student.pk)
+        self.assertEqual(await anext(stream), 'retry: 5000\n\n')
+        self.assertEqual(await anext(stream), ': heartbeat\n\n')
+        # only this user's subscribers
+        self.assertEqual(live.hub.publish([self.lecturer.pk], {'type': 'status', 'id': 1}), 0)
+        self.assertEqual(live.hub.publish([self.student.pk], {'type': 'status', 'id': 2}), 1)
+        self.assertEqual(await anext(stream), 'event: status\ndata: {"type": "status", "id": 2}\n\n')
+        await stream.aclose()
+        self.assertEqual(len(live.hub), 0)
+
+    @override_settings(LIVE_QUEUE_SIZE=2)
+    async def test_slow_client_is_told_to_resync(self):
+        subscriber = live.hub.subscribe(self.student.pk)
+        self.addCleanup(live.hub.unsubscribe, subscriber)
+        for n in range(3):
+            subscriber.push({'type': 'status', 'id': n})
+        self.assertEqual(await subscriber.get(1), live.RESYNC)
+        self.assertIsNone(await subscriber.get(0.01))
+
+    async def test_view_is_for_students_and_lecturers(self):
+        secretary = await User.objects.acreate(username='sec@example.com', email='sec@example.com', is_superuser=True)
+        await self.async_client.aforce_login(secretary)
+        self.assertEqual((await self.async_client.get(reverse('live_updates'))).status_code, 403)
+
+    def test_no_stream_under_wsgi(self):
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(reverse('live_updates')).status_code, 204)
+        self.assertNotContains(self.client.get(reverse('dashboard')), 'EventSource')
+
+    async def test_dashboard_opens_the_stream_under_asgi(self):
+        await self.async_client.aforce_login(self.student)
+        self.assertContains(await self.async_client.get(reverse('dashboard')), 'EventSource')
+
+    def test_loadtest_live(self):
+        out = io.StringIO()
+        call_command('loadtest_live', connections=50, events=10, stdout=out)
+        self.assertIn('all subscribers cleaned up', out.getvalue())
+
+
+
+class AttachmentTest(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        storage = override_settings(ATTACHMENT_ROOT=root)
+        storage.enable()
+        self.addCleanup(storage.disable)
+        self.student = User.objects.create(username='s@example.com', email='s@example.com', is_student=True)
+        self.request = Request.submit(self.student, Request.Type.OTHER)
+        self.client.force_login(self.student)
+
+    def upload(self, content, name='notes.txt', request=None):
+        return self.client.post(reverse('upload_attachment'), {
+            'request_id': (request or self.request).pk, 'file': SimpleUploadedFile(name, content, 'text/plain'),
+        })
+
+    def temp_files(self):
+        return os.listdir(attachments.temp_dir())
+
+    def test_identical_uploads_are_stored_once(self):
+        other = Request.submit(self.student, Request.Type.OTHER)
+        self.upload(b'medical certificate')
+        self.upload(b'medical certificate', name='copy.txt', request=other)
+        self.assertEqual(Attachment.objects.count(), 2)
+        blob = Blob.objects.get()
+        self.assertEqual(blob.size, 19)
+        with open(attachments.blob_path(blob.sha256), 'rb') as stored:
+            self.assertEqual(stored.read(), b'medical certificate')
+        self.assertEqual(self.temp_files(), [])
+
+    def test_uploads_over_the_limit_are_refused(self):
+        with override_settings(ATTACHMENT_MAX_SIZE=10):
+            # cut off while streaming
+            self.upload(b'x' * 20)
+            # refused by Content-Length, unread
+            self.upload(b'x' * (attachments.MULTIPART_OVERHEAD + 20))
+        self.assertFalse(Attachment.objects.exists())
+        self.assertEqual(self.temp_files(), [])
+
+    def test_only_the_owner_can_attach(self):
+        other = User.objects.create(username='o@example.com', email='o@example.com', is_student=True)
+        self.client.force_login(other)
+        self.upload(b'not mine')
+        self.assertFalse(Attachment.objects.exists())
+        self.assertEqual(self.temp_files(), [])
+
+    def test_download_with_ranges_and_etag(self):
+        self.upload(b'0123456789')
+        url = reverse('download_attachment', args=[Attachment.objects.get().pk])
+        response = self.client.get(url)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('attachment; filename="notes.txt"', response['Content-Disposition'])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        response = self.client.get(url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=10-').status_code, 416)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_download_is_for_the_student_lecturer_and_secretaries(self):
+        self.upload(b'private')
+        url = reverse('download_attachment', args=[Attachment.objects.get().pk])
+        other = User.objects.create(username='o@example.com', email='o@example.com', is_student=True)
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 404)
+        secretary = User.objects.create(username='sec@example.com', email='sec@example.com', is_superuser=True)
+        self.client.force_login(secretary)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_sweep_deletes_only_unused_blobs(self):
+        self.upload(b'kept')
+        self.upload(b'dropped')
+        dropped = Attachment.objects.get(name='notes.txt', blob__size=7)
+        dropped.delete()
+        self.assertEqual(attachments.sweep(grace=0), 1)
+        self.assertEqual(Blob.objects.get().size, 4)
+        self.assertFalse(attachments.blob_path(dropped.blob_id).exists())
+
+    def test_bulk_user_delete_removes_attachments(self):
+        self.upload(b'gone with the student')
+        bulk.bulk_delete(bulk.select_users([self.student.pk]))
+        self.assertFalse(Attachment.objects.exists())
+        # the content waits for the sweep
+        self.assertEqual(Blob.objects.count(), 1)
+
+    def test_bench_attachments(self):
+        out = io.StringIO()
+        call_command('bench_attachments', uploads=4, size=1, distinct=2, stdout=out)
+        self.assertIn('2 blobs stored for 2 distinct contents, 0 temporary files left', out.getvalue())
+
+
+class RequestExportTest(TestCase):
+    def setUp(self):
+        self.student = User.objects.create(username='s@example.com', email='s@example.com', is_student=True)
+        Request.submit(self.student, Request.Type.OTHER, 'first')
+        Request.submit(self.student, Request.Type.GRADE_APPEAL, 'second').set_status(Request.Status.APPROVED)
+
+    def test_secretary_exports_requests(self):
+        secretary = User.objects.create(username='sec@example.com', email='sec@example.com', is_superuser=True)
+        self.client.force_login(secretary)
+        response = self.client.get(reverse('export_requests'), {'format': 'jsonl', 'status': 'approved'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['student'], 's@example.com')
+        self.assertIsNone(rows[0]['assignee'])
+        self.assertEqual(rows[0]['description'], 'second')
+
+        response = self.client.get(reverse('export_requests'))
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 3)
+
+    def test_others_are_refused(self):
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(reverse('export_requests')).status_code, 403)
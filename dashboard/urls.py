@@ -4,5 +4,14 @@ from . import views
 
 urlpatterns=[
     path('',views.dashboard,name='dashboard'),
+    path('requests/submit/',views.submit_request,name='submit_request'),
+    path('requests/status/',views.update_request_status,name='update_request_status'),
+    path('requests/attachments/',views.upload_attachment,name='upload_attachment'),
+    path('attachments/<int:attachment_id>/',views.download_attachment,name='download_attachment'),
+    path('users/search/',views.user_search,name='user_search'),
+    path('requests/export/',views.export_requests,name='export_requests'),
+    path('stats/registrations/',views.registration_stats,name='registration_stats'),
+    path('chat/',views.chat,name='chat'),
+    path('live/',views.live_updates,name='live_updates'),
 
 ]
\ No newline at end of file
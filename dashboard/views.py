@@ -1,20 +1,113 @@
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
+from django.template.defaultfilters import filesizeformat
 from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db.models import Q
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_POST
+
+from . import attachments, chatbot, exports, fragments, live, registrations
+from .assignment import scheduler
+from .models import Attachment, Request, RequestCounter
+from users import activity, exporter, search
+from users.models import ActivityEvent
 
 User = get_user_model()
 
-#custme dashboard : done 
+# rows shown in the student "My Recent Requests" and lecturer "Assigned Requests" tables
+RECENT_REQUESTS = 5
+ASSIGNED_REQUESTS = 20
+
+# number of rows shown per page in the secretary "User Management" table
+USERS_PAGE_SIZE = 50
+
+# role filter values accepted by the user table, see User.Role
+ROLE_FILTERS = ('student', 'lecturer', 'superuser')
+
+# most suggestions the type-ahead returns
+SEARCH_SUGGESTIONS = 10
+
+# rows shown in the secretary "Recent Activity" table
+RECENT_ACTIVITY = 10
+
+# the student's latest requests the chatbot can answer about, and the
+# longest question it reads
+CHAT_REQUESTS = 20
+CHAT_MAX_LENGTH = 500
+
+# days shown by the registrations chart unless ?days= asks otherwise
+CHART_DAYS = 7
+
+# only the columns the user table actually renders
+USER_LIST_FIELDS = ('id', 'email', 'role')
+
+
+def user_page(request, exclude_id=None, page_size=None):
+    """
+    Return one keyset-paginated page of users for the secretary table.
+
+    Rows are ordered by (email, id) and the page starts strictly after the
+    cursor given in ``after_email``/``after_id``, so every page costs one
+    index range scan no matter how deep into the table it is, unlike
+    OFFSET pagination. ``role`` and ``q`` (an email prefix) are applied
+    in SQL before the limit.
+
+    Returns a dict with the page rows, the query string for the next page
+    (or None on the last page) and the active filters.
+    """
+    page_size = page_size or USERS_PAGE_SIZE
+    role = request.GET.get('role', '')
+    prefix = request.GET.get('q', '').strip()
+    after_email = request.GET.get('after_email')
+    after_id = request.GET.get('after_id')
+
+    users = User.objects.only(*USER_LIST_FIELDS).order_by('email', 'id')
+    if exclude_id is not None:
+        users = users.exclude(id=exclude_id)
+    if role in ROLE_FILTERS:
+        # an index range on (role, email), already in page order
+        users = users.filter(role=role)
+    if prefix:
+        # a half-open range instead of LIKE 'prefix%' keeps the unique
+        # index on email usable
+        users = users.filter(email__gte=prefix, email__lt=prefix + '\uffff')
+    if after_email is not None and after_id and after_id.isdigit():
+        users = users.filter(
+            Q(email__gt=after_email) | Q(email=after_email, id__gt=int(after_id))
+        )
+
+    rows = list(users[:page_size + 1])
+    next_query = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        params = request.GET.copy()
+        params['after_email'] = rows[-1].email
+        params['after_id'] = rows[-1].id
+        next_query = params.urlencode()
+
+    return {
+        'users': rows,
+        'next_query': next_query,
+        'role_filter': role,
+        'email_prefix': prefix,
+    }
+
+
+#custme dashboard : done
 def dashboard(request):
     if request.user.is_superuser:
-        users = User.objects.exclude(id=request.user.id)  # exclude self from list
-
         # Handle deletion
         if request.method == 'POST' and 'delete_user_id' in request.POST:
             user_id = request.POST.get('delete_user_id')
             try:
                 user = User.objects.get(id=user_id)
                 user.delete()
+                activity.record(request.user, ActivityEvent.Action.DELETE_USER, user.email)
                 messages.success(request, 'User deleted successfully.')
             except User.DoesNotExist:
                 messages.error(request, 'User not found.')
@@ -26,15 +119,219 @@ def dashboard(request):
             new_role = request.POST.get('role')
             try:
                 user = User.objects.get(id=user_id)
-                user.is_student = new_role == 'student'
-                user.is_lect = new_role == 'lecturer'
-                user.is_superuser = new_role == 'superuser'
-                user.save()
+                user.role = new_role if new_role in ROLE_FILTERS else User.Role.NONE
+                user.save(update_fields=['role'])
+                activity.record(request.user, ActivityEvent.Action.CHANGE_ROLE,
+                                f'{user.email} to {user.get_role_display()}')
                 messages.success(request, 'User role updated.')
             except User.DoesNotExist:
                 messages.error(request, 'User not found.')
             return redirect('dashboard')
 
-        return render(request, 'dashboard/dashboard.html', {'users': users})
+        context = {'fragment_timeout': settings.DASHBOARD_FRAGMENT_TIMEOUT}
+        if request.GET.get('view') == 'users':
+            # exclude self from list
+            context.update(user_page(request, exclude_id=request.user.id))
+        else:
+            # answered from the (assignee, status, created) index
+            context['pending_routing'] = Request.objects.filter(
+                assignee__isnull=True, status__in=Request.OPEN_STATUSES).count()
+            # a few rollup rows instead of a COUNT over users_user
+            context['users_registered'] = sum(registrations.total().values())
+            # from this process's ring of recent events, see users.activity
+            context['recent_activity'] = activity.recent(RECENT_ACTIVITY)
+        return render(request, 'dashboard/dashboard.html', context)
+
+    # the querysets and counters are lazy: on a fragment cache hit the
+    # template never reads them and they cost no queries
+    user = request.user
+    context = {
+        'fragment_timeout': settings.DASHBOARD_FRAGMENT_TIMEOUT,
+        # the status stream is only served under ASGI, see live_updates
+        'live_updates': isinstance(request, ASGIRequest),
+    }
+    # AnonymousUser has no role flags
+    if getattr(user, 'is_student', False):
+        context.update({
+            'panel_key': fragments.panel_key(user),
+            'recent_requests': user.requests.prefetch_related('attachments').order_by('-created')[:RECENT_REQUESTS],
+            'counters': SimpleLazyObject(lambda: RequestCounter.for_user(user)),
+            'request_types': Request.Type.choices,
+        })
+    elif getattr(user, 'is_lect', False):
+        context.update({
+            'panel_key': fragments.panel_key(user),
+            'assigned_requests': (
+                user.assigned_requests
+                .filter(status__in=Request.OPEN_STATUSES)
+                .select_related('student')
+                .only('request_type', 'status', 'created', 'assignee', 'student__email')
+                .prefetch_related('attachments')
+                .order_by('-created')[:ASSIGNED_REQUESTS]
+            ),
+            'counters': SimpleLazyObject(lambda: RequestCounter.for_user(user)),
+            'statuses': Request.Status.choices,
+        })
+    return render(request, 'dashboard/dashboard.html', context)
+
+
+@require_POST
+def submit_request(request):
+    if not request.user.is_authenticated or not request.user.is_student:
+        messages.error(request, 'Only students can submit requests.')
+        return redirect('dashboard')
+    request_type = request.POST.get('request_type')
+    if request_type not in Request.Type.values:
+        messages.error(request, 'Please choose a request type.')
+        return redirect('dashboard')
+    new_request = Request.submit(request.user, request_type, request.POST.get('description', '').strip())
+    scheduler.assign(new_request)
+    messages.success(request, 'Request submitted.')
+    return redirect('dashboard')
+
+
+@require_POST
+@login_required
+def update_request_status(request):
+    if not request.user.is_lect:
+        messages.error(request, 'Only lecturers can update requests.')
+        return redirect('dashboard')
+    status = request.POST.get('status')
+    try:
+        student_request = Request.objects.get(id=request.POST.get('request_id'), assignee_id=request.user.id)
+    except (Request.DoesNotExist, ValueError):
+        messages.error(request, 'Request not found.')
+        return redirect('dashboard')
+    if status not in Request.Status.values:
+        messages.error(request, 'Unknown status.')
+        return redirect('dashboard')
+    student_request.set_status(status)
+    messages.success(request, 'Request updated.')
+    return redirect('dashboard')
+
+
+@csrf_exempt
+@require_POST
+def upload_attachment(request):
+    """
+    Attach a file to one of the student's open requests, streamed to disk
+    by attachments.HashingUploadHandler. The handler has to be in place
+    before anything reads request.POST, the CSRF check included, so the
+    check runs in _store_attachment instead of the middleware.
+    """
+    limit = settings.ATTACHMENT_MAX_SIZE
+    if int(request.META.get('CONTENT_LENGTH') or 0) > limit + attachments.MULTIPART_OVERHEAD:
+        # refused without reading the body
+        messages.error(request, f'Attachments can be at most {filesizeformat(limit)}.')
+        return redirect('dashboard')
+    handler = attachments.HashingUploadHandler(request)
+    request.upload_handlers = [handler]
+    return _store_attachment(request, handler)
+
+
+@csrf_protect
+def _store_attachment(request, handler):
+    if not request.user.is_authenticated or not request.user.is_student:
+        messages.error(request, 'Only students can attach files.')
+        return redirect('dashboard')
+    if handler.too_large:
+        messages.error(request, f'Attachments can be at most {filesizeformat(settings.ATTACHMENT_MAX_SIZE)}.')
+        return redirect('dashboard')
+    try:
+        student_request = Request.objects.get(
+            id=request.POST.get('request_id'), student_id=request.user.id, status__in=Request.OPEN_STATUSES)
+    except (Request.DoesNotExist, ValueError):
+        messages.error(request, 'Request not found.')
+        return redirect('dashboard')
+    upload = request.FILES.get('file')
+    if upload is None:
+        messages.error(request, 'Please choose a file.')
+        return redirect('dashboard')
+    attachments.store(student_request, upload)
+    messages.success(request, 'File attached.')
+    return redirect('dashboard')
+
+
+def download_attachment(request, attachment_id):
+    """An attachment for its student, the assigned lecturer or a secretary, see attachments.serve."""
+    try:
+        attachment = Attachment.objects.select_related('blob', 'request').get(pk=attachment_id)
+    except Attachment.DoesNotExist:
+        raise Http404
+    if not attachments.can_read(request.user, attachment):
+        raise Http404
+    return attachments.serve(request, attachment)
+
+
+def user_search(request):
+    """Type-ahead for the secretary's user table, served by the trigram index."""
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Secretaries only.'}, status=403)
+    term = request.GET.get('q', '').strip()
+    results = search.search(term[:100], limit=SEARCH_SUGGESTIONS, fields=USER_LIST_FIELDS + ('first_name', 'last_name'))
+    labels = {**dict(User.Role.choices), User.Role.NONE: ''}
+    for row in results:
+        row['role'] = labels[row['role']]
+    return JsonResponse({'results': results})
+
+
+def export_requests(request):
+    """Every request, or those with ?status=, as ?format=csv|jsonl, see users.exporter."""
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Secretaries only.'}, status=403)
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in exporter.CONTENT_TYPES:
+        return JsonResponse({'error': 'Unknown format.'}, status=400)
+    status = request.GET.get('status')
+    rows = exports.requests(status if status in Request.Status.values else None)
+    return exporter.response(request, rows, exports.REQUEST_COLUMNS, fmt, 'requests')
+
+
+def registration_stats(request):
+    """Daily registrations per role for the secretary's chart, from the rollups."""
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Secretaries only.'}, status=403)
+    try:
+        days = int(request.GET.get('days', CHART_DAYS))
+    except ValueError:
+        days = CHART_DAYS
+    days = min(max(days, 1), registrations.MAX_CHART_DAYS)
+    totals = registrations.total()
+    return JsonResponse({**registrations.chart(days), 'total': sum(totals.values()), 'by_role': totals})
+
+
+@require_POST
+async def chat(request):
+    """
+    Answer a student's chatbot question as a stream of JSON lines, see
+    dashboard.chatbot. Async, so under ASGI an open chat holds no thread.
+    """
+    user = await request.auser()
+    if not getattr(user, 'is_student', False):
+        return JsonResponse({'error': 'Students only.'}, status=403)
+    question = request.POST.get('message', '').strip()[:CHAT_MAX_LENGTH]
+    if not question:
+        return JsonResponse({'error': 'Ask a question.'}, status=400)
+    requests = [item async for item in user.requests.order_by('-created')[:CHAT_REQUESTS]]
+    return StreamingHttpResponse(chatbot.stream(question, requests), content_type='application/x-ndjson')
+
+
+async def live_updates(request):
+    """
+    Server-sent events about the user's requests, see dashboard.live. Only
+    served by the ASGI app: WSGI buffers the stream, so nothing would arrive
+    while a worker thread stayed held for LIVE_MAX_AGE. There the dashboard
+    opens no stream, and a stray one gets 204, which tells EventSource to
+    stop reconnecting.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    user = await request.auser()
+    if not (getattr(user, 'is_student', False) or getattr(user, 'is_lect', False)):
+        return JsonResponse({'error': 'Students and lecturers only.'}, status=403)
+    response = StreamingHttpResponse(live.stream(user.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # stop proxies such as nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
-    return render(request, 'dashboard/dashboard.html')
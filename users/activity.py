@@ -0,0 +1,208 @@
+"""
+Append-only activity log behind the secretary's "Recent Activity" table.
+
+``record`` is all a view calls. It builds an unsaved ActivityEvent and
+appends it to two in-process ``deque``s, whose appends are atomic, so the
+request path takes no lock and runs no query. A daemon writer thread saves
+pending events with one bulk INSERT every ACTIVITY_FLUSH_INTERVAL seconds,
+or as soon as ACTIVITY_BUFFER_SIZE of them are waiting, and an atexit hook
+saves what is left when the process exits. With ACTIVITY_FLUSH_INTERVAL = 0
+no thread is started and ``flush`` has to be called explicitly.
+
+``recent`` answers "latest N" from a ring of the last ACTIVITY_RECENT_SIZE
+events. The ring is loaded from the table on first use and again every
+ACTIVITY_RECENT_REFRESH seconds, which is how events recorded by other
+worker processes reach it.
+
+``compact`` (``manage.py compact_activity``) moves entries older than the
+retention period into gzipped JSON-lines segments under
+ACTIVITY_ARCHIVE_DIR and deletes them from the table; ``scan_archive``
+streams them back one entry at a time.
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import ActivityEvent
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_FIELDS = ('id', 'created', 'actor_pk', 'actor', 'action', 'target')
+
+# past ACTIVITY_MAX_PENDING, e.g. while the database is unreachable, the
+# oldest unsaved events are dropped
+_pending = deque(maxlen=settings.ACTIVITY_MAX_PENDING)
+_ring = deque(maxlen=settings.ACTIVITY_RECENT_SIZE)
+_ring_loaded = None
+_flush_lock = threading.Lock()
+_start_lock = threading.Lock()
+_wake = threading.Event()
+_writer_pid = None
+
+
+def record(actor, action, target=''):
+    """Log that ``actor`` (a user, possibly anonymous) did ``action`` to ``target``."""
+    known = actor is not None and actor.is_authenticated
+    event = ActivityEvent(
+        created=timezone.now(),
+        actor_pk=actor.pk if known else None,
+        actor=actor.email if known else '',
+        action=action,
+        target=str(target)[:254],
+    )
+    _pending.append(event)
+    _ring.appendleft(event)
+    # a forked worker inherits the module state but not the thread
+    if _writer_pid != os.getpid() and settings.ACTIVITY_FLUSH_INTERVAL:
+        _start_writer()
+    if len(_pending) >= settings.ACTIVITY_BUFFER_SIZE:
+        _wake.set()
+    return event
+
+
+def _start_writer():
+    global _writer_pid
+    with _start_lock:
+        if _writer_pid == os.getpid():
+            return
+        threading.Thread(target=_write_forever, name='activity-writer', daemon=True).start()
+        atexit.register(flush)
+        _writer_pid = os.getpid()
+
+
+def _write_forever():
+    while True:
+        _wake.wait(settings.ACTIVITY_FLUSH_INTERVAL)
+        _wake.clear()
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            logger.exception('could not save the activity log, will retry')
+
+
+def flush():
+    """
+    Save pending events in one bulk INSERT and return how many. Skips if
+    another thread is already flushing. On failure the events are put back
+    for the next flush.
+    """
+    if not _flush_lock.acquire(blocking=False):
+        return 0
+    try:
+        batch = []
+        while True:
+            try:
+                batch.append(_pending.popleft())
+            except IndexError:
+                break
+        if batch:
+            try:
+                ActivityEvent.objects.bulk_create(batch, batch_size=500)
+            except Exception:
+                _pending.extendleft(reversed(batch))
+                raise
+        return len(batch)
+    finally:
+        _flush_lock.release()
+
+
+def recent(n):
+    """The ``n`` latest events, newest first; at most ACTIVITY_RECENT_SIZE."""
+    global _ring, _ring_loaded
+    now = time.monotonic()
+    if _ring_loaded is None or now - _ring_loaded >= settings.ACTIVITY_RECENT_REFRESH:
+        _ring_loaded = now
+        saved = list(ActivityEvent.objects.order_by('-id')[:_ring.maxlen])
+        # this process's unsaved events are not in the table yet
+        events = sorted(saved + list(reversed(_pending.copy())), key=lambda event: event.created, reverse=True)
+        _ring = deque(events, maxlen=_ring.maxlen)
+    # copy() is atomic, iterating the deque itself is not
+    return list(_ring.copy())[:n]
+
+
+def clear():
+    """Drop unsaved events and forget the ring, e.g. between tests."""
+    global _ring_loaded
+    _pending.clear()
+    _ring.clear()
+    _ring_loaded = None
+
+
+def segment_name(rows):
+    # the first id orders segments, the UTC days let scans skip them; ids
+    # are not in created order across processes, so take the extremes
+    created = [row['created'] for row in rows]
+    days = '-'.join(f'{day.astimezone(dt_timezone.utc):%Y%m%d}' for day in (min(created), max(created)))
+    return f'activity-{rows[0]["id"]:012d}-{days}.jsonl.gz'
+
+
+def compact(before, directory=None, segment_size=None):
+    """
+    Move entries created before ``before`` into segments of at most
+    ``segment_size`` entries in ``directory`` and delete them from the
+    table. Returns (entries moved, segments written).
+
+    Each segment is written under a temporary name, synced and renamed into
+    place before its rows are deleted, so a crash leaves every entry in the
+    table, a complete segment or both; a re-run rewrites the same segment.
+    """
+    directory = Path(directory or settings.ACTIVITY_ARCHIVE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    segment_size = segment_size or settings.ACTIVITY_SEGMENT_SIZE
+    old = ActivityEvent.objects.filter(created__lt=before).order_by('id').values(*SEGMENT_FIELDS)
+
+    moved = segments = 0
+    after = 0
+    while True:
+        rows = list(old.filter(id__gt=after)[:segment_size])
+        if not rows:
+            return moved, segments
+        path = directory / segment_name(rows)
+        partial = path.with_name(path.name + '.partial')
+        with open(partial, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as out:
+                for row in rows:
+                    out.write((json.dumps({**row, 'created': row['created'].isoformat()}) + '\n').encode())
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(partial, path)
+        after = rows[-1]['id']
+        ActivityEvent.objects.filter(id__gte=rows[0]['id'], id__lte=after, created__lt=before).delete()
+        moved += len(rows)
+        segments += 1
+
+
+def scan_archive(since=None, until=None, actor=None, action=None, directory=None):
+    """
+    Yield archived entries as dicts, oldest first, decompressing one line at
+    a time. ``since`` and ``until`` (aware datetimes) bound ``created``, and
+    segments that lie wholly outside them are not opened.
+    """
+    directory = Path(directory or settings.ACTIVITY_ARCHIVE_DIR)
+    first_day = since and f'{since.astimezone(dt_timezone.utc):%Y%m%d}'
+    last_day = until and f'{until.astimezone(dt_timezone.utc):%Y%m%d}'
+    for path in sorted(directory.glob('activity-*.jsonl.gz')):
+        _, _, starts, ends = path.name.split('.')[0].split('-')
+        if (first_day and ends < first_day) or (last_day and starts > last_day):
+            continue
+        with gzip.open(path, 'rt', encoding='utf-8') as segment:
+            for line in segment:
+                entry = json.loads(line)
+                created = datetime.fromisoformat(entry['created'])
+                if since and created < since or until and created >= until:
+                    continue
+                if actor and entry['actor'] != actor or action and entry['action'] != action:
+                    continue
+                yield entry
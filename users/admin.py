@@ -1,8 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.utils import timezone
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import Group
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
-from .models import User
+from .models import ActivityEvent, OutboxMessage, User
+from . import bulk, search
 
 
 # Register your models here.
@@ -22,24 +24,99 @@ class CustomUserAdmin(BaseUserAdmin):
     form = UserChangeForm
     model = User
 
-    list_display = ('email', 'is_superuser', 'is_student', 'is_lect')
-    list_filter = ('is_superuser', 'is_student', 'is_lect')
+    list_display = ('email', 'role')
+    # one indexed column, see User.Meta.indexes
+    list_filter = ('role',)
+    # skip the unfiltered COUNT(*) shown next to a filtered result count
+    show_full_result_count = False
 
     fieldsets = (
         (None, {'fields': ('username', 'email', 'password')}),
-        ('Permissions', {'fields': ('is_active', 'is_staff', 'is_superuser', 'is_student', 'is_lect')}),
+        ('Permissions', {'fields': ('is_active', 'is_staff', 'role')}),
         ('Groups', {'fields': ('groups',)}),
     )
 
     add_fieldsets = (
         (None, {
             'classes': ('wide',),
-            'fields': ('email', 'password1', 'password2', 'is_student', 'is_lect', 'is_superuser'),
+            'fields': ('email', 'password1', 'password2', 'role'),
         }),
     )
-    search_fields = ('email',)
+    search_fields = ('email', 'first_name', 'last_name')
     ordering = ('email',)
+    # matches beyond this many are not listed; narrow the search instead
+    search_limit = 500
+    actions = ('make_student', 'make_lecturer', 'make_secretary')
+
+    def get_search_results(self, request, queryset, search_term):
+        # served by the trigram index instead of LIKE '%term%' scans
+        if not search_term.strip():
+            return queryset, False
+        ids = [row['id'] for row in search.search(search_term[:100], limit=self.search_limit + 1, fields=('id',))]
+        if len(ids) > self.search_limit:
+            ids = ids[:self.search_limit]
+            self.message_user(
+                request,
+                f'Only the first {self.search_limit} matches are listed; narrow the search to see the rest.',
+                messages.WARNING,
+            )
+        return queryset.filter(pk__in=ids), False
+
+    def delete_queryset(self, request, queryset):
+        # "Delete selected" keeps its confirmation page but deletes set-based
+        bulk.bulk_delete(queryset)
+
+    def _set_role(self, request, queryset, role):
+        result = bulk.bulk_set_role(queryset.exclude(pk=request.user.pk), role)
+        self.message_user(request, f'Updated the role of {result.affected} users.')
+
+    @admin.action(description='Make selected users students')
+    def make_student(self, request, queryset):
+        self._set_role(request, queryset, 'student')
+
+    @admin.action(description='Make selected users lecturers')
+    def make_lecturer(self, request, queryset):
+        self._set_role(request, queryset, 'lecturer')
+
+    @admin.action(description='Make selected users secretaries')
+    def make_secretary(self, request, queryset):
+        self._set_role(request, queryset, 'superuser')
 
 admin.site.register(User, CustomUserAdmin)
 
 
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt', 'created', 'sent')
+    list_filter = ('status',)
+    exclude = ('raw',)
+    readonly_fields = ('status', 'subject', 'from_email', 'recipients', 'created', 'next_attempt',
+                       'attempts', 'last_error', 'sent', 'lease')
+    show_full_result_count = False
+    actions = ('retry_now',)
+
+    @admin.action(description='Retry selected messages now')
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status=OutboxMessage.Status.SENT).update(
+            status=OutboxMessage.Status.QUEUED, next_attempt=timezone.now(), lease=None)
+        self.message_user(request, f'{count} messages queued again.')
+
+
+@admin.register(ActivityEvent)
+class ActivityEventAdmin(admin.ModelAdmin):
+    list_display = ('created', 'actor', 'action', 'target')
+    list_filter = ('action',)
+    show_full_result_count = False
+
+    # append-only, see users.activity; old entries leave through
+    # manage.py compact_activity
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -1,20 +1,83 @@
+import string
+
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
 from django.db.models import Q
+from django.db.models.functions import Lower
+
+from . import hashing
+from .cache import user_cache
 
 
 UserModel = get_user_model()
 
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def login_key(value):
+    """
+    ``value`` lowercased the way SQLite's LOWER() does it, ASCII letters
+    only, so it compares equal to the expression indexes' keys.
+    """
+    return value.translate(_ASCII_LOWER)
+
+
+def login_lookup(username):
+    """
+    Queryset of users whose username or email matches ``username``
+    case-insensitively.
+
+    The comparison is written as ``LOWER(column) = 'value'`` so SQLite can
+    answer it from the expression indexes declared on ``User.Meta``;
+    ``iexact`` compiles to ``LIKE ... ESCAPE`` which always scans the table.
+    """
+    key = login_key(username or '')
+    return (
+        UserModel.objects
+        .alias(username_key=Lower('username'), email_key=Lower('email'))
+        .filter(Q(username_key=key) | Q(email_key=key))
+    )
+
+
 class EmailBackend(ModelBackend):
+    # password checks run on the shared hashing pool, see users.hashing
+
     def authenticate(self,request,username=None,password=None,**kwargs):
-        try:
-            user=UserModel.objects.get(Q(username__iexact=username) | Q(email__iexact=username))
-        except UserModel.DoesNotExist:
-            UserModel().set_password(password)
+        # one query: the lowest id wins when username and email point at
+        # different accounts
+        user=login_lookup(username).order_by('id').first()
+        if user is None:
+            # run the hasher anyway so a missing account takes as long as a wrong password
+            hashing.make_password(password)
             return
-        except UserModel.MultipleObjectsReturned:
-            user=UserModel.objects.filter(Q(username__iexact=username)|Q(email__iexact=username)).order_by('id').first()
-        if user.check_password(password)and self.user_can_authenticate(user):
+        if hashing.check_user_password(user,password)and self.user_can_authenticate(user):
             return user
-        
-          
+
+    async def aauthenticate(self,request,username=None,password=None,**kwargs):
+        user=await login_lookup(username).order_by('id').afirst()
+        if user is None:
+            await hashing.amake_password(password)
+            return
+        if await hashing.acheck_user_password(user,password)and self.user_can_authenticate(user):
+            return user
+
+    def get_user(self,user_id):
+        # called for request.user on every authenticated request, see users.cache
+        user=user_cache.get(user_id)
+        if user is None:
+            try:
+                user=UserModel._default_manager.get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            user_cache.put(user)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self,user_id):
+        user=user_cache.get(user_id)
+        if user is None:
+            try:
+                user=await UserModel._default_manager.aget(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            user_cache.put(user)
+        return user if self.user_can_authenticate(user) else None
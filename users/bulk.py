@@ -0,0 +1,126 @@
+"""
+Set-based bulk operations on users.
+
+Users are picked by an id list, a role, or both, and processed in chunks of
+``chunk_size`` primary keys with one transaction per chunk. Each chunk costs
+a handful of statements whatever its size, instead of a get() and a save()
+or delete() per user, and a failure only rolls back the current chunk.
+
+``QuerySet.update()`` sends no model signals, so ``bulk_set_role`` sends
+``users.signals.users_updating`` before each chunk's UPDATE and
+``users_updated`` after it, and ``bulk_delete`` sends ``users_deleting``
+before its DELETE, with ``users.signals.bulk_deleting`` set to the chunk.
+The receivers (the user cache, the dashboard's request counters,
+registration rollups and lecturer scheduler) handle a whole chunk at once.
+
+``iter_set_role`` and ``iter_delete`` yield the running totals after each
+chunk has committed, for callers that stream progress; ``bulk_set_role``
+and ``bulk_delete`` just run them to the end.
+"""
+import time
+from dataclasses import dataclass
+
+from django.db import transaction
+
+from .importer import ROLES
+from .models import User
+from .signals import bulk_deleting, users_deleting, users_updated, users_updating
+
+@dataclass
+class BulkResult:
+    matched: int = 0
+    affected: int = 0
+    elapsed: float = 0.0
+
+
+def select_users(ids=None, role=None, exclude_id=None):
+    """The users matching ``ids`` and/or ``role``; at least one is required."""
+    if ids is None and not role:
+        raise ValueError('select users by ids, by role, or both')
+    if role and role not in ROLES:
+        raise ValueError(f'unknown role {role!r}')
+    users = User.objects.all()
+    if ids is not None:
+        users = users.filter(pk__in=sorted({int(pk) for pk in ids}))
+    if role:
+        users = users.filter(role=role)
+    if exclude_id is not None:
+        users = users.exclude(pk=exclude_id)
+    return users
+
+
+def _steps(users, chunk_size, apply):
+    """
+    Apply ``apply`` to ``users`` a chunk of primary keys at a time, walking
+    the pk index in order, and yield the running result after each one.
+    """
+    result = BulkResult(matched=users.count())
+    started = time.perf_counter()
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            ids = list(users.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                return
+            result.affected += apply(ids)
+        # only once the chunk has committed: a caller streaming progress to
+        # a slow client must not hold SQLite's write lock meanwhile
+        last_pk = ids[-1]
+        result.elapsed = time.perf_counter() - started
+        yield result
+
+
+def run(steps, progress=None):
+    """Exhaust an ``iter_*`` generator and return its final BulkResult."""
+    result = BulkResult()
+    for result in steps:
+        if progress is not None:
+            progress(result)
+    return result
+
+
+def iter_set_role(users, role, chunk_size=1000):
+    """
+    Give every user in ``users`` the role ``role`` (one of ``ROLES``),
+    yielding the running BulkResult after each chunk.
+
+    Users who already have exactly that role are skipped, so ``affected``
+    counts real changes.
+    """
+    if role not in ROLES:
+        raise ValueError(f'unknown role {role!r}')
+
+    def apply(ids):
+        users_updating.send(sender=User, ids=ids, fields={'role': role})
+        changed = User.objects.filter(pk__in=ids).update(role=role)
+        users_updated.send(sender=User, ids=ids, fields={'role': role})
+        return changed
+
+    return _steps(users.exclude(role=role), chunk_size, apply)
+
+
+def iter_delete(users, chunk_size=1000):
+    """
+    Delete every user in ``users`` with their requests and memberships,
+    yielding the running BulkResult after each chunk.
+    """
+    def apply(ids):
+        token = bulk_deleting.set(frozenset(ids))
+        try:
+            users_deleting.send(sender=User, ids=ids)
+            _, deleted = User.objects.filter(pk__in=ids).delete()
+        finally:
+            bulk_deleting.reset(token)
+        return deleted.get(User._meta.label, 0)
+
+    return _steps(users, chunk_size, apply)
+
+
+def bulk_set_role(users, role, chunk_size=1000, progress=None):
+    """Run ``iter_set_role`` to the end; ``progress`` gets the result after each chunk."""
+    return run(iter_set_role(users, role, chunk_size), progress)
+
+
+def bulk_delete(users, chunk_size=1000, progress=None):
+    """Run ``iter_delete`` to the end; ``progress`` gets the result after each chunk."""
+    return run(iter_delete(users, chunk_size), progress)
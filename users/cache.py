@@ -0,0 +1,85 @@
+"""
+Per-process cache of authenticated user rows.
+
+``AuthenticationMiddleware`` resolves ``request.user`` through
+``EmailBackend.get_user`` on every request, which would otherwise cost one
+SELECT on ``users_user`` per page view. The cache keeps the raw column
+values of recently seen users (bounded LRU, entries expire after a TTL) and
+builds a fresh model instance from them on every hit, so requests never
+share a mutable User object.
+
+Entries are dropped from ``post_save``/``post_delete`` on User (see
+``users.signals``). Code that changes users with ``QuerySet.update()`` or
+``bulk_create`` bypasses those signals and must call ``invalidate`` itself.
+Other processes only see a change once their entry expires, which is what
+USER_CACHE_TTL bounds.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+
+class UserCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return a User built from the cached row, or None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+            else:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+        _, db, values = entry
+        return get_user_model().from_db(db, self._field_names(), values)
+
+    def put(self, user):
+        values = tuple(getattr(user, name) for name in self._field_names())
+        with self._lock:
+            self._entries[user.pk] = (time.monotonic() + self.ttl, user._state.db, values)
+            self._entries.move_to_end(user.pk)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    @staticmethod
+    def _field_names():
+        return [field.attname for field in get_user_model()._meta.concrete_fields]
+
+
+user_cache = UserCache(settings.USER_CACHE_MAXSIZE, settings.USER_CACHE_TTL)
@@ -1,9 +1,21 @@
+from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
 
+from . import hashing
+
 #cteate class for user regester form that inherate from UserCreationForm
 class RegisterUserForm(UserCreationForm):
     class Meta:
         model=get_user_model()
         fields=['email','password1','password2']
-        
\ No newline at end of file
+
+    def save(self, commit=True):
+        # same as UserCreationForm.save, but the password is hashed on the
+        # shared hashing pool instead of the request thread
+        user = forms.ModelForm.save(self, commit=False)
+        user.password = hashing.make_password(self.cleaned_data['password1'])
+        if commit:
+            user.save()
+            self._save_m2m()
+        return user
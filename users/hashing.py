@@ -0,0 +1,187 @@
+"""
+Password hashing on a process pool.
+
+PBKDF2 is pure CPU work, so hashing many passwords in one process only ever
+uses one core. These helpers fan the work out to worker processes; each
+worker sets Django up once so it hashes with the project's PASSWORD_HASHERS.
+
+Login, registration, add-user and roster uploads go through a shared,
+bounded pool (``make_password``/``check_password``, their async twins and
+``SharedPool``). At most PASSWORD_HASHING_MAX_PENDING jobs may be queued or
+running; past that, ``HashingBusy`` is raised and ``users.middleware`` turns
+it into a 503 with Retry-After, instead of letting requests pile up behind
+the hashers.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class HashingBusy(Exception):
+    """The shared hashing pool already has its maximum number of pending jobs."""
+
+    def __init__(self, retry_after):
+        super().__init__(f'password hashing pool is saturated, retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+def _init_worker(settings_module):
+    # forked workers inherit configured settings, spawned ones need setting up
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    if not apps.ready:
+        django.setup()
+
+
+def process_pool(workers=None, mp_context=None):
+    """A process pool whose workers are ready to run Django's hashers."""
+    return ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        mp_context=mp_context,
+        initializer=_init_worker,
+        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'SmartRequestProject.settings'),),
+    )
+
+
+def make_passwords(passwords, executor=None, chunksize=16):
+    """
+    Hash every password in ``passwords`` and return the encoded hashes in the
+    same order. ``None`` yields an unusable password, like ``make_password``.
+    Without an executor the hashing runs inline.
+    """
+    if executor is None:
+        return [hashers.make_password(p) for p in passwords]
+    return list(executor.map(hashers.make_password, passwords, chunksize=chunksize))
+
+
+_shared_pool = None
+_pending = 0
+_lock = threading.Lock()
+
+
+def _get_shared_pool():
+    global _shared_pool
+    if _shared_pool is None:
+        # forkserver rather than fork: the web process is multi-threaded
+        context = None
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+        _shared_pool = process_pool(settings.PASSWORD_HASHING_WORKERS, context)
+    return _shared_pool
+
+
+def _release(future):
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def submit(fn, *args):
+    """
+    Run ``fn(*args)`` on the shared pool and return its future, or raise
+    HashingBusy when PASSWORD_HASHING_MAX_PENDING jobs are already pending.
+    """
+    global _pending
+    with _lock:
+        if _pending >= settings.PASSWORD_HASHING_MAX_PENDING:
+            raise HashingBusy(settings.PASSWORD_HASHING_RETRY_AFTER)
+        _pending += 1
+    try:
+        future = _get_shared_pool().submit(fn, *args)
+    except BaseException:
+        _release(None)
+        raise
+    future.add_done_callback(_release)
+    return future
+
+
+def pending():
+    """Number of jobs queued or running on the shared pool in this process."""
+    return _pending
+
+
+def _inline():
+    return not settings.PASSWORD_HASHING_WORKERS
+
+
+def make_password(password):
+    if _inline():
+        return hashers.make_password(password)
+    return submit(hashers.make_password, password).result()
+
+
+def check_password(password, encoded):
+    """Return ``(is_correct, must_update)`` for ``password`` against ``encoded``."""
+    if _inline() or not hashers.is_password_usable(encoded):
+        return hashers.verify_password(password, encoded)
+    return submit(hashers.verify_password, password, encoded).result()
+
+
+def _map_chunk(fn, items):
+    return [fn(item) for item in items]
+
+
+class SharedPool:
+    """
+    The shared pool as an executor for batch work such as roster imports
+    (``make_passwords(passwords, SharedPool())``). ``map`` queues a chunk
+    per job and counts against PASSWORD_HASHING_MAX_PENDING like any other
+    job. While the pool is full it waits for its own jobs to finish rather
+    than queueing more, and raises HashingBusy only when it has none left
+    to wait for.
+    """
+
+    def map(self, fn, iterable, chunksize=1):
+        items = list(iterable)
+        if _inline():
+            return [fn(item) for item in items]
+        futures = []
+        for low in range(0, len(items), chunksize):
+            while True:
+                try:
+                    futures.append(submit(_map_chunk, fn, items[low:low + chunksize]))
+                    break
+                except HashingBusy:
+                    running = [future for future in futures if not future.done()]
+                    if not running:
+                        raise
+                    wait(running, return_when=FIRST_COMPLETED)
+        return [result for future in futures for result in future.result()]
+
+
+async def amake_password(password):
+    if _inline():
+        return hashers.make_password(password)
+    return await asyncio.wrap_future(submit(hashers.make_password, password))
+
+
+async def acheck_password(password, encoded):
+    if _inline() or not hashers.is_password_usable(encoded):
+        return hashers.verify_password(password, encoded)
+    return await asyncio.wrap_future(submit(hashers.verify_password, password, encoded))
+
+
+def check_user_password(user, password):
+    """
+    Like ``user.check_password`` but verified on the pool. A hash that needs
+    upgrading (e.g. after an iteration bump) is re-hashed on the pool too.
+    """
+    is_correct, must_update = check_password(password, user.password)
+    if is_correct and must_update:
+        user.password = make_password(password)
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+async def acheck_user_password(user, password):
+    is_correct, must_update = await acheck_password(password, user.password)
+    if is_correct and must_update:
+        user.password = await amake_password(password)
+        await user.asave(update_fields=['password'])
+    return is_correct
@@ -0,0 +1,185 @@
+"""
+Streaming roster import.
+
+Rosters are CSV (with a header row) or JSONL files with the columns
+``email``, ``password``, ``role``, ``first_name`` and ``last_name``; only
+``email`` and ``role`` are required. A row without a password gets an
+unusable one, so the user sets it through the password-reset flow.
+
+The file is read one batch at a time, so memory use depends on the batch
+size and not on the roster size. For each batch the importer rejects bad
+rows, drops emails that already exist with one ``IN`` query, hashes the
+passwords on a process pool and inserts the rest with ``bulk_create``
+inside a transaction, together with their search index postings.
+Passwords go through AUTH_PASSWORD_VALIDATORS a batch at a time, see
+``users.passwords.validate_passwords``; a row whose password fails is rejected.
+"""
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from . import hashing, search
+from .backends import login_key
+from .models import User
+from .passwords import validate_passwords
+from .signals import users_created
+
+ROSTER_FIELDS = ('email', 'password', 'role', 'first_name', 'last_name')
+
+# accepted role column values, same vocabulary as the add-user form
+ROLES = (User.Role.STUDENT, User.Role.LECTURER, User.Role.SUPERUSER)
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    existing: int = 0
+    rejected: int = 0
+    elapsed: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def rows(self):
+        return self.created + self.existing + self.rejected
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def read_roster(stream, fmt='csv'):
+    """Yield ``(line_number, row_dict)`` from a text stream, one row at a time."""
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_number, {'_error': f'invalid JSON: {exc}'}
+                continue
+            yield line_number, row if isinstance(row, dict) else {'_error': 'expected a JSON object'}
+    else:
+        # line 1 is the header
+        for line_number, row in enumerate(csv.DictReader(stream), start=2):
+            yield line_number, row
+
+
+def clean_row(row):
+    """Normalise one roster row, raising ValidationError when it is unusable."""
+    if '_error' in row:
+        raise ValidationError(row['_error'])
+    email = (row.get('email') or '').strip()
+    validate_email(email)
+    role = (row.get('role') or '').strip().lower()
+    if role not in ROLES:
+        raise ValidationError(f'unknown role {role!r}')
+    return {
+        'email': email,
+        'password': row.get('password') or None,
+        'role': role,
+        'first_name': (row.get('first_name') or '').strip()[:150],
+        'last_name': (row.get('last_name') or '').strip()[:150],
+    }
+
+
+def import_roster(stream, fmt='csv', batch_size=1000, executor=None, rejects=None, progress=None):
+    """
+    Import a roster from ``stream``.
+
+    ``executor`` is a process pool from ``hashing.process_pool``; without one
+    passwords are hashed inline. Rejected rows are written to ``rejects`` (a
+    text stream) as JSON lines as soon as they are found. ``progress`` is
+    called with the running ImportResult after each batch.
+    """
+    result = ImportResult()
+    started = time.perf_counter()
+    rows = read_roster(stream, fmt)
+
+    def reject(line_number, email, message):
+        result.rejected += 1
+        error = {'line': line_number, 'email': email, 'error': message}
+        if len(result.errors) < 20:
+            result.errors.append(error)
+        if rejects is not None:
+            rejects.write(json.dumps(error) + '\n')
+
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+
+        cleaned = {}
+        lines = {}
+        for line_number, row in batch:
+            try:
+                data = clean_row(row)
+            except ValidationError as exc:
+                reject(line_number, row.get('email'), '; '.join(exc.messages))
+                continue
+            key = login_key(data['email'])
+            if key in cleaned:
+                reject(line_number, data['email'], 'duplicate email in roster')
+                continue
+            cleaned[key] = data
+            lines[key] = line_number
+
+        # usernames are set to the email too, so a clash on either column counts
+        existing = set()
+        if cleaned:
+            keys = list(cleaned)
+            for email_key, username_key in (
+                User.objects.annotate(email_key=Lower('email'), username_key=Lower('username'))
+                .filter(Q(email_key__in=keys) | Q(username_key__in=keys))
+                .values_list('email_key', 'username_key')
+            ):
+                existing.update((email_key, username_key))
+        existing.intersection_update(cleaned)
+        for key in existing:
+            del cleaned[key]
+        result.existing += len(existing)
+
+        checked = [key for key, data in cleaned.items() if data['password']]
+        errors = validate_passwords(
+            [cleaned[key]['password'] for key in checked],
+            [User(username=key, email=cleaned[key]['email'], first_name=cleaned[key]['first_name'],
+                  last_name=cleaned[key]['last_name']) for key in checked],
+        )
+        for key, error in zip(checked, errors):
+            if error is not None:
+                reject(lines[key], cleaned.pop(key)['email'], '; '.join(error.messages))
+
+        new = list(cleaned.values())
+        passwords = hashing.make_passwords([data['password'] for data in new], executor)
+        users = [
+            User(
+                username=data['email'],
+                email=data['email'],
+                password=password,
+                first_name=data['first_name'],
+                last_name=data['last_name'],
+                role=data['role'],
+            )
+            for data, password in zip(new, passwords)
+        ]
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=500)
+            # bulk_create sends no post_save, so index them here
+            search.index_users(users)
+            users_created.send(sender=User, ids=[user.pk for user in users])
+        result.created += len(users)
+
+        result.elapsed = time.perf_counter() - started
+        if progress is not None:
+            progress(result)
+
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,78 @@
+import time
+import statistics
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from users.backends import EmailBackend, login_lookup
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure login lookup latency as the user table grows. Runs against a '
+        'throwaway test database, never the configured one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', nargs='+', type=int, default=[1000, 10000, 100000, 1000000])
+        parser.add_argument('--lookups', type=int, default=200, help='lookups timed per scale')
+        parser.add_argument('--logins', type=int, default=5, help='full authenticate() calls timed per scale')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, options):
+        # every seeded account shares one hash so seeding does not pay PBKDF2 per row
+        password = make_password('bench-password')
+        seeded = 0
+        backend = EmailBackend()
+        self.stdout.write(f'{"users":>10} {"lookup p50":>12} {"lookup p99":>12} {"iexact p50":>12} {"login p50":>12}')
+        for scale in sorted(options['scales']):
+            seeded = self.seed(seeded, scale, password)
+            probes = [f'User{i}@Example.com' for i in range(0, scale, max(1, scale // options['lookups']))]
+
+            lookup = self.time_each(probes, lambda email: login_lookup(email).order_by('id').first())
+            iexact = self.time_each(probes[:20], lambda email: User.objects.filter(
+                Q(username__iexact=email) | Q(email__iexact=email)).order_by('id').first())
+            logins = self.time_each(probes[:options['logins']], lambda email: backend.authenticate(
+                None, username=email, password='bench-password'))
+
+            self.stdout.write(
+                f'{scale:>10} {self.ms(lookup, 50):>12} {self.ms(lookup, 99):>12} '
+                f'{self.ms(iexact, 50):>12} {self.ms(logins, 50):>12}'
+            )
+
+    def seed(self, start, stop, password, batch_size=5000):
+        for low in range(start, stop, batch_size):
+            User.objects.bulk_create(
+                User(username=f'user{i}@example.com', email=f'user{i}@example.com',
+                     password=password, is_student=True)
+                for i in range(low, min(low + batch_size, stop))
+            )
+        return stop
+
+    @staticmethod
+    def time_each(items, fn):
+        timings = []
+        for item in items:
+            started = time.perf_counter()
+            fn(item)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    @staticmethod
+    def ms(timings, percentile):
+        if len(timings) < 2:
+            return f'{timings[0] * 1000:.3f}ms' if timings else '-'
+        value = statistics.quantiles(timings, n=100)[percentile - 1]
+        return f'{value * 1000:.3f}ms'
@@ -0,0 +1,69 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from users import search
+from users.models import User
+
+FIRST_NAMES = ['dana', 'omar', 'noa', 'rami', 'yael', 'hassan', 'maya', 'eitan', 'lina', 'adam', 'sara', 'yosef']
+LAST_NAMES = ['levi', 'cohen', 'awaisha', 'said', 'mizrahi', 'haddad', 'peretz', 'khalil', 'biton', 'nasser']
+DOMAINS = ['uni.ac.il', 'post.uni.ac.il', 'example.com']
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database with N users, build the trigram index and '
+        'time top-K searches against a LIKE %%term%% scan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.seed(options['users'], random.Random(options['seed']))
+            self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, count, rng, batch_size=10000):
+        started = time.perf_counter()
+        for low in range(0, count, batch_size):
+            users = []
+            for i in range(low, min(low + batch_size, count)):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                email = f'{first}.{last}{i}@{rng.choice(DOMAINS)}'
+                users.append(User(username=email, email=email, first_name=first.title(), last_name=last.title()))
+            search.index_users(User.objects.bulk_create(users))
+        self.stdout.write(f'seeded and indexed {count} users in {time.perf_counter() - started:.1f}s')
+
+    def run(self, options):
+        n = options['users']
+        terms = [f'{n // 2}@', 'awaisha', 'dana levi', f'haddad{n - 1}', 'noa.', 'zzqx']
+        self.stdout.write(f'{"term":<16} {"hits":>5} {"index p50":>11} {"index max":>11} {"LIKE scan":>11}')
+        for term in terms:
+            timings = []
+            for _ in range(options['iterations']):
+                started = time.perf_counter()
+                hits = search.search(term, limit=options['limit'])
+                timings.append(time.perf_counter() - started)
+
+            words = term.split()
+            condition = Q()
+            for word in words:
+                condition &= Q(email__icontains=word) | Q(first_name__icontains=word) | Q(last_name__icontains=word)
+            started = time.perf_counter()
+            list(User.objects.filter(condition).values('id', 'email')[:options['limit']])
+            scan = time.perf_counter() - started
+
+            self.stdout.write(f'{term:<16} {len(hits):>5} {statistics.median(timings) * 1000:>9.2f}ms '
+                              f'{max(timings) * 1000:>9.2f}ms {scan * 1000:>9.2f}ms')
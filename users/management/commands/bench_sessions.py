@@ -0,0 +1,81 @@
+import random
+import tempfile
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from users import session_store
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare session engines on a request-like workload: load a session, '
+        'read it, and save it only when modified, as SessionMiddleware does. '
+        'The db engine runs against a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engines', nargs='+', default=[
+            'django.contrib.sessions.backends.db', 'users.session_store'])
+        parser.add_argument('--sessions', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=20000)
+        parser.add_argument('--write-ratio', type=float, default=0.1,
+                            help='share of requests that really change the session')
+        parser.add_argument('--noop-write-ratio', type=float, default=0.2,
+                            help='share of requests that mark the session modified without changing it')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # keep benchmark session files out of the real session directory
+        session_dir = tempfile.TemporaryDirectory()
+        session_store.SessionStore._storage_path = session_dir.name
+        try:
+            for engine in options['engines']:
+                self.bench(engine, options)
+        finally:
+            del session_store.SessionStore._storage_path
+            session_dir.cleanup()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def bench(self, engine, options):
+        store_class = import_module(engine).SessionStore
+        session_store.session_cache.clear()
+        rng = random.Random(0)
+
+        keys = []
+        for i in range(options['sessions']):
+            session = store_class()
+            session['_auth_user_id'] = str(i)
+            session['visits'] = 0
+            session.create()
+            session.save()
+            keys.append(session.session_key)
+
+        writes = 0
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            session = store_class(rng.choice(keys))
+            session.get('_auth_user_id')
+            roll = rng.random()
+            if roll < options['write_ratio']:
+                session['visits'] = session.get('visits', 0) + 1
+            elif roll < options['write_ratio'] + options['noop_write_ratio']:
+                # e.g. a flash message read or a value set to what it already was
+                session['visits'] = session.get('visits', 0)
+            if session.modified or settings.SESSION_SAVE_EVERY_REQUEST:
+                session.save()
+                writes += 1
+        elapsed = time.perf_counter() - started
+
+        for key in keys:
+            store_class(key).delete()
+
+        self.stdout.write(
+            f'{engine:<40} {options["requests"] / elapsed:>10.0f} req/s  '
+            f'{elapsed / options["requests"] * 1e6:>8.1f} us/req  '
+            f'cache hits {session_store.session_cache.hits}'
+        )
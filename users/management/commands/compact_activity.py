@@ -0,0 +1,28 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users import activity
+
+
+class Command(BaseCommand):
+    help = (
+        'Move activity log entries older than the retention period into '
+        'gzipped JSON-lines segments under ACTIVITY_ARCHIVE_DIR and delete '
+        'them from the table. Read them back with scan_activity.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ACTIVITY_RETENTION_DAYS,
+                            help='keep this many days of entries in the table')
+        parser.add_argument('--dir', help='archive directory, ACTIVITY_ARCHIVE_DIR by default')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        before = timezone.now() - timedelta(days=options['days'])
+        moved, segments = activity.compact(before, options['dir'])
+        self.stdout.write(f'archived {moved} entries from before {before:%Y-%m-%d} '
+                          f'in {segments} segments in {time.perf_counter() - started:.1f}s')
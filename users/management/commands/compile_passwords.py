@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users import passwords
+
+
+class Command(BaseCommand):
+    help = (
+        'Compile password lists (one password per line, optionally gzipped) '
+        'into the memory-mapped blocklist read by users.passwords.'
+        'BlocklistValidator. Django\'s common password list is included unless '
+        '--without-django-list is given. Restart the workers to pick up a new '
+        'list.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('lists', nargs='*', help='password list files')
+        parser.add_argument('--sha1', nargs='+', default=[], metavar='LIST',
+                            help='lists of hex SHA-1 digests, optionally with ":count" (Have I Been Pwned)')
+        parser.add_argument('--output', help='defaults to PASSWORD_BLOCKLIST')
+        parser.add_argument('--without-django-list', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=passwords.CHUNK_SIZE,
+                            help='fingerprints sorted in memory at a time')
+
+    def handle(self, *args, **options):
+        sources = [passwords.read_list(path) for path in options['lists']]
+        sources += [passwords.read_list(path, sha1=True) for path in options['sha1']]
+        if not options['without_django_list']:
+            sources.append(passwords.read_list(passwords.DJANGO_LIST))
+        if not sources:
+            raise CommandError('nothing to compile')
+        output = options['output'] or settings.PASSWORD_BLOCKLIST
+
+        started = time.perf_counter()
+        try:
+            count = passwords.compile_blocklist(sources, output, options['chunk_size'])
+        except OSError as exc:
+            raise CommandError(f'cannot compile the blocklist: {exc}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Compiled {count} passwords into {output} ({count * 8 / 2 ** 20:.1f} MiB) '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,55 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from users import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        'Deliver queued email from the outbox in batches over one persistent '
+        'connection to OUTBOX_DELIVERY_BACKEND. Runs until interrupted unless '
+        '--once is given; prints one metrics line per non-empty batch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=2.0, help='seconds to sleep when the outbox is empty')
+        parser.add_argument('--idle-close', type=float, default=60.0,
+                            help='close the connection after this many idle seconds')
+        parser.add_argument('--once', action='store_true', help='drain what is due now, then exit')
+        parser.add_argument('--json', action='store_true', help='print metrics as JSON lines')
+
+    def handle(self, *args, **options):
+        connection = outbox.delivery_connection()
+        idle_since = None
+        try:
+            while True:
+                result = outbox.drain(connection, options['batch_size'])
+                if result.claimed:
+                    idle_since = None
+                    self.report(result, options['json'])
+                    continue
+                if options['once']:
+                    return
+                idle_since = idle_since or time.monotonic()
+                if time.monotonic() - idle_since > options['idle_close']:
+                    # most servers drop idle sessions anyway
+                    connection.close()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
+
+    def report(self, result, as_json):
+        if as_json:
+            self.stdout.write(json.dumps(result.as_dict()))
+            return
+        rate = result.sent / result.elapsed if result.elapsed else 0.0
+        self.stdout.write(
+            f'batch of {result.claimed}: {result.sent} sent, {result.retried} to retry, '
+            f'{result.failed} failed, {result.connections} connection(s) opened '
+            f'in {result.elapsed * 1000:.0f}ms ({rate:.0f} msg/s)'
+        )
@@ -0,0 +1,57 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users import hashing
+from users.importer import import_roster
+
+
+class Command(BaseCommand):
+    help = (
+        'Import a CSV or JSONL roster of users (columns: email, password, role, '
+        'first_name, last_name). Passwords are hashed on a process pool.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('roster', help="path to the roster file, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=None, help='hashing processes (default: all cores)')
+        parser.add_argument('--rejects', help='write rejected rows to this JSONL file')
+
+    def handle(self, *args, **options):
+        path = options['roster']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        try:
+            roster = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        except OSError as exc:
+            raise CommandError(f'cannot read {path}: {exc}')
+        rejects = open(options['rejects'], 'w', encoding='utf-8') if options['rejects'] else None
+
+        def progress(result):
+            self.stdout.write(
+                f'{result.rows} rows: {result.created} created, {result.existing} existing, '
+                f'{result.rejected} rejected ({result.rows_per_second:.0f} rows/s)'
+            )
+
+        try:
+            with hashing.process_pool(options['workers']) as executor:
+                result = import_roster(
+                    roster, fmt,
+                    batch_size=options['batch_size'],
+                    executor=executor,
+                    rejects=rejects,
+                    progress=progress,
+                )
+        finally:
+            if roster is not sys.stdin:
+                roster.close()
+            if rejects is not None:
+                rejects.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} users in {result.elapsed:.1f}s '
+            f'({result.rows_per_second:.0f} rows/s); {result.existing} already existed, '
+            f'{result.rejected} rejected.'
+        ))
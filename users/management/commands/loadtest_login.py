@@ -0,0 +1,110 @@
+import http.cookiejar
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammer the login view of a running server with concurrent logins and '
+        'report p50/p99 latency, 503 counts and the latency of a probe page '
+        'requested at the same time. Start the server first, e.g. '
+        '"uvicorn SmartRequestProject.asgi:application --workers 1".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--email', required=True, help='an existing account')
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=500, help='total login attempts')
+        parser.add_argument('--probe-path', default='/', help='page timed alongside the logins')
+
+    def handle(self, *args, **options):
+        base = options['base_url'].rstrip('/')
+        login_url = base + '/accounts/login/'
+        try:
+            urllib.request.urlopen(login_url, timeout=5).read()
+        except (OSError, urllib.error.URLError) as exc:
+            raise CommandError(f'cannot reach {login_url}: {exc}')
+
+        done = threading.Event()
+        probe_timings = []
+
+        def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                try:
+                    urllib.request.urlopen(base + options['probe_path'], timeout=30).read()
+                except OSError:
+                    pass
+                probe_timings.append(time.perf_counter() - started)
+                time.sleep(0.05)
+
+        probe_thread = threading.Thread(target=probe, daemon=True)
+        probe_thread.start()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(
+                lambda _: self.login_once(login_url, options['email'], options['password']),
+                range(options['requests']),
+            ))
+        elapsed = time.perf_counter() - started
+        done.set()
+        probe_thread.join()
+
+        statuses = {}
+        for status, _ in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        ok = [seconds for status, seconds in results if status == 302]
+        busy = [seconds for status, seconds in results if status == 503]
+
+        self.stdout.write(f'{len(results)} logins in {elapsed:.1f}s ({len(results) / elapsed:.1f}/s), '
+                          f'concurrency {options["concurrency"]}')
+        self.stdout.write(f'status codes: {dict(sorted(statuses.items()))}')
+        self.stdout.write(f'successful login  p50 {self.pct(ok, 50)}  p99 {self.pct(ok, 99)}')
+        self.stdout.write(f'503 (backpressure) p50 {self.pct(busy, 50)}  p99 {self.pct(busy, 99)}')
+        self.stdout.write(f'probe {options["probe_path"]}  p50 {self.pct(probe_timings, 50)}  '
+                          f'p99 {self.pct(probe_timings, 99)}')
+
+    @staticmethod
+    def login_once(login_url, email, password):
+        # fresh cookie jar per attempt: every login is a new session
+        jar = http.cookiejar.CookieJar()
+        opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(jar), NoRedirect())
+        opener.open(login_url, timeout=30).read()
+        token = next((c.value for c in jar if c.name == 'csrftoken'), '')
+        body = urllib.parse.urlencode({
+            'email': email, 'password': password, 'csrfmiddlewaretoken': token,
+        }).encode()
+
+        started = time.perf_counter()
+        try:
+            response = opener.open(login_url, data=body, timeout=60)
+            status = response.status
+            response.read()
+        except urllib.error.HTTPError as exc:
+            status = exc.code
+        return status, time.perf_counter() - started
+
+    @staticmethod
+    def pct(timings, percentile):
+        if not timings:
+            return '-'
+        if len(timings) == 1:
+            return f'{timings[0] * 1000:.0f}ms'
+        return f'{statistics.quantiles(timings, n=100)[percentile - 1] * 1000:.0f}ms'
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # a successful login is the 302 itself; don't time the dashboard render
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users import search
+from users.models import User, UserSearchGram
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every user's trigram search postings, one batch of users "
+        "per transaction, so searches keep working while it runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--truncate', action='store_true',
+                            help='empty the index first (faster, but searches miss until it finishes)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['truncate']:
+            UserSearchGram.objects.all().delete()
+        users = User.objects.only('id', *search.SEARCH_FIELDS).order_by('pk')
+        done = last_pk = 0
+        while True:
+            batch = list(users.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            search.index_users(batch)
+            done += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'{done} users indexed ({done / (time.perf_counter() - started):.0f}/s)')
+        self.stdout.write(f'{UserSearchGram.objects.count()} postings for {done} users '
+                          f'in {time.perf_counter() - started:.1f}s')
@@ -0,0 +1,39 @@
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from users import activity
+
+
+class Command(BaseCommand):
+    help = (
+        'Print archived activity log entries as JSON lines, oldest first, '
+        'streaming the compacted segments without loading them whole.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='ISO date or datetime, inclusive')
+        parser.add_argument('--until', help='ISO date or datetime, exclusive')
+        parser.add_argument('--actor', help='only entries by this email')
+        parser.add_argument('--action', help='only this action, e.g. login')
+        parser.add_argument('--dir', help='archive directory, ACTIVITY_ARCHIVE_DIR by default')
+
+    def handle(self, *args, **options):
+        entries = activity.scan_archive(
+            since=self.parse_time(options['since']), until=self.parse_time(options['until']),
+            actor=options['actor'], action=options['action'], directory=options['dir'],
+        )
+        for entry in entries:
+            self.stdout.write(json.dumps(entry))
+
+    @staticmethod
+    def parse_time(value):
+        if not value:
+            return None
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'not an ISO date: {value!r}')
+        return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
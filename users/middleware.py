@@ -0,0 +1,18 @@
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from .hashing import HashingBusy
+
+
+class HashingBackpressureMiddleware(MiddlewareMixin):
+    """
+    Answer with a fast 503 and Retry-After when the password hashing pool is
+    saturated, rather than queueing more CPU work behind it.
+    """
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, HashingBusy):
+            response = HttpResponse('The server is busy, please try again shortly.', status=503)
+            response['Retry-After'] = str(exception.retry_after)
+            return response
+        return None
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_login_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sent', 'Sent'), ('failed', 'Failed')], default='queued', max_length=8)),
+                ('subject', models.CharField(blank=True, max_length=255)),
+                ('from_email', models.CharField(max_length=320)),
+                ('recipients', models.JSONField()),
+                ('raw', models.BinaryField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('next_attempt', models.DateTimeField()),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('sent', models.DateTimeField(blank=True, null=True)),
+                ('lease', models.UUIDField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'next_attempt'], name='outbox_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchGram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=3)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('gram', 'user'), name='user_search_gram_user_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:09
+
+from django.db import migrations, models
+
+# later roles win when a user had more than one flag set, the same order the
+# templates used to pick the label
+FLAG_ROLES = (('is_student', 'student'), ('is_lect', 'lecturer'), ('is_superuser', 'superuser'))
+
+
+def flags_to_role(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    for flag, role in FLAG_ROLES:
+        User.objects.filter(**{flag: True}).update(role=role)
+
+
+def role_to_flags(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    for flag, role in FLAG_ROLES:
+        User.objects.filter(role=role).update(**{flag: True})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0004_user_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='role',
+            field=models.CharField(blank=True, choices=[('', 'None'), ('student', 'Student'), ('lecturer', 'Lecturer'), ('superuser', 'Secretary')], default='', max_length=10),
+        ),
+        migrations.RunPython(flags_to_role, role_to_flags),
+        migrations.RemoveField(
+            model_name='user',
+            name='is_lect',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='is_student',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='is_superuser',
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'email'], name='users_user_role_email_idx'),
+        ),
+    ]
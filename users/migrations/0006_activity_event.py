@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_role'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField()),
+                ('actor_pk', models.BigIntegerField(blank=True, null=True)),
+                ('actor', models.CharField(blank=True, max_length=254)),
+                ('action', models.CharField(choices=[('login', 'Logged in'), ('logout', 'Logged out'), ('add_user', 'Added user'), ('delete_user', 'Deleted user'), ('change_role', 'Changed role')], max_length=16)),
+                ('target', models.CharField(blank=True, max_length=254)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created'], name='activity_created_idx')],
+            },
+        ),
+    ]
@@ -1,11 +1,177 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
 # Create your models here.
 
+
+def _role_lookups(q, roles):
+    """``q`` with its lookups on the role flags rewritten as lookups on role."""
+    children = []
+    for child in q.children:
+        if isinstance(child, Q):
+            child = _role_lookups(child, roles)
+        elif isinstance(child, tuple) and child[0].removesuffix('__exact') in roles:
+            role = Q(role=roles[child[0].removesuffix('__exact')])
+            child = role if child[1] else ~role
+        children.append(child)
+    return Q(*children, _connector=q.connector, _negated=q.negated)
+
+
+class UserQuerySet(models.QuerySet):
+    """
+    Takes the role flags in filters too, such as the Q(is_superuser=True) of
+    ModelBackend.with_perm(): they are properties, not columns.
+    """
+
+    def _filter_or_exclude_inplace(self, negate, args, kwargs):
+        q = _role_lookups(Q(*args, **kwargs), self.model.ROLE_FLAGS)
+        super()._filter_or_exclude_inplace(negate, (q,), {})
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    # Django's create_user passes is_superuser=False, which would clear a
+    # role given next to it; unset, the flags read False anyway
+
+    def create_user(self, username, email=None, password=None, **extra_fields):
+        extra_fields.setdefault('is_staff', False)
+        return self._create_user(username, email, password, **extra_fields)
+
+    create_user.alters_data = True
+
+    async def acreate_user(self, username, email=None, password=None, **extra_fields):
+        extra_fields.setdefault('is_staff', False)
+        return await self._acreate_user(username, email, password, **extra_fields)
+
+    acreate_user.alters_data = True
+
+
 class User(AbstractUser):
+
+    class Role(models.TextChoices):
+        # same vocabulary as the add-user form and the roster importer
+        NONE = '', 'None'
+        STUDENT = 'student', 'Student'
+        LECTURER = 'lecturer', 'Lecturer'
+        SUPERUSER = 'superuser', 'Secretary'
+
     email=models.EmailField(unique=True)
-    is_student=models.BooleanField(default=False)
-    is_lect=models.BooleanField(default=False)
-    is_superuser=models.BooleanField(default=False)
+    role = models.CharField(max_length=10, choices=Role.choices, default=Role.NONE, blank=True)
+    # is_student, is_lect and is_superuser are properties over role, see
+    # below; UserQuerySet accepts them in filters
+    ROLE_FLAGS = {'is_student': Role.STUDENT, 'is_lect': Role.LECTURER, 'is_superuser': Role.SUPERUSER}
+
+    objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # role filters and counts, and the role-filtered user table
+            # ordered by email
+            models.Index(fields=['role', 'email'], name='users_user_role_email_idx'),
+            # login matches username/email case-insensitively, see users.backends
+            models.Index(Lower('email'), name='users_user_email_lower_idx'),
+            models.Index(Lower('username'), name='users_user_username_lower_idx'),
+        ]
+
+    def _role_flag(role):
+        def getter(self):
+            return self.role == role
+
+        def setter(self, value):
+            # clearing a flag only clears the role it stands for, so setting
+            # the three flags one after another still leaves the right role
+            if value:
+                self.role = role
+            elif self.role == role:
+                self.role = User.Role.NONE
+
+        return property(getter, setter)
+
+    is_student = _role_flag(Role.STUDENT)
+    is_lect = _role_flag(Role.LECTURER)
+    is_superuser = _role_flag(Role.SUPERUSER)
+    del _role_flag
+
+
+class OutboxMessage(models.Model):
+    """
+    An email waiting in the local outbox, see users.outbox.
+
+    ``raw`` is the fully rendered MIME message; the envelope sender and
+    recipients (Bcc included) are stored beside it.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        SENT = 'sent', 'Sent'
+        FAILED = 'failed', 'Failed'
+
+    status = models.CharField(max_length=8, choices=Status.choices, default=Status.QUEUED)
+    subject = models.CharField(max_length=255, blank=True)
+    from_email = models.CharField(max_length=320)
+    recipients = models.JSONField()
+    raw = models.BinaryField()
+    created = models.DateTimeField(auto_now_add=True)
+    next_attempt = models.DateTimeField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent = models.DateTimeField(null=True, blank=True)
+    # set by the drain_outbox worker that holds the message, see outbox.claim
+    lease = models.UUIDField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the worker's "due messages, oldest first" scan
+            models.Index(fields=['status', 'next_attempt'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} -> {", ".join(self.recipients)} ({self.status})'
+
+
+class UserSearchGram(models.Model):
+    """
+    One posting of the user search index: ``user`` has the trigram ``gram``
+    in their email, first name or last name. Maintained by users.search.
+    """
+
+    gram = models.CharField(max_length=3)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            # a gram's postings in user order, and the "has gram" probes
+            models.UniqueConstraint(fields=['gram', 'user'], name='user_search_gram_user_uniq'),
+        ]
+
+
+class ActivityEvent(models.Model):
+    """
+    One entry of the append-only activity log, see users.activity.
+
+    The actor is stored by value, not as a foreign key, so entries outlive
+    the users they mention and deleting a user touches no log rows.
+    """
+
+    class Action(models.TextChoices):
+        LOGIN = 'login', 'Logged in'
+        LOGOUT = 'logout', 'Logged out'
+        ADD_USER = 'add_user', 'Added user'
+        DELETE_USER = 'delete_user', 'Deleted user'
+        CHANGE_ROLE = 'change_role', 'Changed role'
+
+    created = models.DateTimeField()
+    actor_pk = models.BigIntegerField(null=True, blank=True)
+    actor = models.CharField(max_length=254, blank=True)
+    action = models.CharField(max_length=16, choices=Action.choices)
+    # what the action was done to, e.g. the added user's email
+    target = models.CharField(max_length=254, blank=True)
+
+    class Meta:
+        indexes = [
+            # the retention job's "older than" range
+            models.Index(fields=['created'], name='activity_created_idx'),
+        ]
 
-    
\ No newline at end of file
+    def __str__(self):
+        return f'{self.actor or "anonymous"} {self.get_action_display().lower()} {self.target}'.rstrip()
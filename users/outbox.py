@@ -0,0 +1,173 @@
+"""
+Durable local outbox for outgoing email.
+
+``OutboxBackend`` is the project's EMAIL_BACKEND: ``send_mail`` (and so
+the password-reset view) only renders the message and inserts it into
+OutboxMessage, which returns as soon as the row is written. Delivery
+happens in ``manage.py drain_outbox``. It claims due messages in batches
+and sends them through OUTBOX_DELIVERY_BACKEND (SMTP in production) over
+one connection that is kept open across batches.
+
+A message that fails with a temporary error (a 4xx reply, a dropped
+connection, a timeout) is retried with exponential backoff:
+OUTBOX_RETRY_BASE seconds, doubling up to OUTBOX_RETRY_MAX. It is marked
+failed after OUTBOX_MAX_ATTEMPTS attempts, or straight away on a 5xx reply.
+"""
+import smtplib
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Queue messages in the outbox instead of sending them."""
+
+    def send_messages(self, email_messages):
+        now = timezone.now()
+        rows = [
+            OutboxMessage(
+                subject=message.subject[:255],
+                from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+                recipients=message.recipients(),
+                raw=message.message().as_bytes(),
+                next_attempt=now,
+            )
+            for message in email_messages
+            if message.recipients()
+        ]
+        with transaction.atomic():
+            OutboxMessage.objects.bulk_create(rows)
+        return len(rows)
+
+
+class StoredMessage:
+    """
+    An outbox row in the shape Django's email backends send: the stored MIME
+    bytes are passed through as they are, not rendered again.
+    """
+
+    def __init__(self, row):
+        self.subject = row.subject
+        self.from_email = row.from_email
+        self.to = list(row.recipients)
+        self.encoding = None
+        self.raw = bytes(row.raw)
+
+    def recipients(self):
+        return self.to
+
+    def message(self):
+        return self
+
+    def as_bytes(self, linesep='\n', **kwargs):
+        return self.raw.replace(b'\n', linesep.encode()) if linesep != '\n' else self.raw
+
+
+@dataclass
+class DrainResult:
+    claimed: int = 0
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    connections: int = 0
+    elapsed: float = 0.0
+
+    def as_dict(self):
+        return {
+            'claimed': self.claimed, 'sent': self.sent, 'retried': self.retried,
+            'failed': self.failed, 'connections': self.connections,
+            'elapsed_ms': round(self.elapsed * 1000, 3),
+        }
+
+
+def claim(batch_size):
+    """
+    Lease up to ``batch_size`` due messages to this worker, oldest first.
+
+    The conditional UPDATE only takes rows that are still due, so two
+    workers never claim the same message. A lease that is not released
+    (the worker died) runs out after OUTBOX_LEASE seconds.
+    """
+    now = timezone.now()
+    due = list(
+        OutboxMessage.objects
+        .filter(status=OutboxMessage.Status.QUEUED, next_attempt__lte=now)
+        .order_by('next_attempt', 'id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not due:
+        return []
+    lease = uuid.uuid4()
+    OutboxMessage.objects.filter(
+        id__in=due, status=OutboxMessage.Status.QUEUED, next_attempt__lte=now,
+    ).update(lease=lease, next_attempt=now + timedelta(seconds=settings.OUTBOX_LEASE))
+    return list(OutboxMessage.objects.filter(lease=lease).order_by('next_attempt', 'id'))
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(settings.OUTBOX_RETRY_BASE * 2 ** (attempts - 1), settings.OUTBOX_RETRY_MAX))
+
+
+def is_permanent(exc):
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code >= 500
+
+
+def drain(connection, batch_size=100):
+    """
+    Send one batch of due messages over ``connection``, an email backend
+    opened by the caller and left open for the next batch.
+    """
+    started = time.perf_counter()
+    result = DrainResult()
+    rows = claim(batch_size)
+    result.claimed = len(rows)
+    for index, row in enumerate(rows):
+        try:
+            if connection.open():
+                result.connections += 1
+        except OSError as exc:
+            # the server is unreachable: hand the rest of the batch back
+            # without using up their attempts
+            OutboxMessage.objects.filter(pk__in=[row.pk for row in rows[index:]]).update(
+                lease=None, next_attempt=timezone.now() + backoff(1),
+                last_error=f'{type(exc).__name__}: {exc}'[:1000],
+            )
+            result.retried += len(rows) - index
+            break
+        row.attempts += 1
+        try:
+            connection.send_messages([StoredMessage(row)])
+        except (smtplib.SMTPException, OSError) as exc:
+            row.last_error = f'{type(exc).__name__}: {exc}'[:1000]
+            if is_permanent(exc) or row.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                row.status = OutboxMessage.Status.FAILED
+                result.failed += 1
+            else:
+                row.next_attempt = timezone.now() + backoff(row.attempts)
+                result.retried += 1
+            if isinstance(exc, smtplib.SMTPServerDisconnected) or not isinstance(exc, smtplib.SMTPException):
+                # the connection is gone; the next message opens a new one
+                connection.close()
+        else:
+            row.status = OutboxMessage.Status.SENT
+            row.sent = timezone.now()
+            result.sent += 1
+        row.lease = None
+        row.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt', 'sent', 'lease'])
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def delivery_connection():
+    return get_connection(settings.OUTBOX_DELIVERY_BACKEND)
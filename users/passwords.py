@@ -0,0 +1,281 @@
+"""
+Password blocklist compiled to a memory-mapped file.
+
+Django's CommonPasswordValidator decompresses its list into a set in every
+worker process. ``manage.py compile_passwords`` instead turns password lists
+(plain text, optionally gzipped, or SHA-1 dumps such as Have I Been Pwned's)
+into one sorted array of 64-bit fingerprints at PASSWORD_BLOCKLIST. Workers
+map that file read-only, so however many there are the list sits in memory
+once, in the page cache, and a lookup is a binary search over it: a few
+microseconds for hundreds of millions of passwords.
+
+A fingerprint is the first 8 bytes of the SHA-1 of a password. A password is
+looked up both as typed, which is how breach dumps list them, and lowercased
+and stripped, which is how plain lists are compiled (the same normalisation
+as CommonPasswordValidator). With n entries, the chance that some other
+password collides with one is about n / 2**64.
+
+Until a list has been compiled, Django's own 20,000 common passwords are
+used, fingerprinted in memory. The file is replaced atomically, and a worker
+keeps the list it mapped until it restarts.
+
+SimilarityValidator gives the same verdicts as Django's
+UserAttributeSimilarityValidator without building a difflib SequenceMatcher
+for every part of every user attribute, which was most of the cost of
+validating a password.
+
+``validate_passwords`` checks a batch against AUTH_PASSWORD_VALIDATORS. A
+validator with a ``validate_many`` method, such as BlocklistValidator, gets
+the whole batch in one call; the roster importer validates this way.
+"""
+import functools
+import gzip
+import hashlib
+import heapq
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain, islice
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import password_validation
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError
+from django.utils.translation import gettext as _
+
+# magic, format version, byte order of the fingerprints, entry count
+HEADER = struct.Struct('<4sBBxxQ')
+MAGIC = b'PWBL'
+VERSION = 1
+BYTE_ORDER = 0 if sys.byteorder == 'little' else 1
+
+# fingerprints sorted in memory per run when compiling; 8 bytes each on disk
+CHUNK_SIZE = 2_000_000
+
+DJANGO_LIST = Path(password_validation.__file__).resolve().parent / 'common-passwords.txt.gz'
+
+
+def fingerprint(data):
+    return int.from_bytes(hashlib.sha1(data).digest()[:8], 'little')
+
+
+def fingerprints(password):
+    """The fingerprints a password is looked up under: as typed and normalised."""
+    typed = fingerprint(password.encode())
+    normalised = fingerprint(password.lower().strip().encode())
+    return (typed,) if typed == normalised else (typed, normalised)
+
+
+def read_list(path, sha1=False):
+    """
+    Yield the fingerprints of a password list, one password per line.
+    ``sha1`` reads hex SHA-1 digests instead, optionally followed by
+    ``:count``, as in Have I Been Pwned's downloads.
+    """
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'rb') as lines:
+        for line in lines:
+            if sha1:
+                digest = line.split(b':', 1)[0].strip()
+                if len(digest) == 40:
+                    yield int.from_bytes(bytes.fromhex(digest[:16].decode('ascii')), 'little')
+                continue
+            try:
+                password = line.rstrip(b'\r\n').decode('utf-8')
+            except UnicodeDecodeError:
+                # no password typed into a form encodes to this
+                continue
+            password = password.lower().strip()
+            if password:
+                yield fingerprint(password.encode())
+
+
+def _read_run(run, block=8192):
+    while data := run.read(block * 8):
+        values = array('Q')
+        values.frombytes(data)
+        yield from values
+
+
+def compile_blocklist(sources, output, chunk_size=CHUNK_SIZE):
+    """
+    Write the fingerprints from ``sources`` (iterables of fingerprints),
+    sorted and deduplicated, to ``output`` and return how many there are.
+    Runs of ``chunk_size`` are sorted in memory and merged from disk, so a
+    list larger than memory compiles too.
+    """
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=output.parent, prefix='.blocklist-') as scratch:
+        runs = []
+        pending = chain.from_iterable(sources)
+        while chunk := sorted(set(islice(pending, chunk_size))):
+            run = open(Path(scratch) / f'run-{len(runs)}', 'w+b')
+            array('Q', chunk).tofile(run)
+            run.seek(0)
+            runs.append(run)
+
+        count = 0
+        previous = None
+        out = array('Q')
+        with open(Path(scratch) / 'blocklist', 'wb') as compiled:
+            compiled.write(bytes(HEADER.size))
+            for value in heapq.merge(*map(_read_run, runs)):
+                if value == previous:
+                    continue
+                previous = value
+                out.append(value)
+                if len(out) >= 65536:
+                    out.tofile(compiled)
+                    count += len(out)
+                    del out[:]
+            out.tofile(compiled)
+            count += len(out)
+            compiled.seek(0)
+            compiled.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER, count))
+        for run in runs:
+            run.close()
+        # a worker mapping the old file keeps reading it until it restarts
+        os.replace(Path(scratch) / 'blocklist', output)
+    return count
+
+
+class Blocklist:
+    """Sorted fingerprints, searched in place."""
+
+    def __init__(self, fingerprints, source):
+        self.fingerprints = fingerprints
+        self.source = source
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def __contains__(self, password):
+        return any(self._has(value) for value in fingerprints(password))
+
+    def _has(self, value):
+        index = bisect_left(self.fingerprints, value)
+        return index < len(self.fingerprints) and self.fingerprints[index] == value
+
+    def find(self, passwords):
+        """The indexes of the passwords in ``passwords`` that are on the list."""
+        wanted = sorted((value, i) for i, password in enumerate(passwords) for value in fingerprints(password))
+        found = set()
+        lo = 0
+        for value, i in wanted:
+            # in order, so each search starts where the last one ended
+            lo = bisect_left(self.fingerprints, value, lo)
+            if lo < len(self.fingerprints) and self.fingerprints[lo] == value:
+                found.add(i)
+        return found
+
+
+@functools.lru_cache(maxsize=None)
+def blocklist(path=None):
+    """The compiled blocklist at ``path`` (default PASSWORD_BLOCKLIST), mapped once per process."""
+    path = Path(path or settings.PASSWORD_BLOCKLIST)
+    try:
+        file = open(path, 'rb')
+    except FileNotFoundError:
+        return Blocklist(array('Q', sorted(set(read_list(DJANGO_LIST)))), DJANGO_LIST)
+    with file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, byte_order, count = HEADER.unpack_from(mapped)
+    if (magic, version, byte_order) != (MAGIC, VERSION, BYTE_ORDER):
+        raise ImproperlyConfigured(f'{path} is not a password blocklist for this machine; run manage.py compile_passwords')
+    return Blocklist(memoryview(mapped)[HEADER.size:HEADER.size + count * 8].cast('Q'), path)
+
+
+class BlocklistValidator:
+    """Reject passwords on the compiled blocklist, see users.passwords."""
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def validate(self, password, user=None):
+        if password in blocklist(self.path):
+            raise ValidationError(self.get_error_message(), code='password_too_common')
+
+    def validate_many(self, passwords, users=None):
+        """{index: ValidationError} for the passwords in ``passwords`` on the list."""
+        return {
+            i: ValidationError(self.get_error_message(), code='password_too_common')
+            for i in blocklist(self.path).find(passwords)
+        }
+
+    def get_error_message(self):
+        return _('This password is too common.')
+
+    def get_help_text(self):
+        return _('Your password can’t be a commonly used password.')
+
+
+class SimilarityValidator(password_validation.UserAttributeSimilarityValidator):
+    """
+    UserAttributeSimilarityValidator, with difflib's quick_ratio worked out
+    from character counts: twice the characters two strings share over
+    their total length. Parts too short or too long to reach max_similarity
+    are skipped before counting, and the password is counted once.
+    """
+
+    def validate(self, password, user=None):
+        if not user:
+            return
+        password = password.lower()
+        letters = Counter(password)
+        for attribute_name in self.user_attributes:
+            value = getattr(user, attribute_name, None)
+            if not value or not isinstance(value, str):
+                continue
+            value_lower = value.lower()
+            for value_part in re.split(r'\W+', value_lower) + [value_lower]:
+                if password_validation.exceeds_maximum_length_ratio(password, self.max_similarity, value_part):
+                    continue
+                total = len(password) + len(value_part)
+                if not total:
+                    # two empty strings are identical, as in SequenceMatcher
+                    shared = total = 1
+                elif 2 * min(len(password), len(value_part)) / total < self.max_similarity:
+                    # they cannot share more characters than the shorter has
+                    continue
+                else:
+                    shared = sum(min(count, letters[char]) for char, count in Counter(value_part).items())
+                if 2 * shared / total >= self.max_similarity:
+                    try:
+                        verbose_name = str(user._meta.get_field(attribute_name).verbose_name)
+                    except FieldDoesNotExist:
+                        verbose_name = attribute_name
+                    raise ValidationError(
+                        self.get_error_message(),
+                        code='password_too_similar',
+                        params={'verbose_name': verbose_name},
+                    )
+
+
+def validate_passwords(passwords, users=None, password_validators=None):
+    """
+    Validate a batch of passwords, with ``users`` the matching users (for
+    the similarity check). Returns a ValidationError, or None when it
+    passed, per password.
+    """
+    if password_validators is None:
+        password_validators = password_validation.get_default_password_validators()
+    users = users or [None] * len(passwords)
+    errors = [[] for password in passwords]
+    for validator in password_validators:
+        if hasattr(validator, 'validate_many'):
+            for i, error in validator.validate_many(passwords, users).items():
+                errors[i].append(error)
+            continue
+        for i, (password, user) in enumerate(zip(passwords, users)):
+            try:
+                validator.validate(password, user)
+            except ValidationError as error:
+                errors[i].append(error)
+    return [ValidationError(found) if found else None for found in errors]
@@ -0,0 +1,140 @@
+"""
+Trigram search over user emails and names.
+
+Every user's lower-cased email, first name and last name are broken into
+trigrams, stored as UserSearchGram postings with a unique (gram, user) index.
+A signal keeps a user's postings current when those fields change.
+``manage.py rebuild_search_index`` recomputes them all after a bulk load.
+
+A search term matches a user when each of its words is a substring of
+their email or one of their names. Every trigram of a word must then be in
+the user's postings. ``search`` first asks how common each trigram is, by
+counting postings up to ESTIMATE_CAP. It walks the postings of the rarest
+trigram and keeps only users who also have the next rarest ones, each
+checked with an index probe. The few candidates left are checked with a
+real substring test. Email prefix matches are taken first from the
+Lower(email) index, so they rank first.
+"""
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.functions import Lower
+
+from .models import User, UserSearchGram
+
+SEARCH_FIELDS = ('email', 'first_name', 'last_name')
+
+# postings counted per trigram when picking the rarest ones
+ESTIMATE_CAP = 1000
+# trigrams counted per statement, under SQLite's 500 compound SELECTs
+ESTIMATE_BATCH = 250
+# email prefix rows checked against the other words of a multi-word term
+PREFIX_SCAN = 200
+# trigrams besides the rarest checked in SQL before the substring test
+PROBES = 2
+# candidate ids verified per round trip: starts small for the common case
+# of plenty of matches, doubles while they are scarce
+FIRST_CHUNK = 50
+MAX_CHUNK = 2000
+
+
+def trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def user_trigrams(user):
+    grams = set()
+    for field in SEARCH_FIELDS:
+        grams |= trigrams(getattr(user, field) or '')
+    return grams
+
+
+def index_users(users):
+    """(Re)build the postings of ``users``, which must have their search fields loaded."""
+    users = list(users)
+    with transaction.atomic():
+        UserSearchGram.objects.filter(user__in=[user.pk for user in users]).delete()
+        UserSearchGram.objects.bulk_create(
+            (UserSearchGram(gram=gram, user_id=user.pk) for user in users for gram in user_trigrams(user)),
+            batch_size=5000,
+        )
+
+
+def _estimates(grams):
+    """
+    {gram: number of postings, counted up to ESTIMATE_CAP}, in one statement
+    per ESTIMATE_BATCH grams.
+    """
+    table = UserSearchGram._meta.db_table
+    capped = f'SELECT %s, (SELECT COUNT(*) FROM (SELECT 1 FROM {table} WHERE gram = %s LIMIT {ESTIMATE_CAP}))'
+    grams = list(grams)
+    counts = {}
+    with connection.cursor() as cursor:
+        for start in range(0, len(grams), ESTIMATE_BATCH):
+            batch = grams[start:start + ESTIMATE_BATCH]
+            cursor.execute(' UNION ALL '.join([capped] * len(batch)), [value for gram in batch for value in (gram, gram)])
+            counts.update(cursor.fetchall())
+    return counts
+
+
+def _matches(words):
+    condition = Q()
+    for word in words:
+        condition &= Q(email__icontains=word) | Q(first_name__icontains=word) | Q(last_name__icontains=word)
+    return condition
+
+
+def search(term, limit=10, fields=('id', 'email', 'first_name', 'last_name')):
+    """The top ``limit`` users matching ``term``, as dicts of ``fields``."""
+    words = term.lower().split()
+    if not words:
+        return []
+    results = []
+    seen = set()
+
+    # 1. email prefix matches, straight off the Lower(email) index; the
+    # other words are only checked against the first PREFIX_SCAN of them,
+    # anything further down is still found by the trigram walk below
+    prefix = words[0]
+    prefixed = (
+        User.objects.alias(email_key=Lower('email'))
+        .filter(email_key__gte=prefix, email_key__lt=prefix + '\uffff')
+        .order_by(Lower('email'))
+    )
+    if len(words) > 1:
+        scanned = prefixed.values('pk')[:PREFIX_SCAN]
+        prefixed = prefixed.filter(pk__in=scanned).filter(_matches(words[1:]))
+    prefixed = prefixed.values(*fields)[:limit]
+    for row in prefixed:
+        results.append(row)
+        seen.add(row['id'])
+
+    grams = set().union(*(trigrams(word) for word in words))
+    if len(results) >= limit or not grams:
+        return results
+
+    # 2. substring matches, starting from the rarest trigram's postings
+    counts = _estimates(grams)
+    ranked = sorted(grams, key=counts.get)
+    if not counts[ranked[0]]:
+        return results
+    postings = UserSearchGram.objects.filter(gram=ranked[0])
+    for gram in ranked[1:1 + PROBES]:
+        postings = postings.filter(Exists(UserSearchGram.objects.filter(gram=gram, user_id=OuterRef('user_id'))))
+    last_id = 0
+    chunk = max(FIRST_CHUNK, limit * 2)
+    while len(results) < limit:
+        candidates = list(
+            postings.filter(user_id__gt=last_id).order_by('user_id').values_list('user_id', flat=True)[:chunk]
+        )
+        if not candidates:
+            break
+        last_id = candidates[-1]
+        chunk = min(chunk * 2, MAX_CHUNK)
+        for row in User.objects.filter(pk__in=candidates).filter(_matches(words)).order_by('pk').values(*fields):
+            if row['id'] not in seen:
+                results.append(row)
+                seen.add(row['id'])
+                if len(results) >= limit:
+                    break
+    return results
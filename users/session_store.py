@@ -0,0 +1,189 @@
+"""
+File-backed session engine with an in-process read cache.
+
+Set ``SESSION_ENGINE = 'users.session_store'``. Sessions are stored as files
+by Django's file backend, which keeps them out of the SQLite writer lock.
+This engine adds three things on top:
+
+* a per-process LRU of decoded sessions. A hit costs one ``stat()``: the
+  entry is only used while the file's mtime and size are unchanged, so a
+  write from another worker is picked up on the next request;
+* write coalescing: a session marked modified whose data is unchanged
+  since load is not rewritten (with SESSION_SAVE_EVERY_REQUEST the file is
+  only touched so its expiry moves forward);
+* ``sweep_expired``, which walks the session directory with ``scandir``
+  and deletes expired files in bounded batches; ``clearsessions`` uses it.
+"""
+import copy
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.sessions.backends import file
+from django.contrib.sessions.exceptions import InvalidSessionKey
+
+
+class _SessionCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_key, stamp):
+        with self._lock:
+            entry = self._entries.get(session_key)
+            if entry is None or entry[0] != stamp:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_key)
+            self.hits += 1
+            data = entry[1]
+        return copy.deepcopy(data)
+
+    def put(self, session_key, stamp, data):
+        with self._lock:
+            self._entries[session_key] = (stamp, copy.deepcopy(data))
+            self._entries.move_to_end(session_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, session_key):
+        with self._lock:
+            self._entries.pop(session_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+session_cache = _SessionCache(settings.SESSION_CACHE_SIZE)
+
+
+def _stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SessionStore(file.SessionStore):
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._loaded_data = None
+
+    @classmethod
+    def _get_storage_path(cls):
+        if not hasattr(cls, '_storage_path') and settings.SESSION_FILE_PATH:
+            # created on first use, like ATTACHMENT_ROOT
+            os.makedirs(settings.SESSION_FILE_PATH, exist_ok=True)
+        return super()._get_storage_path()
+
+    def _path(self):
+        try:
+            return self._key_to_file()
+        except InvalidSessionKey:
+            return None
+
+    def load(self):
+        session_key = self.session_key
+        path = self._path() if session_key else None
+        stamp = _stamp(path) if path else None
+        data = session_cache.get(session_key, stamp) if stamp else None
+        if data is not None and self.get_expiry_age(expiry=self._expiry_date(data)) > 0:
+            self._loaded_data = copy.deepcopy(data)
+            return data
+
+        data = super().load()
+        # only cache what was read if the file did not change underneath us
+        # (an expired session is replaced by a new key inside load())
+        if stamp is not None and self.session_key == session_key and _stamp(path) == stamp:
+            session_cache.put(session_key, stamp, data)
+        self._loaded_data = copy.deepcopy(data)
+        return data
+
+    def save(self, must_create=False):
+        if (
+            not must_create
+            and self.session_key is not None
+            and self._loaded_data is not None
+            and self._get_session(no_load=True) == self._loaded_data
+        ):
+            path = self._path()
+            if path and os.path.exists(path):
+                if settings.SESSION_SAVE_EVERY_REQUEST:
+                    os.utime(path)
+                    session_cache.discard(self.session_key)
+                return
+
+        super().save(must_create=must_create)
+        if self.session_key is not None:
+            data = self._get_session(no_load=True)
+            path = self._path()
+            stamp = _stamp(path) if path else None
+            if stamp is not None:
+                session_cache.put(self.session_key, stamp, data)
+            self._loaded_data = copy.deepcopy(data)
+
+    def delete(self, session_key=None):
+        key = session_key or self.session_key
+        super().delete(session_key)
+        if key:
+            session_cache.discard(key)
+
+    @classmethod
+    def sweep_expired(cls, batch_size=500):
+        """
+        Delete expired session files, ``batch_size`` at a time, yielding
+        the number removed after each batch. The directory is streamed
+        with ``scandir``, so memory stays bounded however many sessions
+        there are.
+        """
+        prefix = settings.SESSION_COOKIE_NAME
+        expired = []
+        with os.scandir(cls._get_storage_path()) as entries:
+            for entry in entries:
+                name = entry.name
+                # skip temporary files of writes in progress
+                if not name.startswith(prefix) or '_out_' in name:
+                    continue
+                session = cls(name[len(prefix):])
+                if session.session_key is None:
+                    continue
+                try:
+                    with open(entry.path, encoding='ascii') as session_file:
+                        raw = session_file.read()
+                    data = session.decode(raw) if raw else {}
+                    expired_now = session.get_expiry_age(expiry=session._expiry_date(data)) <= 0
+                except (OSError, InvalidSessionKey):
+                    continue
+                if expired_now:
+                    expired.append(session.session_key)
+                if len(expired) >= batch_size:
+                    yield cls._delete_batch(expired)
+                    expired = []
+        if expired:
+            yield cls._delete_batch(expired)
+
+    @classmethod
+    def _delete_batch(cls, session_keys):
+        deleted = 0
+        store = cls()
+        for session_key in session_keys:
+            path = store._key_to_file(session_key)
+            try:
+                os.unlink(path)
+                deleted += 1
+            except OSError:
+                pass
+            session_cache.discard(session_key)
+        return deleted
+
+    @classmethod
+    def clear_expired(cls):
+        for _ in cls.sweep_expired():
+            pass
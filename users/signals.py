@@ -0,0 +1,46 @@
+import contextvars
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .cache import user_cache
+from . import search
+from .models import User
+
+# Sent by users.bulk and the roster importer, whose set-based INSERTs,
+# UPDATEs and DELETEs bypass the model signals. All carry ``ids``, the
+# primary keys of one chunk of users. users_updating and users_updated also
+# carry ``fields``, the {field: value} written to them; users_updating and
+# users_deleting are sent inside the chunk's transaction, before the
+# statement. The DELETE still sends post_delete for every user, with the
+# deleting QuerySet as ``origin``.
+users_created = Signal()
+users_updating = Signal()
+users_updated = Signal()
+users_deleting = Signal()
+
+# The ids of the chunk users.bulk is deleting, set while its users_deleting
+# receivers and DELETE run. Those receivers have already done, for the whole
+# chunk, what per-row post_delete receivers would do for these users and
+# their rows, so the per-row receivers skip them. Any other delete leaves
+# this empty.
+bulk_deleting = contextvars.ContextVar('bulk_deleting', default=frozenset())
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(users_updated, sender=User)
+def invalidate_cached_users(sender, ids, **kwargs):
+    user_cache.invalidate(*ids)
+
+
+@receiver(post_save, sender=User)
+def reindex_user_search(sender, instance, created, update_fields=None, **kwargs):
+    # logins only save last_login
+    if update_fields and not set(search.SEARCH_FIELDS) & set(update_fields):
+        return
+    search.index_users([instance])
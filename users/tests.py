@@ -1,7 +1,39 @@
-from django.test import TestCase, Client
+import io
+import json
+import os
+import smtplib
+import socketserver
+import tempfile
+import threading
+from datetime import timedelta
+
+from django.test import TestCase, Client, override_settings
+from django.contrib.admin import site
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model, logout
 from django.urls import reverse
 from django.contrib.messages import get_messages
+from django.contrib.auth import authenticate
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from users.backends import EmailBackend, login_lookup
+from users import hashing
+from users.importer import import_roster
+from users.cache import user_cache
+from users import bulk
+from users import activity, exporter, outbox, passwords, search
+from users.models import ActivityEvent, OutboxMessage, UserSearchGram
+from django.core import mail
+from django.core.mail import EmailMessage, send_mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.utils import timezone
+from users.session_store import SessionStore as CachedSessionStore, session_cache
 
 # Use the custom user model defined in your project
 User = get_user_model()
@@ -71,6 +103,39 @@ class LogoutUserTest(TestCase):
 
 
 # user deletion tests
+class LecturerLogoutTest(TestCase):
+    def setUp(self):
+        self.lecturer = User.objects.create_user(
+            email='lecturer@example.com',
+            username='lecturer@example.com',
+            password='testpass123',
+            is_lect=True
+        )
+        self.login_url = reverse('login')
+        self.logout_url = reverse('logout')
+
+    def test_lecturer_logout(self):
+        # Log in the lecturer
+        login_successful = self.client.login(
+            username='lecturer@example.com',
+            password='testpass123'
+        )
+        self.assertTrue(login_successful)
+
+        # Log out
+        response = self.client.get(self.logout_url, follow=True)
+
+        # Ensure user is logged out
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+        # Ensure redirection to login
+        self.assertRedirects(response, self.login_url)
+
+        # Confirm the logout message was set
+        messages = list(response.context['messages'])
+        self.assertTrue(any("session has ended" in str(msg) for msg in messages))
+
+
 class DeleteUserViewTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -369,4 +434,818 @@ class ChangeUserRoleTest(TestCase):
         self.assertTrue(any("User not found." in str(message) for message in messages))
         
         # Verify proper redirect
-        self.assertRedirects(response, self.dashboard_url)
\ No newline at end of file
+        self.assertRedirects(response, self.dashboard_url)
+
+class EmailBackendLookupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='MixedCase@Example.com',
+            email='MixedCase@Example.com',
+            password='testpass123',
+        )
+
+    def test_login_is_case_insensitive(self):
+        """Email and username match regardless of case."""
+        user = authenticate(username='mixedcase@example.COM', password='testpass123')
+        self.assertEqual(user, self.user)
+
+    def test_non_ascii_addresses(self):
+        # SQLite's LOWER() leaves non-ASCII letters alone, and so does the key
+        user = User.objects.create_user(username='Ülle', email='ulle@example.com', password='pw')
+        self.assertEqual(authenticate(username='Ülle', password='pw'), user)
+        self.assertEqual(authenticate(username='ÜLLE', password='pw'), user)
+
+        User.objects.create(username='dana@Üni.example', email='dana@Üni.example')
+        result = import_roster(io.StringIO('email,role\nDana@Üni.example,student\n'))
+        self.assertEqual((result.created, result.existing), (0, 1))
+
+    def test_lookup_is_single_indexed_query(self):
+        """The login lookup is one query answered from the lower() expression indexes."""
+        qs = login_lookup('mixedcase@example.com').order_by('id')[:1]
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('users_user_email_lower_idx', plan)
+        self.assertIn('users_user_username_lower_idx', plan)
+        self.assertNotIn('SCAN users_user', plan)
+
+        with self.assertNumQueries(1):
+            EmailBackend().authenticate(None, username='nobody@example.com', password='x')
+
+
+class ImportRosterTest(TestCase):
+    def setUp(self):
+        User.objects.create(username='existing@example.com', email='existing@example.com', is_student=True)
+
+    def test_csv_import_creates_dedupes_and_rejects(self):
+        roster = io.StringIO(
+            'email,password,role,first_name,last_name\n'
+            'new1@example.com,Secret-pass-1,student,Aya,Cohen\n'
+            'EXISTING@example.com,Secret-pass-2,student,,\n'
+            'not-an-email,Secret-pass-3,student,,\n'
+            'new2@example.com,,lecturer,,\n'
+            'new1@example.com,Secret-pass-4,student,,\n'
+            'new3@example.com,Secret-pass-5,dean,,\n'
+        )
+        rejects = io.StringIO()
+        result = import_roster(roster, 'csv', batch_size=2, rejects=rejects)
+
+        self.assertEqual((result.created, result.existing, result.rejected), (2, 2, 2))
+        student = User.objects.get(email='new1@example.com')
+        self.assertTrue(student.is_student)
+        self.assertTrue(student.check_password('Secret-pass-1'))
+        self.assertEqual(student.username, 'new1@example.com')
+        lecturer = User.objects.get(email='new2@example.com')
+        self.assertTrue(lecturer.is_lect)
+        self.assertFalse(lecturer.has_usable_password())
+
+        rejected_lines = [json.loads(line)['line'] for line in rejects.getvalue().splitlines()]
+        self.assertEqual(rejected_lines, [4, 7])
+
+    def test_jsonl_import_on_process_pool(self):
+        roster = io.StringIO(
+            '{"email": "pool1@example.com", "password": "Secret-pass-1", "role": "student"}\n'
+            '{"email": "pool2@example.com", "password": "Secret-pass-2", "role": "superuser"}\n'
+            'not json\n'
+        )
+        with hashing.process_pool(2) as executor:
+            result = import_roster(roster, 'jsonl', executor=executor)
+
+        self.assertEqual((result.created, result.rejected), (2, 1))
+        self.assertTrue(User.objects.get(email='pool2@example.com').check_password('Secret-pass-2'))
+
+    def test_weak_passwords_are_rejected(self):
+        roster = io.StringIO(
+            'email,password,role,first_name\n'
+            'weak@example.com,password,student,\n'
+            'short@example.com,x7,student,\n'
+            'noa@example.com,noa@example.com,student,Noa\n'
+            'strong@example.com,Secret-pass-1,student,\n'
+        )
+        rejects = io.StringIO()
+        result = import_roster(roster, 'csv', rejects=rejects)
+
+        self.assertEqual((result.created, result.rejected), (1, 3))
+        self.assertEqual(list(User.objects.exclude(email='existing@example.com').values_list('email', flat=True)),
+                         ['strong@example.com'])
+        errors = {error['line']: error['error'] for error in map(json.loads, rejects.getvalue().splitlines())}
+        self.assertEqual(errors[2], 'This password is too common.')
+        self.assertIn('too short', errors[3])
+        self.assertIn('too similar', errors[4])
+
+    def test_upload_endpoint_requires_secretary(self):
+        upload = SimpleUploadedFile('roster.csv', b'email,role\nupload@example.com,student\n')
+        response = self.client.post(reverse('import_users'), {'roster': upload})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(User.objects.filter(email='upload@example.com').exists())
+
+        secretary = User.objects.create(username='sec@example.com', email='sec@example.com', is_superuser=True)
+        self.client.force_login(secretary)
+        upload = SimpleUploadedFile('roster.csv', b'email,role\nupload@example.com,student\n')
+        response = self.client.post(reverse('import_users'), {'roster': upload}, follow=True)
+        self.assertTrue(User.objects.filter(email='upload@example.com', role=User.Role.STUDENT).exists())
+        messages = list(get_messages(response.wsgi_request))
+        self.assertTrue(any('Imported 1 users' in str(m) for m in messages))
+
+
+class PasswordBlocklistTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        with open(self.path('leaked.txt'), 'w', encoding='utf-8') as f:
+            f.write('Tr0ub4dor&3\nkorrekt-hest \n\nkorrekt-hest\n')
+        with open(self.path('pwned.txt'), 'w') as f:
+            # the SHA-1 of "password", as Have I Been Pwned lists it
+            f.write('5BAA61E4C9B93F3F0682250B6CF8331B7EE68FD8:3861493\n')
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def compile(self, output, *args, **options):
+        call_command('compile_passwords', *args, output=self.path(output), stdout=io.StringIO(), **options)
+        return self.path(output)
+
+    def test_compiled_list_is_memory_mapped_and_searched(self):
+        path = self.compile('leaked.bin', self.path('leaked.txt'), '--without-django-list', '--chunk-size', '1')
+        blocklist = passwords.blocklist(path)
+        self.assertEqual(len(blocklist), 2)
+        self.assertIsInstance(blocklist.fingerprints, memoryview)
+        self.assertIn('tr0ub4dor&3', blocklist)
+        self.assertIn(' KORREKT-hest', blocklist)
+        self.assertNotIn('123456', blocklist)
+        self.assertEqual(blocklist.find(['fine-password', 'Tr0ub4dor&3', 'korrekt-hest']), {1, 2})
+
+        validator = passwords.BlocklistValidator(path)
+        with self.assertRaisesMessage(ValidationError, 'This password is too common.'):
+            validator.validate('korrekt-hest')
+        validator.validate('123456')
+
+    def test_breach_dump_and_django_list(self):
+        path = self.compile('all.bin', self.path('leaked.txt'), sha1=[self.path('pwned.txt')])
+        blocklist = passwords.blocklist(path)
+        # breach dumps match the password as typed, Django's list in any case
+        self.assertIn('password', blocklist)
+        self.assertIn('QWERTY', blocklist)
+        self.assertIn('Tr0ub4dor&3', blocklist)
+        self.assertNotIn('Secret-pass-1', blocklist)
+
+    def test_batch_validation_matches_single(self):
+        candidates = ['password', 'Secret-pass-1', 'maya.levi@uni', '12345678901']
+        users = [User(username='maya.levi@uni.ac.il', email='maya.levi@uni.ac.il', first_name='Maya')] * 4
+        errors = passwords.validate_passwords(candidates, users)
+        for password, user, error in zip(candidates, users, errors):
+            try:
+                validate_password(password, user)
+            except ValidationError as expected:
+                self.assertEqual(error.messages, expected.messages)
+            else:
+                self.assertIsNone(error)
+        self.assertIsNone(errors[1])
+        self.assertIn('too similar', errors[2].messages[0])
+
+
+class HashingPoolTest(TestCase):
+    def test_pool_verifies_and_hashes(self):
+        """Hashes made on the shared pool verify in-process and vice versa."""
+        encoded = hashing.make_password('Secret-pass-1')
+        self.assertTrue(check_password('Secret-pass-1', encoded))
+        self.assertEqual(hashing.check_password('Secret-pass-1', encoded), (True, False))
+        self.assertEqual(hashing.check_password('wrong', encoded), (False, False))
+
+    @override_settings(PASSWORD_HASHING_MAX_PENDING=0, PASSWORD_HASHING_RETRY_AFTER=7)
+    def test_saturated_pool_answers_503_with_retry_after(self):
+        """Login gets a fast 503 while the pool is full; pages that don't hash still render."""
+        User.objects.create_user(username='busy@example.com', email='busy@example.com', password='testpass123')
+        response = self.client.post(reverse('login'), {'email': 'busy@example.com', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+        self.assertEqual(self.client.get(reverse('login')).status_code, 200)
+
+    @override_settings(PASSWORD_HASHING_MAX_PENDING=1)
+    def test_shared_pool_map_waits_for_its_own_jobs(self):
+        self.assertEqual(hashing.SharedPool().map(str.upper, 'abcde', chunksize=2), list('ABCDE'))
+
+    @override_settings(PASSWORD_HASHING_MAX_PENDING=0)
+    def test_roster_upload_on_a_saturated_pool(self):
+        secretary = User.objects.create(username='sec@example.com', email='sec@example.com', is_superuser=True)
+        self.client.force_login(secretary)
+        upload = SimpleUploadedFile('roster.csv', b'email,password,role\nbusy@example.com,Secret-pass-1,student\n')
+        response = self.client.post(reverse('import_users'), {'roster': upload}, follow=True)
+        self.assertFalse(User.objects.filter(email='busy@example.com').exists())
+        messages = [str(m) for m in get_messages(response.wsgi_request)]
+        self.assertTrue(any('busy' in m for m in messages))
+
+    def test_registration_hashes_on_pool(self):
+        response = self.client.post(reverse('register-student'), {
+            'email': 'newstudent@example.com',
+            'password1': 'Unusual-Secret-91',
+            'password2': 'Unusual-Secret-91',
+        })
+        self.assertRedirects(response, reverse('login'))
+        user = User.objects.get(email='newstudent@example.com')
+        self.assertTrue(user.is_student)
+        self.assertTrue(user.check_password('Unusual-Secret-91'))
+
+
+class UserCacheTest(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create(username='cached@example.com', email='cached@example.com', is_student=True)
+        self.client.force_login(self.user)
+
+    def test_repeat_requests_skip_user_query(self):
+        """Only the first request loads the user row; later ones are cache hits."""
+        self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('dashboard'))
+        self.assertFalse(any('FROM "users_user"' in q['sql'] for q in queries.captured_queries))
+        self.assertGreaterEqual(user_cache.stats()['hits'], 1)
+
+    def test_save_and_delete_invalidate(self):
+        self.client.get(reverse('dashboard'))
+        self.user.is_student = False
+        self.user.is_lect = True
+        self.user.save()
+        response = self.client.get(reverse('dashboard'))
+        self.assertTrue(response.context['user'].is_lect)
+
+        self.user.delete()
+        response = self.client.get(reverse('dashboard'))
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    def test_cached_users_are_independent_instances(self):
+        first = EmailBackend().get_user(self.user.pk)
+        first.email = 'changed@example.com'
+        second = EmailBackend().get_user(self.user.pk)
+        self.assertEqual(second.email, 'cached@example.com')
+        self.assertIsNot(first, second)
+
+    def test_stats_endpoint_is_secretary_only(self):
+        self.assertEqual(self.client.get(reverse('user_cache_stats')).status_code, 302)
+        secretary = User.objects.create(username='sec@example.com', email='sec@example.com', is_superuser=True)
+        self.client.force_login(secretary)
+        stats = self.client.get(reverse('user_cache_stats')).json()
+        self.assertIn('hits', stats)
+        self.assertIn('misses', stats)
+
+
+class BulkUserOperationsTest(TestCase):
+    def setUp(self):
+        self.secretary = User.objects.create(username='sec@example.com', email='sec@example.com', is_superuser=True)
+        self.students = User.objects.bulk_create(
+            User(username=f's{i}@example.com', email=f's{i}@example.com', is_student=True) for i in range(7)
+        )
+        self.lecturer = User.objects.create(username='lect@example.com', email='lect@example.com', is_lect=True)
+        self.client.force_login(self.secretary)
+
+    def test_set_role_in_chunks(self):
+        ids = [user.id for user in self.students[:5]]
+        seen = []
+        result = bulk.bulk_set_role(bulk.select_users(ids), 'lecturer', chunk_size=2, progress=lambda r: seen.append(r.affected))
+        self.assertEqual((result.matched, result.affected), (5, 5))
+        self.assertEqual(seen, [2, 4, 5])
+        self.assertEqual(User.objects.filter(role=User.Role.LECTURER).count(), 6)
+
+        # users already in the role are not counted again
+        again = bulk.bulk_set_role(bulk.select_users(ids), 'lecturer')
+        self.assertEqual(again.affected, 0)
+
+    def test_progress_is_yielded_outside_the_chunk_transaction(self):
+        depth = len(connection.atomic_blocks)
+        for _ in bulk.iter_delete(bulk.select_users(role='student'), chunk_size=3):
+            self.assertEqual(len(connection.atomic_blocks), depth)
+
+    def test_set_role_invalidates_cached_users(self):
+        student = self.students[0]
+        EmailBackend().get_user(student.pk)
+        bulk.bulk_set_role(bulk.select_users([student.pk]), 'lecturer')
+        self.assertTrue(EmailBackend().get_user(student.pk).is_lect)
+
+    def test_delete_by_role_is_set_based(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = bulk.bulk_delete(bulk.select_users(role='student'), chunk_size=1000)
+        self.assertEqual(result.affected, 7)
+        self.assertFalse(User.objects.filter(role=User.Role.STUDENT).exists())
+        self.assertTrue(User.objects.filter(pk=self.lecturer.pk).exists())
+        # a constant number of statements, not one or more per user
+        # (the registration rollups add a few per chunk)
+        self.assertLess(len(queries.captured_queries), 25)
+
+    def test_select_needs_ids_or_role(self):
+        with self.assertRaises(ValueError):
+            bulk.select_users()
+        with self.assertRaises(ValueError):
+            bulk.select_users(role='janitor')
+
+    def test_view_skips_the_secretary_and_reports_count(self):
+        response = self.client.post(reverse('bulk_users'), {
+            'action': 'role', 'role': 'lecturer',
+            'user_ids': [self.students[0].id, self.secretary.id],
+        })
+        self.assertRedirects(response, reverse('dashboard'))
+        self.assertIn('Updated the role of 1 users.', [str(m) for m in get_messages(response.wsgi_request)])
+        self.secretary.refresh_from_db()
+        self.assertTrue(self.secretary.is_superuser)
+
+    def test_view_streams_progress(self):
+        response = self.client.post(reverse('bulk_users'), {'action': 'delete', 'role_filter': 'student', 'stream': '1'})
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(lines[-1], {'matched': 7, 'affected': 7})
+
+    def test_view_is_secretary_only(self):
+        self.client.force_login(self.students[0])
+        self.client.post(reverse('bulk_users'), {'action': 'delete', 'role_filter': 'student'})
+        self.assertEqual(User.objects.filter(role=User.Role.STUDENT).count(), 7)
+
+
+class UserApiTest(TestCase):
+    def setUp(self):
+        self.secretary = User.objects.create(username='sec@example.com', email='sec@example.com', is_superuser=True)
+        self.student = User.objects.create(username='stu@example.com', email='stu@example.com', is_student=True)
+        self.client.force_login(self.secretary)
+
+    def test_add_returns_the_new_row(self):
+        response = self.client.post(reverse('api_add_user'), {
+            'email': 'new@example.com', 'password': 'pw-123456', 'role': 'lecturer'})
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        user = User.objects.get(email='new@example.com')
+        self.assertTrue(user.is_lect)
+        self.assertEqual(data['id'], user.id)
+        self.assertIn(f'id="user-row-{user.id}"', data['row'])
+        self.assertIn('Lecturer', data['row'])
+
+        duplicate = self.client.post(reverse('api_add_user'), {
+            'email': 'new@example.com', 'password': 'pw', 'role': 'student'})
+        self.assertEqual(duplicate.status_code, 409)
+        self.assertEqual(self.client.post(reverse('api_add_user'), {'email': 'bad', 'role': 'student'}).status_code, 400)
+
+    def test_change_role_renders_only_that_row(self):
+        response = self.client.post(reverse('api_change_user_role', args=[self.student.id]), {'role': 'lecturer'})
+        data = response.json()
+        self.assertEqual(data['id'], self.student.id)
+        self.assertEqual(data['row'].count('<tr'), 1)
+        self.assertIn('Lecturer', data['row'])
+        self.student.refresh_from_db()
+        self.assertEqual((self.student.is_student, self.student.is_lect), (False, True))
+
+    def test_delete(self):
+        response = self.client.post(reverse('api_delete_user', args=[self.student.id]))
+        self.assertEqual(response.json(), {'deleted': self.student.id})
+        self.assertFalse(User.objects.filter(id=self.student.id).exists())
+        missing = self.client.post(reverse('api_delete_user', args=[self.student.id]))
+        self.assertEqual(missing.status_code, 404)
+        # the secretary cannot delete themselves through the table
+        own = self.client.post(reverse('api_delete_user', args=[self.secretary.id]))
+        self.assertEqual(own.status_code, 404)
+
+    def test_row_fragment(self):
+        response = self.client.get(reverse('user_row', args=[self.student.id]))
+        self.assertContains(response, 'stu@example.com')
+        self.assertNotContains(response, '<html')
+
+    def test_secretary_only(self):
+        self.client.force_login(self.student)
+        response = self.client.post(reverse('api_delete_user', args=[self.secretary.id]))
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(User.objects.filter(id=self.secretary.id).exists())
+
+
+class _SMTPStandIn(socketserver.ThreadingTCPServer):
+    """A minimal local SMTP server: accepts everything and keeps the messages."""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost ready')
+        envelope = {}
+        for line in self.rfile:
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                envelope = {'from': command[10:], 'to': []}
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                envelope['to'].append(command[8:])
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 go ahead')
+                data = []
+                for data_line in self.rfile:
+                    if data_line == b'.\r\n':
+                        break
+                    data.append(data_line)
+                envelope['data'] = b''.join(data)
+                self.server.messages.append(envelope)
+                self.reply('250 queued')
+            elif verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class _FlakyBackend(BaseEmailBackend):
+    """Delivery backend that raises the exceptions queued in ``errors``, then succeeds."""
+    errors = []
+
+    def send_messages(self, messages):
+        if self.errors:
+            raise self.errors.pop(0)
+        mail.outbox.extend(messages)
+        return len(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='users.outbox.OutboxBackend',
+    OUTBOX_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reset@example.com', email='reset@example.com', password='pw-123456')
+
+    def drain(self):
+        connection = outbox.delivery_connection()
+        try:
+            return outbox.drain(connection)
+        finally:
+            connection.close()
+
+    def test_password_reset_is_queued_then_delivered(self):
+        response = self.client.post(reverse('reset_password'), {'email': 'reset@example.com'})
+        self.assertRedirects(response, reverse('password_reset_done'))
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboxMessage.objects.get()
+        self.assertEqual((queued.status, queued.recipients), (OutboxMessage.Status.QUEUED, ['reset@example.com']))
+
+        result = self.drain()
+        self.assertEqual((result.claimed, result.sent), (1, 1))
+        self.assertEqual(mail.outbox[0].recipients(), ['reset@example.com'])
+        self.assertIn(b'/accounts/reset/', mail.outbox[0].message().as_bytes())
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, OutboxMessage.Status.SENT)
+        self.assertEqual(self.drain().claimed, 0)
+
+    @override_settings(OUTBOX_DELIVERY_BACKEND='users.tests._FlakyBackend', OUTBOX_RETRY_BASE=30, OUTBOX_MAX_ATTEMPTS=2)
+    def test_temporary_errors_back_off_then_fail(self):
+        send_mail('Hi', 'body', 'from@example.com', ['to@example.com'])
+        _FlakyBackend.errors = [smtplib.SMTPResponseException(421, b'try later')] * 2
+        self.assertEqual(self.drain().retried, 1)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.next_attempt, timezone.now() + timedelta(seconds=25))
+        self.assertEqual(self.drain().claimed, 0)
+
+        OutboxMessage.objects.update(next_attempt=timezone.now())
+        self.assertEqual(self.drain().failed, 1)
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.Status.FAILED)
+        self.assertIn('try later', message.last_error)
+
+    @override_settings(OUTBOX_DELIVERY_BACKEND='users.tests._FlakyBackend')
+    def test_permanent_error_fails_at_once(self):
+        send_mail('Hi', 'body', 'from@example.com', ['nobody@example.com'])
+        _FlakyBackend.errors = [smtplib.SMTPRecipientsRefused({'nobody@example.com': (550, b'no such user')})]
+        self.assertEqual(self.drain().failed, 1)
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxMessage.Status.FAILED)
+
+    def test_claimed_messages_are_not_claimed_twice(self):
+        send_mail('Hi', 'body', 'from@example.com', ['to@example.com'])
+        self.assertEqual(len(outbox.claim(10)), 1)
+        self.assertEqual(outbox.claim(10), [])
+
+    def test_batch_shares_one_smtp_connection(self):
+        server = _SMTPStandIn()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        for n in range(5):
+            EmailMessage(f'Notice {n}', 'body', 'from@example.com', [f'to{n}@example.com'], bcc=['audit@example.com']).send()
+
+        with self.settings(
+            OUTBOX_DELIVERY_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.server_address[1],
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        ):
+            out = io.StringIO()
+            call_command('drain_outbox', once=True, json=True, stdout=out)
+
+        metrics = json.loads(out.getvalue().splitlines()[0])
+        self.assertEqual((metrics['sent'], metrics['connections']), (5, 1))
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(len(server.messages), 5)
+        self.assertIn('<audit@example.com>', server.messages[0]['to'])
+        self.assertIn(b'Subject: Notice 0', server.messages[0]['data'])
+
+
+class UserSearchIndexTest(TestCase):
+    def setUp(self):
+        self.dana = User.objects.create(username='dana.levi@uni.ac.il', email='dana.levi@uni.ac.il',
+                                        first_name='Dana', last_name='Levi', is_student=True)
+        self.levin = User.objects.create(username='levin@uni.ac.il', email='levin@uni.ac.il', is_lect=True)
+        self.other = User.objects.create(username='omar@example.com', email='omar@example.com',
+                                         first_name='Omar', last_name='Awaisha', is_student=True)
+
+    def emails(self, term, **kwargs):
+        return [row['email'] for row in search.search(term, **kwargs)]
+
+    def test_substring_and_name_matches(self):
+        self.assertEqual(self.emails('evi'), ['dana.levi@uni.ac.il', 'levin@uni.ac.il'])
+        self.assertEqual(self.emails('AWAIS'), ['omar@example.com'])
+        self.assertEqual(self.emails('dana levi'), ['dana.levi@uni.ac.il'])
+        self.assertEqual(self.emails('zzz'), [])
+
+    def test_email_prefix_matches_rank_first(self):
+        self.assertEqual(self.emails('levi'), ['levin@uni.ac.il', 'dana.levi@uni.ac.il'])
+        self.assertEqual(self.emails('levi', limit=1), ['levin@uni.ac.il'])
+
+    def test_short_terms_use_the_prefix_only(self):
+        self.assertEqual(self.emails('om'), ['omar@example.com'])
+
+    def test_signals_keep_postings_current(self):
+        self.other.email = 'o.awaisha@example.com'
+        self.other.save()
+        self.assertEqual(self.emails('omar@'), [])
+        self.assertEqual(self.emails('o.awa'), ['o.awaisha@example.com'])
+        self.other.delete()
+        self.assertFalse(UserSearchGram.objects.filter(user_id=self.other.pk).exists())
+
+    def test_import_and_rebuild_index_bulk_loaded_users(self):
+        import_roster(io.StringIO('email,role,first_name\nnoa@uni.ac.il,student,Noa\n'))
+        self.assertEqual(self.emails('noa'), ['noa@uni.ac.il'])
+
+        User.objects.bulk_create([User(username='raw@uni.ac.il', email='raw@uni.ac.il')])
+        self.assertEqual(self.emails('aw@uni'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.emails('aw@uni'), ['raw@uni.ac.il'])
+
+    def test_admin_search_uses_the_index(self):
+        admin = User.objects.create_superuser(username='admin@uni.ac.il', email='admin@uni.ac.il', password='x')
+        self.client.force_login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:users_user_changelist'), {'q': 'evi'})
+        self.assertEqual({user.email for user in response.context['cl'].result_list},
+                         {'dana.levi@uni.ac.il', 'levin@uni.ac.il'})
+        # substring tests only ever run on the candidates the index found
+        scans = [q['sql'] for q in queries.captured_queries if "LIKE '%evi%'" in q['sql']]
+        self.assertTrue(scans)
+        self.assertTrue(all('"users_user"."id" IN (' in sql for sql in scans))
+
+    def test_long_terms(self):
+        # more trigrams than SQLite allows SELECTs in one compound statement
+        term = ''.join(chr(ord('a') + i % 26) + chr(ord('a') + i // 26 % 26) for i in range(600))
+        self.assertEqual(self.emails(term), [])
+        admin = User.objects.create_superuser(username='admin@uni.ac.il', email='admin@uni.ac.il', password='x')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:users_user_changelist'), {'q': term})
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_says_when_matches_are_cut_off(self):
+        admin = User.objects.create_superuser(username='admin@uni.ac.il', email='admin@uni.ac.il', password='x')
+        self.client.force_login(admin)
+        url = reverse('admin:users_user_changelist')
+        user_admin = site._registry[User]
+        user_admin.search_limit = 1
+        try:
+            response = self.client.get(url, {'q': 'levi'})
+        finally:
+            del user_admin.search_limit
+        self.assertEqual(len(response.context['cl'].result_list), 1)
+        self.assertIn('Only the first 1 matches are listed', response.content.decode())
+
+        response = self.client.get(url, {'q': 'levi'})
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+        self.assertNotIn('Only the first', response.content.decode())
+
+
+class CachedFileSessionTest(TestCase):
+    def setUp(self):
+        session_cache.clear()
+        self.store = CachedSessionStore()
+        self.store['role'] = 'student'
+        self.store.create()
+        self.store['role'] = 'student'
+        self.store.save()
+
+    def tearDown(self):
+        self.store.delete()
+
+    def test_reload_is_served_from_cache(self):
+        session = CachedSessionStore(self.store.session_key)
+        self.assertEqual(session['role'], 'student')
+        self.assertEqual(session_cache.hits, 1)
+
+    def test_write_from_another_process_is_seen(self):
+        """A changed file (mtime/size) invalidates the cached copy."""
+        path = self.store._key_to_file()
+        with open(path, 'w', encoding='ascii') as session_file:
+            session_file.write(self.store.encode({'role': 'lecturer', 'extra': 'x'}))
+        session = CachedSessionStore(self.store.session_key)
+        self.assertEqual(session['role'], 'lecturer')
+
+    def test_unchanged_session_is_not_rewritten(self):
+        path = self.store._key_to_file()
+        before = os.stat(path).st_mtime_ns
+        session = CachedSessionStore(self.store.session_key)
+        session['role'] = 'student'  # marks modified, same data
+        self.assertTrue(session.modified)
+        session.save()
+        self.assertEqual(os.stat(path).st_mtime_ns, before)
+
+        session['role'] = 'lecturer'
+        session.save()
+        self.assertEqual(CachedSessionStore(self.store.session_key)['role'], 'lecturer')
+
+    def test_sweeper_deletes_only_expired_sessions(self):
+        expired = CachedSessionStore()
+        expired.set_expiry(-1)
+        expired.create()
+        expired.set_expiry(-1)
+        expired.save()
+        expired_path = expired._key_to_file()
+
+        removed = sum(CachedSessionStore.sweep_expired(batch_size=1))
+        self.assertGreaterEqual(removed, 1)
+        self.assertFalse(os.path.exists(expired_path))
+        self.assertTrue(os.path.exists(self.store._key_to_file()))
+
+
+class UserRoleTest(TestCase):
+    def test_flags_are_views_of_role(self):
+        user = User(is_lect=True)
+        self.assertEqual(user.role, User.Role.LECTURER)
+        self.assertEqual((user.is_student, user.is_lect, user.is_superuser), (False, True, False))
+        # clearing another role's flag leaves the role alone
+        user.is_student = False
+        self.assertEqual(user.role, User.Role.LECTURER)
+        user.is_lect = False
+        self.assertEqual(user.role, User.Role.NONE)
+
+    def test_create_superuser_is_a_secretary(self):
+        admin = User.objects.create_superuser('admin@example.com', 'admin@example.com', 'pw')
+        self.assertEqual(admin.role, User.Role.SUPERUSER)
+        self.assertTrue(admin.has_perm('users.delete_user'))
+
+    def test_create_user_keeps_the_role_given(self):
+        secretary = User.objects.create_user('sec@example.com', 'sec@example.com', 'pw', role=User.Role.SUPERUSER)
+        secretary.refresh_from_db()
+        self.assertEqual(secretary.role, User.Role.SUPERUSER)
+
+    def test_flags_work_as_lookups(self):
+        secretary = User.objects.create_superuser('admin@example.com', 'admin@example.com', 'pw')
+        lecturer = User.objects.create_user('l@example.com', 'l@example.com', 'pw', is_lect=True)
+        self.assertEqual(list(User.objects.filter(is_superuser=True)), [secretary])
+        self.assertEqual(list(User.objects.exclude(is_superuser__exact=True)), [lecturer])
+        self.assertEqual(User.objects.get(Q(is_lect=True) | Q(is_student=True)), lecturer)
+        self.assertEqual(list(ModelBackend().with_perm('users.delete_user')), [secretary])
+
+    def test_role_filters_use_the_index(self):
+        plan = User.objects.filter(role=User.Role.LECTURER).order_by('email', 'id').values('id', 'email').explain()
+        self.assertIn('users_user_role_email_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_admin_filters_by_role(self):
+        admin = User.objects.create_superuser('admin@example.com', 'admin@example.com', 'pw')
+        User.objects.create(username='l@example.com', email='l@example.com', role=User.Role.LECTURER)
+        User.objects.create(username='s@example.com', email='s@example.com', role=User.Role.STUDENT)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:users_user_changelist'), {'role__exact': 'lecturer'})
+        self.assertContains(response, 'l@example.com')
+        self.assertNotContains(response, 's@example.com')
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class ActivityLogTest(TestCase):
+    def setUp(self):
+        activity.clear()
+        self.addCleanup(activity.clear)
+        self.secretary = User.objects.create_user(
+            username='sec@example.com', email='sec@example.com', password='pw', is_superuser=True)
+
+    def test_login_is_buffered_not_written(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('login'), {'email': 'sec@example.com', 'password': 'pw'})
+        self.assertFalse(any('users_activityevent' in q['sql'] for q in queries.captured_queries))
+        self.assertFalse(ActivityEvent.objects.exists())
+
+        self.assertEqual(activity.flush(), 1)
+        event = ActivityEvent.objects.get()
+        self.assertEqual((event.actor, event.action), ('sec@example.com', ActivityEvent.Action.LOGIN))
+
+    def test_recent_is_served_from_the_ring(self):
+        ActivityEvent.objects.create(created=timezone.now() - timedelta(hours=1), actor='old@example.com',
+                                     action=ActivityEvent.Action.LOGOUT)
+        activity.record(self.secretary, ActivityEvent.Action.ADD_USER, 'new@example.com')
+        # loaded once, saved rows and unsaved events merged newest first
+        self.assertEqual([e.actor for e in activity.recent(5)], ['sec@example.com', 'old@example.com'])
+        activity.record(self.secretary, ActivityEvent.Action.LOGOUT)
+        with self.assertNumQueries(0):
+            self.assertEqual(activity.recent(1)[0].action, ActivityEvent.Action.LOGOUT)
+
+    def test_views_record_their_actions(self):
+        self.client.force_login(self.secretary)
+        self.client.post(reverse('add_user'), {'email': 'a@example.com', 'password': 'pw', 'role': 'student'})
+        user = User.objects.get(email='a@example.com')
+        self.client.post(reverse('change_user_role'), {'user_id': user.id, 'role': 'lecturer'})
+        self.client.post(reverse('delete_user'), {'user_id': user.id})
+        response = self.client.get(reverse('dashboard'))
+        actions = [event.action for event in response.context['recent_activity']]
+        self.assertEqual(actions, ['delete_user', 'change_role', 'add_user'])
+        self.assertContains(response, 'Changed role a@example.com to Lecturer')
+
+    def test_api_delete_records_the_email(self):
+        user = User.objects.create(username='gone@example.com', email='gone@example.com', is_student=True)
+        self.client.force_login(self.secretary)
+        self.client.post(reverse('api_delete_user', args=[user.id]))
+        self.assertEqual(activity.recent(1)[0].target, 'gone@example.com')
+
+    def test_compact_and_scan(self):
+        now = timezone.now()
+        for days in (40, 30, 1):
+            ActivityEvent.objects.create(created=now - timedelta(days=days), actor=f'{days}@example.com',
+                                         action=ActivityEvent.Action.LOGIN)
+        archive = tempfile.TemporaryDirectory()
+        self.addCleanup(archive.cleanup)
+        archive = archive.name
+        moved, segments = activity.compact(now - timedelta(days=7), archive, segment_size=1)
+        self.assertEqual((moved, segments), (2, 2))
+        self.assertEqual(list(ActivityEvent.objects.values_list('actor', flat=True)), ['1@example.com'])
+
+        entries = list(activity.scan_archive(directory=archive))
+        self.assertEqual([e['actor'] for e in entries], ['40@example.com', '30@example.com'])
+        recent = activity.scan_archive(since=now - timedelta(days=35), directory=archive)
+        self.assertEqual([e['actor'] for e in recent], ['30@example.com'])
+        # running again finds nothing left to move
+        self.assertEqual(activity.compact(now - timedelta(days=7), archive), (0, 0))
+
+    def test_segments_span_their_oldest_and_newest_entries(self):
+        # another worker's buffer can save an older entry under a later id
+        now = timezone.now()
+        for days in (10, 30, 20):
+            ActivityEvent.objects.create(created=now - timedelta(days=days), actor=f'{days}@example.com',
+                                         action=ActivityEvent.Action.LOGIN)
+        archive = tempfile.TemporaryDirectory()
+        self.addCleanup(archive.cleanup)
+        activity.compact(now - timedelta(days=7), archive.name)
+        until = activity.scan_archive(until=now - timedelta(days=25), directory=archive.name)
+        self.assertEqual([e['actor'] for e in until], ['30@example.com'])
+        since = activity.scan_archive(since=now - timedelta(days=15), directory=archive.name)
+        self.assertEqual([e['actor'] for e in since], ['10@example.com'])
+
+
+
+class UserExportTest(TestCase):
+    def setUp(self):
+        self.secretary = User.objects.create(username='sec@example.com', email='sec@example.com', is_superuser=True)
+        User.objects.create(username='a@example.com', email='a@example.com', first_name='=cmd', is_student=True)
+        User.objects.create(username='b@example.com', email='b@example.com', is_lect=True)
+        self.client.force_login(self.secretary)
+
+    def test_csv_export_streams_the_roster_columns(self):
+        response = self.client.get(reverse('export_users'), {'format': 'csv', 'role': 'student'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="users.csv"')
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0], ','.join(name for name, _ in exporter.USER_COLUMNS))
+        self.assertEqual(len(rows), 2)
+        # no formulas for spreadsheets
+        self.assertIn(",a@example.com,student,'=cmd,", rows[1])
+
+    def test_jsonl_export(self):
+        response = self.client.get(reverse('export_users'), {'format': 'jsonl'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['email'] for row in rows], ['sec@example.com', 'a@example.com', 'b@example.com'])
+        self.assertEqual(rows[2]['role'], 'lecturer')
+
+    def test_header_goes_out_before_the_query(self):
+        chunks = exporter.stream(exporter.users(), exporter.USER_COLUMNS)
+        with CaptureQueriesContext(connection) as queries:
+            next(chunks)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(len(''.join(chunks).splitlines()), 3)
+
+    def test_secretaries_only(self):
+        self.client.force_login(User.objects.get(email='a@example.com'))
+        self.assertEqual(self.client.get(reverse('export_users')).status_code, 302)
+
+    def test_export_command(self):
+        out = io.StringIO()
+        call_command('export', 'users', format='jsonl', role='lecturer', stdout=out)
+        self.assertEqual([json.loads(line)['email'] for line in out.getvalue().splitlines()], ['b@example.com'])
@@ -13,6 +13,14 @@ urlpatterns=[
     path('add-user/', views.add_user, name='add_user'),
     path('delete-user/', views.delete_user, name='delete_user'),
     path('change-role/', views.change_user_role, name='change_user_role'),
+    path('api/users/', views.api_add_user, name='api_add_user'),
+    path('api/users/<int:user_id>/delete/', views.api_delete_user, name='api_delete_user'),
+    path('api/users/<int:user_id>/role/', views.api_change_user_role, name='api_change_user_role'),
+    path('users/<int:user_id>/row/', views.user_row, name='user_row'),
+    path('bulk-users/', views.bulk_users, name='bulk_users'),
+    path('import-users/', views.import_users, name='import_users'),
+    path('export-users/', views.export_users, name='export_users'),
+    path('cache-stats/', views.user_cache_stats, name='user_cache_stats'),
 
 
 ]
\ No newline at end of file
@@ -1,14 +1,22 @@
-from multiprocessing.connection import Client
-from unittest import TestCase
 from django.shortcuts import render,redirect
 from django.contrib import messages
-from django.contrib.auth import authenticate,login,logout
+from django.contrib.auth import aauthenticate,alogin,logout
 from django.urls import reverse
-from .models import User
+from .models import ActivityEvent, User
 from .form import RegisterUserForm
-from django.contrib.auth.hashers import make_password
 from django.views.decorators.http import require_POST
-from django.views.decorators.csrf import csrf_exempt
+from django.contrib.auth.decorators import user_passes_test
+import io
+from . import activity, exporter, hashing
+from .importer import ROLES, import_roster
+from .cache import user_cache
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from functools import wraps
+import json
+from . import bulk
 
 #import our user model and our RegistercUsercForm
 # Create your views here.
@@ -22,7 +30,7 @@ def register_student(request):
         form=RegisterUserForm(request.POST)
         if form.is_valid():
             var=form.save(commit=False)
-            var.is_student=True
+            var.role=User.Role.STUDENT
             var.username=var.email
             #the username became automaticly the email
             var.save()
@@ -44,7 +52,7 @@ def register_lect(request):
         form=RegisterUserForm(request.POST)
         if form.is_valid():
             var=form.save(commit=False)
-            var.is_lect=True
+            var.role=User.Role.LECTURER
             var.username=var.email
             var.save() 
             #Donoractive.objects.create(user=var)
@@ -60,14 +68,18 @@ def register_lect(request):
 
 
 #user login(done : omar)
-def login_user(request):
+#async so that under ASGI the password check waits on the hashing pool
+#without holding a worker thread (see users.hashing)
+async def login_user(request):
     if request.method=='POST':
         email=request.POST.get('email')
         password=request.POST.get('password')
 
-        user=authenticate(request,username=email,password=password)
+        user=await aauthenticate(request,username=email,password=password)
         if user is not None and user.is_active:
-            login(request,user)
+            await alogin(request,user)
+            # a deque append, saved later by the activity writer
+            activity.record(user, ActivityEvent.Action.LOGIN)
             return redirect('dashboard')
         else:
             messages.warning(request,'somthing went wrong')
@@ -98,43 +110,15 @@ def logout_user(request):
     Returns:
         HttpResponseRedirect to the login page
     """
+    activity.record(request.user, ActivityEvent.Action.LOGOUT)
     logout(request)
     messages.info(request, 'your session has ended')
     return redirect('login')
 
 
-class LecturerLogoutTest(TestCase):
-    def setUp(self):
-        self.client = Client()
-        self.lecturer = User.objects.create_user(
-            email='lecturer@example.com',
-            username='lecturer@example.com',
-            password='testpass123',
-            is_lect=True
-        )
-        self.login_url = reverse('login')
-        self.logout_url = reverse('logout_user')  # change if your URL pattern name is different
-
-    def test_lecturer_logout(self):
-        # Log in the lecturer
-        login_successful = self.client.login(
-            username='lecturer@example.com',
-            password='testpass123'
-        )
-        self.assertTrue(login_successful)
-
-        # Log out
-        response = self.client.get(self.logout_url, follow=True)
-
-        # Ensure user is logged out
-        self.assertNotIn('_auth_user_id', self.client.session)
-
-        # Ensure redirection to login
-        self.assertRedirects(response, self.login_url)
-
-        # Confirm the logout message was set
-        messages = list(response.context['messages'])
-        self.assertTrue(any("session has ended" in str(msg) for msg in messages))
+# the secretary's pages: anyone else is sent to the login page.
+# The JSON API below answers 403 instead, see secretary_api
+secretary_required = user_passes_test(lambda u: u.is_superuser)
 
 
 @require_POST
@@ -150,11 +134,10 @@ def add_user(request):
         user = User.objects.create(
             email=email,
             username=email,
-            password=make_password(password),
-            is_student=role == 'student',
-            is_lect=role == 'lecturer',
-            is_superuser=role == 'superuser',
+            password=hashing.make_password(password),
+            role=role if role in ROLES else User.Role.NONE,
         )
+        activity.record(request.user, ActivityEvent.Action.ADD_USER, user.email)
         messages.success(request, 'User created successfully.')
     return redirect('dashboard')
 
@@ -165,6 +148,7 @@ def delete_user(request):
     try:
         user = User.objects.get(id=user_id)
         user.delete()
+        activity.record(request.user, ActivityEvent.Action.DELETE_USER, user.email)
         messages.success(request, 'User deleted.')
     except User.DoesNotExist:
         messages.error(request, 'User not found.')
@@ -177,15 +161,169 @@ def change_user_role(request):
     role = request.POST.get('role')
     try:
         user = User.objects.get(id=user_id)
-        user.is_student = role == 'student'
-        user.is_lect = role == 'lecturer'
-        user.is_superuser = role == 'superuser'
-        user.save()
+        user.role = role if role in ROLES else User.Role.NONE
+        user.save(update_fields=['role'])
+        activity.record(request.user, ActivityEvent.Action.CHANGE_ROLE, f'{user.email} to {user.get_role_display()}')
         messages.success(request, 'Role updated.')
     except User.DoesNotExist:
         messages.error(request, 'User not found.')
     return redirect('dashboard')
 
+
+# JSON API used by the user management table: each call returns just the
+# affected row (rendered from dashboard/_user_row.html) instead of
+# redirecting to a full dashboard render
+def secretary_api(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_superuser:
+            return JsonResponse({'error': 'Secretaries only.'}, status=403)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def user_row_html(request, user):
+    return render_to_string('dashboard/_user_row.html', {'user': user}, request=request)
+
+
+@require_POST
+@secretary_api
+def api_add_user(request):
+    email = (request.POST.get('email') or '').strip()
+    role = request.POST.get('role')
+    try:
+        validate_email(email)
+    except ValidationError:
+        return JsonResponse({'error': 'Enter a valid email address.'}, status=400)
+    if role not in ROLES:
+        return JsonResponse({'error': 'Choose a role.'}, status=400)
+    if User.objects.filter(email=email).exists():
+        return JsonResponse({'error': 'User already exists.'}, status=409)
+    user = User.objects.create(
+        email=email,
+        username=email,
+        password=hashing.make_password(request.POST.get('password')),
+        role=role,
+    )
+    activity.record(request.user, ActivityEvent.Action.ADD_USER, user.email)
+    return JsonResponse({'id': user.id, 'row': user_row_html(request, user)}, status=201)
+
+
+@require_POST
+@secretary_api
+def api_delete_user(request, user_id):
+    users = bulk.select_users([user_id], exclude_id=request.user.id)
+    email = users.values_list('email', flat=True).first()
+    # set-based, so the user's requests are not un-counted one by one
+    if email is None or not bulk.bulk_delete(users).affected:
+        return JsonResponse({'error': 'User not found.'}, status=404)
+    activity.record(request.user, ActivityEvent.Action.DELETE_USER, email)
+    return JsonResponse({'deleted': user_id})
+
+
+@require_POST
+@secretary_api
+def api_change_user_role(request, user_id):
+    role = request.POST.get('role')
+    if role not in ROLES:
+        return JsonResponse({'error': 'Choose a role.'}, status=400)
+    try:
+        user = User.objects.exclude(id=request.user.id).get(id=user_id)
+    except User.DoesNotExist:
+        return JsonResponse({'error': 'User not found.'}, status=404)
+    user.role = role
+    user.save(update_fields=['role'])
+    activity.record(request.user, ActivityEvent.Action.CHANGE_ROLE, f'{user.email} to {user.get_role_display()}')
+    return JsonResponse({'id': user.id, 'row': user_row_html(request, user)})
+
+
+@secretary_required
+def user_row(request, user_id):
+    try:
+        user = User.objects.get(id=user_id)
+    except User.DoesNotExist:
+        return HttpResponse(status=404)
+    return HttpResponse(user_row_html(request, user))
+
+
+@require_POST
+@secretary_required
+def import_users(request):
+    # bulk roster upload for the secretary, see users.importer
+    roster = request.FILES.get('roster')
+    if roster is None:
+        messages.error(request, 'Please choose a roster file.')
+        return redirect('dashboard')
+
+    fmt = 'jsonl' if roster.name.endswith(('.jsonl', '.ndjson')) else 'csv'
+    stream = io.TextIOWrapper(roster.file, encoding='utf-8-sig', newline='')
+    try:
+        # on the shared pool: an upload cannot start processes of its own
+        result = import_roster(stream, fmt, executor=hashing.SharedPool())
+    except hashing.HashingBusy:
+        # batches already imported stay; uploading the roster again skips them
+        messages.error(request, 'The server is busy hashing passwords. Please upload the roster again shortly.')
+        return redirect('dashboard')
+
+    messages.success(
+        request,
+        f'Imported {result.created} users ({result.existing} already existed, {result.rejected} rejected).'
+    )
+    for error in result.errors[:5]:
+        messages.warning(request, f"Line {error['line']}: {error['error']}")
+    return redirect('dashboard')
+
+
+@require_POST
+@secretary_required
+def bulk_users(request):
+    # multi-select delete / role change for the secretary, see users.bulk
+    action = request.POST.get('action')
+    user_ids = request.POST.getlist('user_ids')
+    role_filter = request.POST.get('role_filter') or None
+    if not all(pk.isdigit() for pk in user_ids):
+        messages.error(request, 'Invalid user selection.')
+        return redirect('dashboard')
+    try:
+        # an empty id list only makes sense with a role filter
+        users = bulk.select_users(user_ids or None, role_filter, exclude_id=request.user.id)
+        if action == 'delete':
+            steps = bulk.iter_delete(users)
+        elif action == 'role':
+            steps = bulk.iter_set_role(users, request.POST.get('role'))
+        else:
+            raise ValueError(f'unknown action {action!r}')
+    except ValueError as exc:
+        messages.error(request, f'Bulk update failed: {exc}.')
+        return redirect('dashboard')
+
+    if request.POST.get('stream'):
+        # one JSON line per chunk, for batches too big to wait on
+        lines = (json.dumps({'matched': r.matched, 'affected': r.affected}) + '\n' for r in steps)
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+    result = bulk.run(steps)
+    done = 'Deleted' if action == 'delete' else 'Updated the role of'
+    messages.success(request, f'{done} {result.affected} users.')
+    return redirect('dashboard')
+
+
+@secretary_required
+def export_users(request):
+    # ?format=csv|jsonl and an optional ?role=, streamed, see users.exporter
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in exporter.CONTENT_TYPES:
+        return HttpResponse(status=400)
+    role = request.GET.get('role')
+    rows = exporter.users(role if role in ROLES else None)
+    return exporter.response(request, rows, exporter.USER_COLUMNS, fmt, 'users')
+
+
+@secretary_required
+def user_cache_stats(request):
+    # hit/miss counters of this worker process's user cache
+    return JsonResponse(user_cache.stats())
+
             
             
 